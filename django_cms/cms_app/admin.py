@@ -1,16 +1,20 @@
 """
 Django admin configuration for CMS.
 """
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.html import format_html
+from django.conf import settings
 from django.urls import reverse
 from django.db import models
 from adminsortable2.admin import SortableAdminMixin, SortableInlineAdminMixin
 from import_export.admin import ImportExportModelAdmin
 from .models import (
     SiteConfiguration, Page, Section, ContentBlock,
-    MenuItem, Media, GalleryImage
+    MenuItem, Media, MediaBlob, GalleryImage, Tag, Job, UploadSession,
+    CloneRun, FetchRecord
 )
+from .jobs import retry
+from . import chunked_uploads, similarity
 
 
 class ContentBlockInline(SortableInlineAdminMixin, admin.TabularInline):
@@ -196,6 +200,7 @@ class ContentBlockAdmin(SortableAdminMixin, admin.ModelAdmin):
     ]
     list_filter = ['block_type', 'section__page']
     search_fields = ['title', 'content', 'section__title']
+    readonly_fields = ['image_width', 'image_height']
     inlines = [GalleryImageInline]
 
     fieldsets = (
@@ -206,7 +211,7 @@ class ContentBlockAdmin(SortableAdminMixin, admin.ModelAdmin):
             'fields': ('content', 'html_content'),
         }),
         ('Media', {
-            'fields': ('image', 'image_alt'),
+            'fields': ('image', 'image_alt', 'image_width', 'image_height'),
             'classes': ('collapse',)
         }),
         ('Link/Button', {
@@ -279,36 +284,74 @@ class MenuItemAdmin(SortableAdminMixin, admin.ModelAdmin):
     get_target.short_description = 'Links To'
 
 
+class NearDuplicateFilter(admin.SimpleListFilter):
+    """Images grouped as near duplicates by find_near_duplicates."""
+    title = 'near duplicates'
+    parameter_name = 'near_duplicates'
+
+    def lookups(self, request, model_admin):
+        return [('yes', 'Near duplicates')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.filter(duplicate_group__isnull=False).order_by('duplicate_group', 'pk')
+        return queryset
+
+
 @admin.register(Media)
 class MediaAdmin(ImportExportModelAdmin):
     """Admin for media library."""
     list_display = [
         'thumbnail_preview', 'title', 'media_type',
-        'file_size_display', 'dimensions', 'uploaded_at', 'uploaded_by'
+        'file_size_display', 'dimensions', 'processing_status', 'duplicate_group_link',
+        'uploaded_at', 'uploaded_by'
+    ]
+    list_filter = [
+        'media_type', 'is_private', 'processing_status', NearDuplicateFilter, 'tag_set', 'uploaded_at'
     ]
-    list_filter = ['media_type', 'uploaded_at']
-    search_fields = ['title', 'alt_text', 'tags']
-    readonly_fields = ['file_size', 'width', 'height', 'uploaded_at', 'uploaded_by']
+    actions = ['merge_near_duplicates']
+    search_fields = ['title', 'alt_text', '=tag_set__name']
+    readonly_fields = ['file_size', 'width', 'height', 'processing_status', 'uploaded_at', 'uploaded_by']
 
     fieldsets = (
         ('File Upload', {
             'fields': ('title', 'file')
         }),
         ('Metadata', {
-            'fields': ('alt_text', 'caption', 'tags'),
+            'fields': ('alt_text', 'caption', 'tags', 'is_private'),
         }),
         ('File Information', {
-            'fields': ('media_type', 'file_size', 'width', 'height', 'uploaded_at', 'uploaded_by'),
+            'fields': (
+                'media_type', 'file_size', 'width', 'height',
+                'processing_status', 'uploaded_at', 'uploaded_by'
+            ),
             'classes': ('collapse',)
         }),
     )
 
+    class Media:
+        js = ('js/chunked_upload.js',)
+
+    def get_form(self, request, obj=None, **kwargs):
+        """
+        Point the file input of the add form at the chunked upload API for
+        large files. Uploads create new media items, so replacing the file
+        of an existing item goes through the regular form.
+        """
+        form = super().get_form(request, obj, **kwargs)
+        if obj is None and 'file' in form.base_fields:
+            form.base_fields['file'].widget.attrs.update({
+                'data-chunked-upload-url': reverse('upload-list'),
+                'data-chunk-size': settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+            })
+        return form
+
     def thumbnail_preview(self, obj):
         """Display thumbnail for images."""
         if obj.media_type == 'image' and obj.file:
             return format_html(
-                '<img src="{}" style="max-width: 100px; max-height: 100px;" />',
-                obj.file.url
+                '<img src="{}" style="max-width: 100px; max-height: 100px;" loading="lazy" />',
+                obj.get_thumbnail_url()
             )
         return format_html('<span>📄 {}</span>', obj.media_type.upper())
     thumbnail_preview.short_description = 'Preview'
@@ -331,6 +374,34 @@ class MediaAdmin(ImportExportModelAdmin):
         return '-'
     dimensions.short_description = 'Dimensions'
 
+    def duplicate_group_link(self, obj):
+        """Link to the other images in the item's near-duplicate group."""
+        if obj.duplicate_group is None:
+            return '-'
+        return format_html(
+            '<a href="?duplicate_group={}">Group {}</a>', obj.duplicate_group, obj.duplicate_group
+        )
+    duplicate_group_link.short_description = 'Near Duplicates'
+    duplicate_group_link.admin_order_field = 'duplicate_group'
+
+    def merge_near_duplicates(self, request, queryset):
+        """Merge the selected items of each near-duplicate group into its best copy."""
+        groups = {}
+        for media in queryset.filter(duplicate_group__isnull=False):
+            groups.setdefault(media.duplicate_group, []).append(media)
+        merged = 0
+        for media_list in groups.values():
+            if len(media_list) > 1:
+                similarity.merge(media_list)
+                merged += len(media_list) - 1
+        if merged:
+            self.message_user(request, f'{merged} near-duplicate file(s) merged into their best copy.')
+        else:
+            self.message_user(
+                request, 'Select at least two items of the same near-duplicate group.', level=messages.WARNING
+            )
+    merge_near_duplicates.short_description = 'Merge selected near duplicates'
+
     def save_model(self, request, obj, form, change):
         """Save the model and track who uploaded it."""
         if not change:
@@ -338,6 +409,113 @@ class MediaAdmin(ImportExportModelAdmin):
         super().save_model(request, obj, form, change)
 
 
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    """Admin for stored files shared by media with identical content."""
+    list_display = ['sha256', 'name', 'size', 'ref_count', 'created_at']
+    list_filter = ['created_at']
+    search_fields = ['=sha256', 'name']
+    readonly_fields = ['sha256', 'name', 'size', 'width', 'height', 'ref_count', 'created_at']
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    """Admin for chunked uploads in progress."""
+    list_display = ['filename', 'progress', 'status', 'created_by', 'updated_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['filename', 'title']
+    readonly_fields = [
+        'id', 'filename', 'title', 'alt_text', 'caption', 'tags', 'is_private',
+        'size', 'offset', 'sha256', 'status', 'media', 'created_by', 'created_at', 'updated_at'
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+    def progress(self, obj):
+        """Display the share of the file received."""
+        return f"{obj.offset * 100 // obj.size if obj.size else 0}%"
+    progress.short_description = 'Progress'
+
+    def delete_model(self, request, obj):
+        """Remove the partial file along with the session."""
+        chunked_uploads.abort(obj)
+
+    def delete_queryset(self, request, queryset):
+        for session in queryset:
+            chunked_uploads.abort(session)
+
+
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    """Admin for media tags."""
+    list_display = ['name', 'media_count']
+    search_fields = ['name']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(media_total=models.Count('media'))
+
+    def media_count(self, obj):
+        """Display number of tagged media files."""
+        return obj.media_total
+    media_count.short_description = 'Media Files'
+    media_count.admin_order_field = 'media_total'
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Admin for background jobs."""
+    list_display = ['id', 'name', 'status', 'attempts', 'run_after', 'created_at', 'finished_at']
+    list_filter = ['status', 'name']
+    readonly_fields = [
+        'name', 'payload', 'status', 'attempts', 'max_attempts', 'run_after',
+        'locked_at', 'last_error', 'created_at', 'finished_at'
+    ]
+    actions = ['retry_jobs']
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry_jobs(self, request, queryset):
+        """Queue failed jobs again."""
+        count = retry(queryset)
+        self.message_user(request, f'{count} failed job(s) queued again.')
+    retry_jobs.short_description = 'Retry selected failed jobs'
+
+
+@admin.register(CloneRun)
+class CloneRunAdmin(admin.ModelAdmin):
+    """Admin for runs of the site clone commands."""
+    list_display = ['start_url', 'started_at', 'finished_at', 'record_count']
+    readonly_fields = ['start_url', 'started_at', 'finished_at']
+
+    def has_add_permission(self, request):
+        return False
+
+    def record_count(self, obj):
+        """Display the number of URLs the run completed."""
+        return obj.records.count()
+    record_count.short_description = 'URLs'
+
+
+@admin.register(FetchRecord)
+class FetchRecordAdmin(admin.ModelAdmin):
+    """Admin for what the clone commands fetched, used for incremental re-clones."""
+    list_display = ['url', 'page', 'media', 'etag', 'last_modified', 'fetched_at']
+    list_filter = ['last_run', 'fetched_at']
+    search_fields = ['url']
+    readonly_fields = [
+        'url', 'etag', 'last_modified', 'content_hash', 'links', 'page', 'media',
+        'last_run', 'fetched_at'
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+
 # Customize admin site
 admin.site.site_header = "CMS Administration"
 admin.site.site_title = "CMS Admin"
@@ -0,0 +1,21 @@
+"""
+Renderers for CMS API.
+"""
+import json
+from rest_framework.renderers import BaseRenderer
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline-delimited JSON. Views stream their own NDJSON bodies; this
+    renderer lets clients negotiate the format and renders error responses
+    as a single line.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return (json.dumps(data, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
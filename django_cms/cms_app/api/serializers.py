@@ -4,8 +4,9 @@ Serializers for CMS API.
 from rest_framework import serializers
 from cms_app.models import (
     Page, Section, ContentBlock, MenuItem,
-    Media, SiteConfiguration, GalleryImage
+    Media, SiteConfiguration, GalleryImage, ChangeLogEntry
 )
+from cms_app import renditions
 
 
 class GalleryImageSerializer(serializers.ModelSerializer):
@@ -100,14 +101,15 @@ class MediaSerializer(serializers.ModelSerializer):
     media_type_display = serializers.CharField(source='get_media_type_display', read_only=True)
     file_url = serializers.SerializerMethodField()
     thumbnail_url = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Media
         fields = [
             'id', 'title', 'file', 'file_url', 'media_type',
             'media_type_display', 'alt_text', 'caption',
-            'file_size', 'width', 'height', 'tags',
-            'uploaded_at', 'thumbnail_url'
+            'file_size', 'width', 'height', 'dominant_color', 'placeholder', 'tags',
+            'processing_status', 'uploaded_at', 'thumbnail_url', 'srcset'
         ]
 
     def get_file_url(self, obj):
@@ -121,7 +123,14 @@ class MediaSerializer(serializers.ModelSerializer):
         """Get thumbnail URL for images."""
         request = self.context.get('request')
         if obj.media_type == 'image' and obj.file and request:
-            return request.build_absolute_uri(obj.file.url)
+            return request.build_absolute_uri(obj.get_thumbnail_url())
+        return None
+
+    def get_srcset(self, obj):
+        """Get `srcset` values per rendition format for images."""
+        request = self.context.get('request')
+        if obj.media_type == 'image' and obj.file and request and obj.processing_status != 'failed':
+            return renditions.srcsets(obj.file, obj.width, build_url=request.build_absolute_uri)
         return None
 
 
@@ -137,3 +146,68 @@ class SiteConfigurationSerializer(serializers.ModelSerializer):
             'default_meta_description', 'facebook_url', 'twitter_url',
             'linkedin_url', 'instagram_url'
         ]
+
+
+class ChangeLogEntrySerializer(serializers.ModelSerializer):
+    """Serializer for change feed entries."""
+    cursor = serializers.IntegerField(source='id', read_only=True)
+
+    class Meta:
+        model = ChangeLogEntry
+        fields = ['cursor', 'model', 'object_id', 'action', 'changed_at']
+
+
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key field that first looks the key up in `context['preloaded']`,
+    so bulk writes validate parents with one query instead of one per row.
+    """
+    def to_internal_value(self, data):
+        preloaded = self.context.get('preloaded', {})
+        if not isinstance(data, bool) and data in preloaded:
+            return preloaded[data]
+        return super().to_internal_value(data)
+
+
+class SectionWriteSerializer(serializers.ModelSerializer):
+    """Serializer for validating bulk section writes."""
+    serializer_related_field = PreloadedPrimaryKeyRelatedField
+    background_image = serializers.CharField(
+        required=False, allow_blank=True, allow_null=True, max_length=100,
+        help_text='Path of an already stored file'
+    )
+
+    class Meta:
+        model = Section
+        fields = [
+            'page', 'section_type', 'title', 'anchor_id', 'is_visible',
+            'background_color', 'background_image', 'text_color',
+            'padding_top', 'padding_bottom', 'css_class', 'config', 'order'
+        ]
+
+
+class ContentBlockWriteSerializer(serializers.ModelSerializer):
+    """Serializer for validating bulk content block writes."""
+    serializer_related_field = PreloadedPrimaryKeyRelatedField
+    image = serializers.CharField(
+        required=False, allow_blank=True, allow_null=True, max_length=100,
+        help_text='Path of an already stored file'
+    )
+
+    class Meta:
+        model = ContentBlock
+        fields = [
+            'section', 'block_type', 'title', 'content', 'html_content',
+            'image', 'image_alt', 'link_url', 'link_text', 'link_target',
+            'button_style', 'background_color', 'text_color', 'config', 'order'
+        ]
+
+
+class GalleryImageWriteSerializer(serializers.ModelSerializer):
+    """Serializer for validating bulk gallery image writes."""
+    serializer_related_field = PreloadedPrimaryKeyRelatedField
+    image = serializers.CharField(max_length=100, help_text='Path of an already stored file')
+
+    class Meta:
+        model = GalleryImage
+        fields = ['content_block', 'image', 'alt_text', 'caption', 'order']
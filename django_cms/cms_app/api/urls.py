@@ -5,7 +5,9 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     PageViewSet, SectionViewSet, ContentBlockViewSet,
-    MenuItemViewSet, MediaViewSet, SiteConfigurationViewSet
+    MenuItemViewSet, MediaViewSet, SiteConfigurationViewSet,
+    ChangeFeedViewSet, BulkWriteViewSet, SiteExportViewSet, SearchViewSet,
+    AutocompleteViewSet, ChunkedUploadViewSet
 )
 
 router = DefaultRouter()
@@ -15,6 +17,12 @@ router.register(r'content-blocks', ContentBlockViewSet, basename='contentblock')
 router.register(r'menu-items', MenuItemViewSet, basename='menuitem')
 router.register(r'media', MediaViewSet, basename='media')
 router.register(r'site-config', SiteConfigurationViewSet, basename='siteconfig')
+router.register(r'changes', ChangeFeedViewSet, basename='change')
+router.register(r'bulk', BulkWriteViewSet, basename='bulk')
+router.register(r'export', SiteExportViewSet, basename='export')
+router.register(r'search', SearchViewSet, basename='search')
+router.register(r'autocomplete', AutocompleteViewSet, basename='autocomplete')
+router.register(r'uploads', ChunkedUploadViewSet, basename='upload')
 
 urlpatterns = [
     path('', include(router.urls)),
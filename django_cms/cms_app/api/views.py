@@ -4,20 +4,69 @@ API views for CMS.
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.renderers import JSONRenderer
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from cms_app.models import (
     Page, Section, ContentBlock, MenuItem,
-    Media, SiteConfiguration
+    Media, SiteConfiguration, GalleryImage, ChangeLogEntry, UploadSession
 )
+from cms_app.bulk import create_objects, update_objects, reorder_objects, delete_objects
+from cms_app.export import iter_chunks, parse_cursor, InvalidCursor
+from cms_app.search import search_pages
+from cms_app.autocomplete import get_index, entry_url, KINDS
+from cms_app.tags import filter_by_tags, media_facets
+from cms_app.signals import coalesced_changes
+from cms_app import chunked_uploads
 from .serializers import (
     PageListSerializer, PageDetailSerializer, SectionSerializer,
     ContentBlockSerializer, MenuItemSerializer, MediaSerializer,
-    SiteConfigurationSerializer
+    SiteConfigurationSerializer, ChangeLogEntrySerializer,
+    SectionWriteSerializer, ContentBlockWriteSerializer, GalleryImageWriteSerializer
 )
+from .renderers import NDJSONRenderer
+from .fast_serializers import (
+    PAGE_LIST_FIELDS, MEDIA_FIELDS, CONTENT_BLOCK_FIELDS,
+    page_list_rows, media_rows, content_block_rows, render_json
+)
+
 
+class FastListMixin:
+    """
+    Serve JSON list responses from value tuples instead of the serializer.
 
-class PageViewSet(viewsets.ReadOnlyModelViewSet):
+    `fast_list_fields` are read with `values_list()` and turned into rows by
+    `fast_list_rows`. Filtering and pagination still go through the regular
+    DRF hooks; the browsable API and indented JSON keep using the serializer.
+    """
+    fast_list_fields = ()
+    fast_list_rows = None
+    use_fast_list = True
+
+    def list(self, request, *args, **kwargs):
+        renderer = getattr(request, 'accepted_renderer', None)
+        if (not self.use_fast_list or type(renderer) is not JSONRenderer
+                or 'indent' in (getattr(request, 'accepted_media_type', None) or '')):
+            return super().list(request, *args, **kwargs)
+
+        values = self.filter_queryset(self.get_queryset()).values_list(*self.fast_list_fields)
+        build_rows = type(self).fast_list_rows
+
+        page = self.paginate_queryset(values)
+        if page is not None:
+            data = self.get_paginated_response(build_rows(page, request)).data
+        else:
+            data = build_rows(values, request)
+
+        return HttpResponse(render_json(data), content_type=renderer.media_type)
+
+
+class PageViewSet(FastListMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for pages.
 
@@ -32,6 +81,8 @@ class PageViewSet(viewsets.ReadOnlyModelViewSet):
     ordering_fields = ['order', 'created_at', 'updated_at']
     ordering = ['order']
     lookup_field = 'slug'
+    fast_list_fields = PAGE_LIST_FIELDS
+    fast_list_rows = page_list_rows
 
     def get_serializer_class(self):
         """Use different serializers for list and detail views."""
@@ -75,7 +126,7 @@ class SectionViewSet(viewsets.ReadOnlyModelViewSet):
         return queryset.prefetch_related('content_blocks', 'content_blocks__gallery_images')
 
 
-class ContentBlockViewSet(viewsets.ReadOnlyModelViewSet):
+class ContentBlockViewSet(FastListMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for content blocks.
     """
@@ -85,6 +136,8 @@ class ContentBlockViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_fields = ['section', 'block_type']
     ordering_fields = ['order', 'created_at']
     ordering = ['order']
+    fast_list_fields = CONTENT_BLOCK_FIELDS
+    fast_list_rows = content_block_rows
 
     def get_queryset(self):
         """Filter blocks from visible sections for unauthenticated users."""
@@ -115,7 +168,7 @@ class MenuItemViewSet(viewsets.ReadOnlyModelViewSet):
         ).prefetch_related('children')
 
 
-class MediaViewSet(viewsets.ReadOnlyModelViewSet):
+class MediaViewSet(FastListMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for media files.
     """
@@ -124,9 +177,31 @@ class MediaViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['media_type']
-    search_fields = ['title', 'alt_text', 'tags']
+    search_fields = ['title', 'alt_text', '=tag_set__name']
     ordering_fields = ['uploaded_at', 'title']
     ordering = ['-uploaded_at']
+    fast_list_fields = MEDIA_FIELDS
+    fast_list_rows = media_rows
+
+    def get_queryset(self):
+        """Filter by exact tags (`?tag=`, repeatable) and a tag prefix (`?tag_prefix=`)."""
+        queryset = super().get_queryset()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(is_private=False)
+        return filter_by_tags(
+            queryset,
+            tags=self.request.query_params.getlist('tag'),
+            prefix=self.request.query_params.get('tag_prefix')
+        )
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """Get media counts per type and per tag for the current filters."""
+        facets = media_facets(self.filter_queryset(self.get_queryset()))
+        return Response({
+            'media_type': facets['media_type'],
+            'tags': [{'name': name, 'count': count} for name, count in facets['tags']],
+        })
 
 
 class SiteConfigurationViewSet(viewsets.ReadOnlyModelViewSet):
@@ -149,3 +224,454 @@ class SiteConfigurationViewSet(viewsets.ReadOnlyModelViewSet):
             {'error': 'Site configuration not found'},
             status=status.HTTP_404_NOT_FOUND
         )
+
+
+class ChangeFeedViewSet(viewsets.ViewSet):
+    """
+    API endpoint for incremental sync.
+
+    list: Get changes recorded after the `since` cursor, in commit order;
+    the most recent seconds of changes are held back (see `ChangeLogEntry`)
+    latest: Get the current cursor, to start following the feed after a full sync
+    """
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    default_limit = 100
+    max_limit = 1000
+
+    def get_sources(self):
+        """
+        Map change log model names to the queryset of records the requesting
+        user may see and the serializer used to render them.
+        """
+        sections = Section.objects.all()
+        blocks = ContentBlock.objects.all()
+        media = Media.objects.all()
+        if not self.request.user.is_staff:
+            media = media.filter(is_private=False)
+        if not self.request.user.is_authenticated:
+            sections = sections.filter(is_visible=True, page__status='published')
+            blocks = blocks.filter(
+                section__is_visible=True,
+                section__page__status='published'
+            )
+
+        return {
+            'page': (Page.objects.filter(status='published'), PageListSerializer),
+            'section': (
+                sections.prefetch_related('content_blocks', 'content_blocks__gallery_images'),
+                SectionSerializer
+            ),
+            'contentblock': (blocks.prefetch_related('gallery_images'), ContentBlockSerializer),
+            'menuitem': (MenuItem.objects.filter(is_visible=True), MenuItemSerializer),
+            'media': (media, MediaSerializer),
+        }
+
+    def list(self, request):
+        """Get changes after the given cursor."""
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            return Response(
+                {'error': '`since` and `limit` must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, self.max_limit))
+
+        entries = list(ChangeLogEntry.settled().filter(id__gt=since)[:limit + 1])
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+        cursor = entries[-1].id if entries else since
+
+        # Only the last change per object matters to a consumer, since the
+        # payload is always the object's current state.
+        latest = {}
+        for entry in entries:
+            latest.pop((entry.model, entry.object_id), None)
+            latest[(entry.model, entry.object_id)] = entry
+        entries = list(latest.values())
+
+        # Load current state with one query per model.
+        sources = self.get_sources()
+        wanted = {}
+        for entry in entries:
+            if entry.action != 'deleted' and entry.model in sources:
+                wanted.setdefault(entry.model, []).append(entry.object_id)
+
+        records = {}
+        for model_name, object_ids in wanted.items():
+            queryset, serializer_class = sources[model_name]
+            objects = queryset.filter(pk__in=object_ids)
+            data = serializer_class(objects, many=True, context={'request': request}).data
+            for item in data:
+                records[(model_name, item['id'])] = item
+
+        results = []
+        for entry in entries:
+            item = ChangeLogEntrySerializer(entry).data
+            item['data'] = records.get((entry.model, entry.object_id))
+            if item['data'] is None:
+                # Deleted, or no longer visible (e.g. unpublished) to this user.
+                item['action'] = 'deleted'
+            results.append(item)
+
+        return Response({
+            'cursor': cursor,
+            'has_more': has_more,
+            'results': results,
+        })
+
+    @action(detail=False, methods=['get'])
+    def latest(self, request):
+        """Get the most recent cursor."""
+        return Response({'cursor': ChangeLogEntry.latest_cursor()})
+
+
+class SearchViewSet(viewsets.ViewSet):
+    """
+    API endpoint for full-text search.
+
+    list: Search published pages with `q`; paged with `limit` and `offset`
+    """
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    default_limit = 10
+    max_limit = 50
+
+    def list(self, request):
+        """Get pages matching the query, best match first."""
+        query = request.query_params.get('q', '').strip()
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+        except ValueError:
+            return Response(
+                {'error': '`limit` and `offset` must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, self.max_limit))
+
+        results, has_more = search_pages(query, limit=limit, offset=offset)
+        pages = PageListSerializer(
+            [result.page for result in results], many=True, context={'request': request}
+        ).data
+
+        return Response({
+            'query': query,
+            'has_more': has_more,
+            'results': [
+                {
+                    'page': page,
+                    'score': result.score,
+                    'title_highlight': str(result.title_html),
+                    'snippet': str(result.snippet_html),
+                }
+                for page, result in zip(pages, results)
+            ],
+        })
+
+
+class AutocompleteViewSet(viewsets.ViewSet):
+    """
+    API endpoint for type-ahead.
+
+    list: Get pages and media whose title (or page slug) has a word starting with `q`
+    """
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def list(self, request):
+        """Get suggestions from the in-memory prefix index."""
+        default_limit = getattr(settings, 'AUTOCOMPLETE_DEFAULT_LIMIT', 10)
+        max_limit = getattr(settings, 'AUTOCOMPLETE_MAX_LIMIT', 50)
+        try:
+            limit = int(request.query_params.get('limit', default_limit))
+        except ValueError:
+            return Response(
+                {'error': '`limit` must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, max_limit))
+
+        kinds = KINDS
+        if request.query_params.get('types'):
+            kinds = tuple(
+                kind for kind in request.query_params['types'].split(',') if kind in KINDS
+            )
+
+        index = get_index()
+        entries = index.lookup(
+            request.query_params.get('q', ''),
+            limit=limit,
+            kinds=kinds,
+            # Drafts and private media are only suggested to staff.
+            include_drafts=request.user.is_staff
+        )
+
+        return Response({
+            'version': index.version,
+            'results': [
+                {
+                    'type': entry.kind,
+                    'id': entry.id,
+                    'label': entry.label,
+                    'detail': entry.detail,
+                    'url': entry_url(entry),
+                }
+                for entry in entries
+            ],
+        })
+
+
+class BulkWriteViewSet(viewsets.ViewSet):
+    """
+    API endpoint for transactional bulk writes.
+
+    create: Create, update, reorder and delete sections, content blocks and
+    gallery images in one transaction, with a single cache invalidation
+    """
+    permission_classes = [IsAuthenticated]
+    max_items = 5000
+
+    # (payload key, model, write serializer, parent field, parent payload key)
+    resources = [
+        ('sections', Section, SectionWriteSerializer, 'page', None),
+        ('content_blocks', ContentBlock, ContentBlockWriteSerializer, 'section', 'sections'),
+        ('gallery_images', GalleryImage, GalleryImageWriteSerializer, 'content_block', 'content_blocks'),
+    ]
+
+    def create(self, request):
+        """Apply all operations, or none of them."""
+        if not isinstance(request.data, dict):
+            raise ValidationError({'non_field_errors': ['Expected an object.']})
+
+        result = {}
+        refs = {}
+        with transaction.atomic(), coalesced_changes():
+            for key, model, serializer_class, parent_field, parent_key in self.resources:
+                operations = request.data.get(key) or {}
+                if not isinstance(operations, dict):
+                    raise ValidationError({key: ['Expected an object.']})
+                refs[key] = {}
+                result[key] = self.apply(
+                    operations, model, serializer_class, parent_field,
+                    parent_refs=refs.get(parent_key, {}), refs=refs[key], key=key
+                )
+
+        return Response(result)
+
+    def get_items(self, operations, name, key):
+        items = operations.get(name) or []
+        if not isinstance(items, list):
+            raise ValidationError({key: {name: ['Expected a list.']}})
+        if len(items) > self.max_items:
+            raise ValidationError({key: {name: [f'At most {self.max_items} items per request.']}})
+        return items
+
+    def resolve_parent(self, item, parent_field, parent_refs):
+        """Replace a `ref` of a row created earlier in this request by its id."""
+        parent = item.get(parent_field)
+        if isinstance(parent, str) and parent in parent_refs:
+            item[parent_field] = parent_refs[parent]
+        return item
+
+    def preload_parents(self, model, parent_field, items):
+        """Fetch all referenced parent rows with a single query."""
+        parent_ids = {
+            item[parent_field] for item in items
+            if isinstance(item, dict) and isinstance(item.get(parent_field), int)
+            and not isinstance(item.get(parent_field), bool)
+        }
+        parent_model = model._meta.get_field(parent_field).related_model
+        return parent_model.objects.in_bulk(parent_ids)
+
+    def apply(self, operations, model, serializer_class, parent_field, parent_refs, refs, key):
+        """Apply create, update, reorder and delete operations for one model."""
+        errors = {}
+        create_items = self.get_items(operations, 'create', key)
+        update_items = self.get_items(operations, 'update', key)
+        for item in create_items + update_items:
+            if isinstance(item, dict):
+                self.resolve_parent(item, parent_field, parent_refs)
+        context = {'preloaded': self.preload_parents(model, parent_field, create_items + update_items)}
+
+        # Create
+        objects, created_refs = [], []
+        for index, item in enumerate(create_items):
+            if not isinstance(item, dict):
+                errors.setdefault('create', {})[index] = ['Expected an object.']
+                continue
+            item = dict(item)
+            ref = item.pop('ref', None)
+            serializer = serializer_class(data=item, context=context)
+            if not serializer.is_valid():
+                errors.setdefault('create', {})[index] = serializer.errors
+                continue
+            objects.append(model(**serializer.validated_data))
+            created_refs.append(ref)
+
+        # Update
+        instances = model.objects.in_bulk([
+            item['id'] for item in update_items
+            if isinstance(item, dict) and isinstance(item.get('id'), int)
+        ])
+        updated, fields = {}, set()
+        for index, item in enumerate(update_items):
+            instance = instances.get(item.get('id')) if isinstance(item, dict) else None
+            if instance is None:
+                errors.setdefault('update', {})[index] = {'id': ['Not found.']}
+                continue
+            data = {name: value for name, value in item.items() if name != 'id'}
+            serializer = serializer_class(instance, data=data, partial=True, context=context)
+            if not serializer.is_valid():
+                errors.setdefault('update', {})[index] = serializer.errors
+                continue
+            for name, value in serializer.validated_data.items():
+                setattr(instance, name, value)
+                fields.add(name)
+            updated[instance.pk] = instance
+
+        # Reorder
+        orders = {}
+        for index, item in enumerate(self.get_items(operations, 'reorder', key)):
+            if (not isinstance(item, dict) or not isinstance(item.get('id'), int)
+                    or not isinstance(item.get('order'), int)):
+                errors.setdefault('reorder', {})[index] = ['Expected {"id": int, "order": int}.']
+                continue
+            orders[item['id']] = item['order']
+
+        # Delete
+        delete_ids = self.get_items(operations, 'delete', key)
+        if not all(isinstance(pk, int) for pk in delete_ids):
+            errors['delete'] = ['Expected a list of ids.']
+
+        if errors:
+            raise ValidationError({key: errors})
+
+        created = create_objects(model, objects)
+        for ref, obj in zip(created_refs, created):
+            if ref is not None:
+                refs[str(ref)] = obj.pk
+
+        return {
+            'created': [
+                {'id': obj.pk, 'ref': ref} if ref is not None else {'id': obj.pk}
+                for ref, obj in zip(created_refs, created)
+            ],
+            'updated': update_objects(model, list(updated.values()), fields),
+            'reordered': reorder_objects(model, orders),
+            'deleted': delete_objects(model, delete_ids),
+        }
+
+
+class SiteExportViewSet(viewsets.ViewSet):
+    """
+    API endpoint for full-site exports (staff only).
+
+    list: Stream every site record as NDJSON; resumable with `after`
+    """
+    permission_classes = [IsAdminUser]
+    renderer_classes = [NDJSONRenderer, JSONRenderer]
+
+    def list(self, request):
+        """Stream the export, optionally gzip-compressed."""
+        after = request.query_params.get('after') or None
+        compress = request.query_params.get('compress') == 'gzip'
+        if after:
+            try:
+                parse_cursor(after)
+            except InvalidCursor as e:
+                raise ValidationError({'after': [str(e)]})
+
+        response = StreamingHttpResponse(
+            iter_chunks(after=after, compress=compress),
+            content_type='application/gzip' if compress else 'application/x-ndjson'
+        )
+        filename = 'site-export.ndjson.gz' if compress else 'site-export.ndjson'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class ChunkedUploadViewSet(viewsets.ViewSet):
+    """
+    API endpoint for chunked, resumable media uploads (staff only).
+
+    create: Start an upload from `filename`, `size` and optionally `sha256`,
+    and the `title`, `alt_text`, `caption`, `tags` and `is_private` of the
+    media item
+    retrieve: The bytes received so far, to resume an interrupted upload
+    partial_update: Append the raw request body at the `Upload-Offset`
+    header; `Upload-Checksum` may carry the chunk's SHA-256
+    destroy: Abort the upload
+    """
+    permission_classes = [IsAdminUser]
+
+    def get_session(self, pk):
+        sessions = UploadSession.objects.all()
+        if not self.request.user.is_superuser:
+            sessions = sessions.filter(created_by=self.request.user)
+        try:
+            return sessions.get(pk=pk)
+        except (UploadSession.DoesNotExist, ValueError, DjangoValidationError):
+            raise Http404
+
+    def session_data(self, session):
+        data = {
+            'id': str(session.pk),
+            'filename': session.filename,
+            'size': session.size,
+            'offset': session.offset,
+            'status': session.status,
+            'chunk_size': settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+        }
+        if session.media_id:
+            data['media'] = MediaSerializer(session.media, context={'request': self.request}).data
+        return data
+
+    def error(self, e):
+        return Response({'detail': str(e)}, status=e.status)
+
+    def create(self, request):
+        try:
+            size = int(request.data.get('size'))
+        except (TypeError, ValueError):
+            raise ValidationError({'size': ['An integer size is required.']})
+        is_private = request.data.get('is_private', False)
+        if not isinstance(is_private, bool):
+            raise ValidationError({'is_private': ['Must be true or false.']})
+        try:
+            session = chunked_uploads.start(
+                request.user, request.data.get('filename'), size,
+                sha256=request.data.get('sha256', ''), title=request.data.get('title', ''),
+                alt_text=request.data.get('alt_text', ''), caption=request.data.get('caption', ''),
+                tags=request.data.get('tags', ''), is_private=is_private,
+            )
+        except chunked_uploads.UploadError as e:
+            return self.error(e)
+        return Response(self.session_data(session), status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk=None):
+        return Response(self.session_data(self.get_session(pk)))
+
+    def partial_update(self, request, pk=None):
+        session = self.get_session(pk)
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError, ValueError):
+            raise ValidationError({'Upload-Offset': ['An integer offset header is required.']})
+        try:
+            # The body is streamed straight to disk; request.data is never parsed.
+            session = chunked_uploads.write_chunk(
+                session.pk, offset, request.stream, length,
+                checksum=request.headers.get('Upload-Checksum')
+            )
+        except chunked_uploads.UploadError as e:
+            response = self.error(e)
+            response['Upload-Offset'] = UploadSession.objects.get(pk=session.pk).offset
+            return response
+        response = Response(self.session_data(session))
+        response['Upload-Offset'] = session.offset
+        return response
+
+    def destroy(self, request, pk=None):
+        chunked_uploads.abort(self.get_session(pk))
+        return Response(status=status.HTTP_204_NO_CONTENT)
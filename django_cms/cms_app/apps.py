@@ -8,3 +8,4 @@ class CmsAppConfig(AppConfig):
 
     def ready(self):
         import cms_app.signals
+        import cms_app.tasks
@@ -0,0 +1,222 @@
+"""
+In-memory prefix index for type-ahead over page titles/slugs and media titles.
+
+Each process keeps a sorted array of `(key, kind, id)` tuples and answers
+prefix queries with `bisect`, so lookups never touch the database. Keys are
+normalized (case- and accent-folded) and include every word-suffix of a title,
+so "des" and "design ser" both find "Web Design Services".
+
+The index is built for a content version, the change feed cursor
+(`ChangeLogEntry.latest_cursor()`), and brought up to date incrementally by
+replaying newer change log entries for pages and media. The version only
+moves up to settled entries, so recent entries are replayed again until no
+entry can appear before them any more. Saves in this process
+mark the index stale so the next lookup catches up immediately; changes made
+by other processes are picked up after `AUTOCOMPLETE_REFRESH_INTERVAL`
+seconds.
+"""
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import namedtuple
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from .models import Page, Media, ChangeLogEntry
+
+Entry = namedtuple('Entry', [
+    'kind', 'id', 'label', 'folded', 'detail', 'slug', 'path', 'is_home', 'public'
+])
+
+KINDS = ('page', 'media')
+
+
+def normalize(text):
+    """Casefold, strip accents and collapse whitespace."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.casefold().split())
+
+
+def index_keys(entry):
+    """Keys an entry is found under: every word-suffix of its label, plus the page slug."""
+    words = entry.folded.split()
+    keys = {' '.join(words[i:]) for i in range(len(words))}
+    if entry.slug:
+        keys.add(entry.slug)
+    return keys
+
+
+def get_setting(name, default):
+    return getattr(settings, name, default)
+
+
+class AutocompleteIndex:
+    """Sorted-array prefix index, safe to share between threads."""
+
+    # Above this many changed objects a full rebuild is cheaper than patching.
+    rebuild_threshold = 2000
+    # Distinct candidates ranked per lookup; bounds the cost of one-letter queries.
+    max_candidates = 200
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.keys = []
+        self.entries = {}
+        self.version = None
+        self.checked_at = 0.0
+        self.stale = False
+
+    # Building and incremental updates
+
+    def load_entries(self, kind, ids=None):
+        """Read current entries of one kind, optionally limited to `ids`."""
+        if kind == 'page':
+            queryset = Page.objects.all()
+            if ids is not None:
+                queryset = queryset.filter(pk__in=ids)
+            for pk, title, slug, status, is_home in queryset.values_list(
+                    'pk', 'title', 'slug', 'status', 'is_home'):
+                yield Entry('page', pk, title, normalize(title), status, slug, None, is_home,
+                            status == 'published')
+        else:
+            queryset = Media.objects.all()
+            if ids is not None:
+                queryset = queryset.filter(pk__in=ids)
+            for pk, title, media_type, name, is_private in queryset.values_list(
+                    'pk', 'title', 'media_type', 'file', 'is_private'):
+                yield Entry('media', pk, title, normalize(title), media_type, None, name, False,
+                            not is_private)
+
+    def rebuild(self):
+        """Rebuild from scratch for the current content version."""
+        version = ChangeLogEntry.latest_cursor()
+        entries = {}
+        keys = []
+        for kind in KINDS:
+            for entry in self.load_entries(kind):
+                entries[(kind, entry.id)] = entry
+                keys.extend((key, kind, entry.id) for key in index_keys(entry))
+        keys.sort()
+
+        with self.lock:
+            self.entries, self.keys = entries, keys
+            self.version = version
+            self.checked_at = time.monotonic()
+            self.stale = False
+
+    def _remove(self, kind, object_id):
+        entry = self.entries.pop((kind, object_id), None)
+        if entry is None:
+            return
+        for key in index_keys(entry):
+            position = bisect_left(self.keys, (key, kind, object_id))
+            if position < len(self.keys) and self.keys[position] == (key, kind, object_id):
+                del self.keys[position]
+
+    def _add(self, entry):
+        if entry.kind == 'page' and entry.is_home:
+            # Page.save() demotes the previous homepage with a queryset update,
+            # which leaves no trace in the change log.
+            for key, other in list(self.entries.items()):
+                if other.kind == 'page' and other.is_home:
+                    self.entries[key] = other._replace(is_home=False)
+        self.entries[(entry.kind, entry.id)] = entry
+        for key in index_keys(entry):
+            insort(self.keys, (key, entry.kind, entry.id))
+
+    def refresh(self, force=False):
+        """Replay change log entries newer than the index version."""
+        interval = get_setting('AUTOCOMPLETE_REFRESH_INTERVAL', 2.0)
+        now = time.monotonic()
+        if self.version is None:
+            self.rebuild()
+            return
+        if not (force or self.stale or now - self.checked_at >= interval):
+            return
+
+        with self.lock:
+            self.stale = False
+            self.checked_at = now
+            changes = list(
+                ChangeLogEntry.objects.filter(id__gt=self.version, model__in=KINDS)
+                .order_by('id').values_list('id', 'model', 'object_id')
+            )
+            if not changes:
+                return
+            changed = {(model, object_id) for _, model, object_id in changes}
+            if len(changed) > self.rebuild_threshold:
+                self.rebuild()
+                return
+
+            for kind in KINDS:
+                ids = [object_id for model, object_id in changed if model == kind]
+                if not ids:
+                    continue
+                current = {entry.id: entry for entry in self.load_entries(kind, ids)}
+                for object_id in ids:
+                    self._remove(kind, object_id)
+                    if object_id in current:
+                        self._add(current[object_id])
+            # Entries that are not settled yet are replayed again next time
+            self.version = max(self.version, min(changes[-1][0], ChangeLogEntry.latest_cursor()))
+
+    def mark_stale(self):
+        self.stale = True
+
+    # Lookups
+
+    def lookup(self, query, limit=10, kinds=KINDS, include_drafts=False):
+        """
+        Return up to `limit` entries whose label or slug has a word starting
+        with `query`. Full-label prefix matches come first, then shorter labels.
+        """
+        prefix = normalize(query)
+        if not prefix:
+            return []
+
+        with self.lock:
+            keys, entries = self.keys, self.entries
+            # Distinct matching entries; one-letter queries stop at max_candidates.
+            matches = {}
+            position = bisect_left(keys, (prefix,))
+            while position < len(keys) and len(matches) < self.max_candidates:
+                key, kind, object_id = keys[position]
+                if not key.startswith(prefix):
+                    break
+                position += 1
+                if kind not in kinds or (kind, object_id) in matches:
+                    continue
+                entry = entries[(kind, object_id)]
+                if entry.public or include_drafts:
+                    matches[(kind, object_id)] = entry
+
+            ranked = sorted(
+                matches.values(),
+                key=lambda entry: (not entry.folded.startswith(prefix), len(entry.folded), entry.folded)
+            )
+        return ranked[:limit]
+
+
+def entry_url(entry):
+    """Public URL of an index entry."""
+    if entry.kind == 'page':
+        if entry.is_home:
+            return '/'
+        return reverse('page_detail', kwargs={'slug': entry.slug})
+    return default_storage.url(entry.path) if entry.path else None
+
+
+_index = AutocompleteIndex()
+
+
+def get_index():
+    """Return this process's index, brought up to date if due."""
+    _index.refresh()
+    return _index
+
+
+def mark_stale():
+    """Make the next lookup replay the change log without waiting for the interval."""
+    _index.mark_stale()
@@ -0,0 +1,182 @@
+"""
+Bulk write helpers for pages, sections, content blocks and gallery images.
+
+Rows are written with bulk SQL instead of one `save()` per row. Callers wrap
+the writes in `transaction.atomic()` and `coalesced_changes()`, so the change
+feed is written in one batch with the rows and the cache is cleared once at
+commit.
+`PageTreeWriter` does that for whole new pages built in memory.
+"""
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+from . import autocomplete
+from .models import (
+    ContentBlock, GalleryImage, Page, Section,
+    record_image_dimensions, record_placeholders, schedule_placeholders,
+)
+from .search import schedule_for_objects
+from .signals import (
+    VISIBILITY_FIELDS, coalesced_changes, record_changes, record_dependent_changes, visibility_changed,
+)
+
+
+def _prepare_for_insert(obj):
+    """Apply the defaults that `save()` would have filled in."""
+    if isinstance(obj, Section) and not obj.anchor_id and obj.title:
+        obj.anchor_id = slugify(obj.title)
+    elif isinstance(obj, Page):
+        if not obj.slug:
+            obj.slug = slugify(obj.title)
+        if not obj.meta_title:
+            obj.meta_title = obj.title
+
+
+def _has_updated_at(model):
+    return any(field.name == 'updated_at' for field in model._meta.concrete_fields)
+
+
+def _record_changes(model, objects, action):
+    if model is GalleryImage:
+        # The change feed serves gallery images as part of their content
+        # block, so the block is what changed.
+        record_changes(ContentBlock, sorted({obj.content_block_id for obj in objects}), 'updated')
+    else:
+        record_changes(model, [obj.pk for obj in objects], action)
+
+
+def create_objects(model, objects, batch_size=500):
+    """Insert unsaved instances and return them with primary keys set."""
+    for obj in objects:
+        _prepare_for_insert(obj)
+    pending = []
+    if hasattr(model, 'image_dimension_fields'):
+        record_image_dimensions(objects)
+        pending = record_placeholders(objects)
+    if model is Page and any(obj.is_home for obj in objects):
+        # Only one homepage
+        Page.objects.filter(is_home=True).update(is_home=False)
+    created = model.objects.bulk_create(objects, batch_size=batch_size)
+    schedule_placeholders(pending)
+    _record_changes(model, created, 'created')
+    schedule_for_objects(created)
+    if model is Page and created:
+        transaction.on_commit(autocomplete.mark_stale)
+    return created
+
+
+def update_objects(model, objects, fields, batch_size=500):
+    """Write `fields` of already-loaded instances back in bulk."""
+    if not objects:
+        return 0
+    fields = set(fields)
+    if not fields:
+        return 0
+    pending = []
+    if hasattr(model, 'image_dimension_fields') and model.image_dimension_fields[0] in fields:
+        record_image_dimensions(objects)
+        pending = record_placeholders(objects)
+        fields.update(model.image_dimension_fields[1:])
+        fields.update(model.placeholder_fields[1:])
+    if _has_updated_at(model):
+        now = timezone.now()
+        for obj in objects:
+            obj.updated_at = now
+        fields.add('updated_at')
+    count = model.objects.bulk_update(objects, sorted(fields), batch_size=batch_size)
+    schedule_placeholders(pending)
+    _record_changes(model, objects, 'updated')
+    if VISIBILITY_FIELDS.get(model) in fields:
+        record_dependent_changes(model, [obj.pk for obj in objects if visibility_changed(obj)])
+    schedule_for_objects(objects)
+    return count
+
+
+def reorder_objects(model, orders, batch_size=500):
+    """
+    Set `order` from a `{pk: order}` mapping.
+    Returns the number of rows updated; unknown keys are ignored.
+    """
+    objects = list(model.objects.filter(pk__in=orders))
+    for obj in objects:
+        obj.order = orders[obj.pk]
+    return update_objects(model, objects, ['order'], batch_size=batch_size)
+
+
+def delete_objects(model, pks):
+    """
+    Delete rows and everything that cascades from them.
+    Per-row delete signals are coalesced by the surrounding batch.
+    """
+    if not pks:
+        return 0
+    if model is GalleryImage:
+        _record_changes(model, GalleryImage.objects.filter(pk__in=pks).only('content_block_id'), 'deleted')
+    deleted, per_model = model.objects.filter(pk__in=pks).delete()
+    return per_model.get(model._meta.label, 0)
+
+
+class PageTreeWriter:
+    """
+    New pages with their sections, content blocks and gallery images, built
+    in memory and written by `save()`: one bulk insert per model, parents
+    first, in one transaction. No per-row signals fire; the change feed is
+    written once, with the rows, and the cache cleared once, at commit.
+
+        writer = PageTreeWriter()
+        page = writer.add_page(Page(title='About', status='published'))
+        section = writer.add_section(page, Section(section_type='text'))
+        writer.add_block(section, ContentBlock(content='<p>Hi</p>'))
+        writer.save()
+    """
+
+    def __init__(self):
+        self.pages = []
+        self.sections = []
+        self.blocks = []
+        self.gallery_images = []
+
+    def __len__(self):
+        return len(self.pages) + len(self.sections) + len(self.blocks) + len(self.gallery_images)
+
+    def add_page(self, page, sections=()):
+        """Add an unsaved page, and its `(section, blocks)` pairs."""
+        self.pages.append(page)
+        for section, blocks in sections:
+            self.add_section(page, section, blocks)
+        return page
+
+    def add_section(self, page, section, blocks=()):
+        """Add an unsaved section of `page` (saved or not), and its blocks."""
+        section.page = page
+        self.sections.append(section)
+        for block in blocks:
+            self.add_block(section, block)
+        return section
+
+    def add_block(self, section, block, gallery_images=()):
+        """Add an unsaved content block of `section`, and its gallery images."""
+        block.section = section
+        self.blocks.append(block)
+        for image in gallery_images:
+            image.content_block = block
+            self.gallery_images.append(image)
+        return block
+
+    def save(self, batch_size=500):
+        """
+        Insert everything added so far and start over. Objects get their
+        primary keys. Returns the number of rows inserted.
+        """
+        count = len(self)
+        with transaction.atomic(), coalesced_changes():
+            for model, objects in [
+                (Page, self.pages), (Section, self.sections),
+                (ContentBlock, self.blocks), (GalleryImage, self.gallery_images),
+            ]:
+                if objects:
+                    # bulk_create takes the parents' new keys from the
+                    # related objects, which are inserted first.
+                    create_objects(model, objects, batch_size=batch_size)
+        self.pages, self.sections, self.blocks, self.gallery_images = [], [], [], []
+        return count
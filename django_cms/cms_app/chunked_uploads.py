@@ -0,0 +1,188 @@
+"""
+Chunked, resumable uploads into the media library.
+
+A client starts an `UploadSession` with the file's name and size (and the
+metadata the `Media` item is to get), then sends
+the file in order as chunks, each with the offset it starts at (and,
+optionally, its SHA-256). Chunks are streamed to a temporary file in
+`CHUNKED_UPLOAD_TEMP_DIR`, so neither a chunk nor the file is ever held in
+memory. After a dropped connection the client reads the session's `offset`
+and continues from there. When the last chunk arrives the file is verified
+against the expected checksum and moved into storage as a `Media` item
+(deduplicated like any other upload).
+"""
+import hashlib
+import os
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from .models import Media, UploadSession
+from .uploads import HASH_CHUNK_SIZE
+
+READ_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """A request the upload session cannot accept; `status` is the HTTP status."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class AssembledUpload(File):
+    """A fully received upload, which file system storage moves into place."""
+
+    def __init__(self, file, name, path, sha256):
+        super().__init__(file, name)
+        self.path = path
+        self.sha256 = sha256
+
+    def temporary_file_path(self):
+        return self.path
+
+
+def get_setting(name, default):
+    return getattr(settings, name, default)
+
+
+def temp_path(session):
+    directory = get_setting('CHUNKED_UPLOAD_TEMP_DIR', 'chunked_uploads')
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'{session.pk}.part')
+
+
+def start(user, filename, size, sha256='', title='', alt_text='', caption='', tags='', is_private=False):
+    """
+    Create an upload session and its empty temporary file. `title`,
+    `alt_text`, `caption`, `tags` and `is_private` are given to the Media
+    item the upload becomes.
+    """
+    filename = os.path.basename(filename or '').strip()
+    if not filename:
+        raise UploadError('A file name is required.')
+    max_size = get_setting('CHUNKED_UPLOAD_MAX_SIZE', 5 * 1024 ** 3)
+    if size <= 0 or size > max_size:
+        raise UploadError(f'Size must be between 1 and {max_size} bytes.', status=413)
+    for name, value in [('title', title), ('alt_text', alt_text), ('tags', tags)]:
+        max_length = UploadSession._meta.get_field(name).max_length
+        if len(value or '') > max_length:
+            raise UploadError(f'The {name} may be at most {max_length} characters.')
+
+    session = UploadSession.objects.create(
+        filename=filename, title=title or '', size=size,
+        alt_text=alt_text or '', caption=caption or '', tags=tags or '', is_private=is_private,
+        sha256=(sha256 or '').lower(), created_by=user
+    )
+    open(temp_path(session), 'wb').close()
+    return session
+
+
+def write_chunk(session_id, offset, stream, length, checksum=None):
+    """
+    Append `length` bytes read from `stream` at `offset`. The offset must
+    equal the bytes received so far; a chunk that is short or fails its
+    checksum is discarded. Completes the upload with the last chunk.
+    Returns the updated session.
+    """
+    max_chunk = get_setting('CHUNKED_UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024)
+    if length is None or length <= 0:
+        raise UploadError('The chunk length is required.', status=411)
+    if length > max_chunk:
+        raise UploadError(f'Chunks may be at most {max_chunk} bytes.', status=413)
+
+    with transaction.atomic():
+        # Serializes concurrent requests for the same session.
+        session = UploadSession.objects.select_for_update().get(pk=session_id)
+        if session.status != 'uploading':
+            raise UploadError('The upload is already complete.', status=409)
+        if offset != session.offset:
+            raise UploadError(f'Expected offset {session.offset}.', status=409)
+        if offset + length > session.size:
+            raise UploadError('The chunk extends past the end of the file.')
+
+        hasher = hashlib.sha256()
+        received = 0
+        with open(temp_path(session), 'r+b') as f:
+            # Drop anything left over from an interrupted request.
+            f.truncate(offset)
+            f.seek(offset)
+            while received < length:
+                data = stream.read(min(READ_SIZE, length - received))
+                if not data:
+                    break
+                hasher.update(data)
+                f.write(data)
+                received += len(data)
+            if received != length:
+                f.truncate(offset)
+                raise UploadError(f'Received {received} of {length} bytes.')
+            if checksum and checksum.lower() != hasher.hexdigest():
+                f.truncate(offset)
+                raise UploadError('Chunk checksum mismatch.')
+
+        session.offset += length
+        session.save(update_fields=['offset', 'updated_at'])
+        reset = session.offset == session.size and complete(session) is None
+    if reset:
+        # Raised outside the transaction so the reset is kept.
+        raise UploadError('File checksum mismatch; the upload was reset.')
+    return session
+
+
+def complete(session):
+    """
+    Verify the received file and turn it into a Media item, which is
+    returned. A file that does not match the expected checksum is discarded
+    and the session reset to offset 0; returns None then.
+    """
+    path = temp_path(session)
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    digest = hasher.hexdigest()
+    if session.sha256 and session.sha256 != digest:
+        # Start over: the chunks were accepted but the file is not the one
+        # the client meant to send.
+        open(path, 'wb').close()
+        session.offset = 0
+        session.save(update_fields=['offset', 'updated_at'])
+        return None
+
+    with open(path, 'rb') as f:
+        upload = AssembledUpload(f, session.filename, path, digest)
+        media = Media(
+            title=session.title or os.path.splitext(session.filename)[0],
+            file=upload,
+            alt_text=session.alt_text or None,
+            caption=session.caption or None,
+            tags=session.tags or None,
+            is_private=session.is_private,
+            uploaded_by=session.created_by,
+        )
+        media.save()
+    if os.path.exists(path):
+        # Content already in the library; nothing was moved.
+        os.remove(path)
+
+    session.status = 'complete'
+    session.media = media
+    session.save(update_fields=['status', 'media', 'updated_at'])
+    return media
+
+
+def abort(session):
+    """Delete a session and its partial file."""
+    path = temp_path(session)
+    if os.path.exists(path):
+        os.remove(path)
+    session.delete()
+
+
+def expired_sessions():
+    """Sessions, finished or not, without activity for `CHUNKED_UPLOAD_EXPIRY_HOURS`."""
+    cutoff = timezone.now() - timedelta(hours=get_setting('CHUNKED_UPLOAD_EXPIRY_HOURS', 24))
+    return UploadSession.objects.filter(updated_at__lt=cutoff)
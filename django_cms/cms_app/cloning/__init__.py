@@ -0,0 +1,4 @@
+"""
+Building blocks for the site clone commands: fetching, crawling
+and asset downloads.
+"""
@@ -0,0 +1,147 @@
+"""
+Offline archive of HTTP responses for the clone commands.
+
+An `Archive` is a SQLite file holding one response (final URL, status,
+headers and body) per requested URL. A `RecordingFetcher` fetches like a
+`Fetcher` and stores every response it gets, error statuses included. A
+`ReplayFetcher` answers from the archive alone, so a recorded clone can be
+re-run without network access, at local speed and with identical input.
+Replay honours If-None-Match and If-Modified-Since against the recorded
+validators, so incremental re-clones behave as they would live.
+"""
+import io
+import json
+import sqlite3
+import threading
+import time
+import requests
+from .fetch import DOWNLOAD_CHUNK_SIZE, FetchResult, Fetcher
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    final_url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    elapsed REAL NOT NULL,
+    recorded_at REAL NOT NULL
+)
+"""
+
+
+class NotArchived(requests.RequestException):
+    """A URL requested during replay that the archive has no response for."""
+
+
+class Archive:
+    """Recorded responses in a SQLite file; safe to share between threads."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(SCHEMA)
+
+    @property
+    def connection(self):
+        """The calling thread's connection."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            self._local.connection = connection
+        return connection
+
+    def put(self, url, result):
+        """Store the response to a request for `url`, replacing an earlier one."""
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, result.url, result.status, json.dumps(result.headers),
+                 result.body or b'', result.elapsed, time.time())
+            )
+
+    def get(self, url):
+        """The `FetchResult` recorded for `url`, or None."""
+        row = self.connection.execute(
+            'SELECT final_url, status, headers, body, elapsed FROM responses WHERE url = ?', (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        final_url, status, headers, body, elapsed = row
+        return FetchResult(url=final_url, status=status, headers=json.loads(headers), body=body, elapsed=elapsed)
+
+    def urls(self):
+        """The recorded URLs, in order."""
+        return [row[0] for row in self.connection.execute('SELECT url FROM responses ORDER BY url')]
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+
+class RecordingFetcher(Fetcher):
+    """A `Fetcher` that stores every response in an `Archive`."""
+
+    def __init__(self, archive, **kwargs):
+        super().__init__(**kwargs)
+        self.archive = archive
+
+    def fetch(self, url, headers=None, file=None):
+        # A streamed body is also kept in memory, to be stored.
+        buffer = io.BytesIO() if file is not None else None
+        try:
+            result = super().fetch(url, headers=headers, file=Tee(file, buffer) if file is not None else None)
+        except requests.HTTPError as e:
+            response = e.response
+            if response is not None:
+                self.archive.put(url, FetchResult(
+                    url=response.url, status=response.status_code,
+                    headers={name.lower(): value for name, value in response.headers.items()},
+                    body=response.content, elapsed=response.elapsed.total_seconds(),
+                ))
+            raise
+        if result.status != 304:
+            # A 304 only says the caller's copy is current; keep the recorded body.
+            self.archive.put(url, result._replace(body=buffer.getvalue()) if buffer is not None else result)
+        return result
+
+
+class Tee:
+    """Writes to two file objects."""
+
+    def __init__(self, first, second):
+        self.first = first
+        self.second = second
+
+    def write(self, data):
+        self.first.write(data)
+        self.second.write(data)
+
+
+class ReplayFetcher:
+    """Answers fetches from an `Archive`, without network access."""
+
+    def __init__(self, archive):
+        self.archive = archive
+
+    def fetch(self, url, headers=None, file=None):
+        """Like `Fetcher.fetch`; raises `NotArchived` for URLs that were not recorded."""
+        result = self.archive.get(url)
+        if result is None:
+            raise NotArchived(f'{url} is not in the archive {self.archive.path}')
+        if result.status >= 400:
+            raise requests.HTTPError(f'{result.status} Error (recorded) for url: {result.url}')
+        if self.is_not_modified(result, headers or {}):
+            return result._replace(status=304, body=b'' if file is None else None)
+        if file is not None:
+            for start in range(0, len(result.body), DOWNLOAD_CHUNK_SIZE):
+                file.write(result.body[start:start + DOWNLOAD_CHUNK_SIZE])
+            return result._replace(body=None)
+        return result
+
+    def is_not_modified(self, result, headers):
+        etag = headers.get('If-None-Match')
+        if etag:
+            return etag == result.headers.get('etag')
+        last_modified = headers.get('If-Modified-Since')
+        return bool(last_modified) and last_modified == result.headers.get('last-modified')
@@ -0,0 +1,301 @@
+"""
+Asset downloads for the site import.
+
+An image is downloaded as soon as a page linking it is mapped: `add()` and
+`link()` start the download on a thread pool. Each response is streamed in
+chunks into a temporary file while being hashed, so no image is ever held in
+memory. `wait()` blocks until the downloads of a page's links have finished.
+`resolve()` then stores the new files and points the linked fields at them.
+Content already in the media library (same SHA-256) is reused. New files are
+moved into storage and inserted as `Media` rows with one `bulk_create` per
+page. `add()` and `link()` are meant to be called from one thread, and
+`resolve()` from one other thread (the pipeline's map and persist stages).
+
+With a `FetchLog` (see `cms_app.cloning.incremental`) assets are fetched
+conditionally, and an asset that has not changed keeps its media item.
+With `skip_downloads`, nothing is fetched and only files downloaded by
+earlier runs are linked.
+"""
+import hashlib
+import mimetypes
+import os
+import tempfile
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+import requests
+from PIL import Image
+from django.core.files.storage import default_storage
+from django.db import transaction
+from cms_app import autocomplete, placeholders
+from cms_app.chunked_uploads import AssembledUpload
+from cms_app.models import Media, MediaBlob
+from cms_app.signals import record_changes
+from cms_app.uploads import media_type_for_name
+from .crawler import normalize_url
+
+# A downloaded file waiting in `path` to be stored; `width` is None for
+# files that are not readable images. `result` is the `FetchResult`.
+Download = namedtuple('Download', [
+    'url', 'path', 'filename', 'sha256', 'size', 'width', 'height', 'dominant_color', 'placeholder',
+    'result',
+])
+
+
+class HashingWriter:
+    """File wrapper that hashes and counts what is written through it."""
+
+    def __init__(self, file):
+        self.file = file
+        self.hasher = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.hasher.update(data)
+        self.size += len(data)
+        self.file.write(data)
+
+
+def filename_for(url, content_type, index):
+    """File name for a downloaded URL, with an extension if one can be told."""
+    filename = os.path.basename(urlsplit(url).path)
+    if not filename:
+        filename = f'image_{index}'
+    if not os.path.splitext(filename)[1]:
+        extension = mimetypes.guess_extension(content_type.split(';')[0].strip()) if content_type else None
+        filename += extension or '.jpg'
+    return filename
+
+
+def probe_image(path):
+    """(width, height, dominant color, placeholder) of an image file; Nones if unreadable."""
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None, None, '', ''
+    color, placeholder = placeholders.compute([path])[0]
+    return width, height, color, placeholder
+
+
+class AssetDownloader:
+    """Downloads the assets of an import in the background and stores each file once."""
+
+    def __init__(self, fetcher, user=None, workers=8, log=None, skip_downloads=False):
+        self.fetcher = fetcher
+        self.user = user
+        self.log = log
+        self.skip_downloads = skip_downloads
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='asset')
+        # Absolute URL -> Future of a Download, until resolved. A URL is
+        # only removed once it is in `media`, so it is always in one of them.
+        self.futures = {}
+        # Absolute URL -> Media, or None if the download failed
+        self.media = {}
+        # Guards checking `futures` and `media` and starting a download
+        self._lock = threading.Lock()
+        self.errors = []
+        self.created = 0
+        self.reused = 0
+
+    def add(self, url, base=None):
+        """
+        Start downloading an asset URL, resolved against `base`. Returns the
+        absolute URL, or None for URLs that cannot be downloaded (e.g. data:
+        URIs).
+        """
+        url = normalize_url(url, base) if url else None
+        if url is None:
+            return url
+        with self._lock:
+            if url in self.media or url in self.futures:
+                return url
+            if self.log is not None and self.log.is_done(url):
+                self.media[url] = self.log.usable(url).media
+            elif not self.skip_downloads:
+                self.futures[url] = self.pool.submit(self.fetch_asset, url, len(self.futures))
+        return url
+
+    def known_media(self, url):
+        """The media item last downloaded from `url`, if any."""
+        if self.media.get(url) is not None:
+            return self.media[url]
+        record = self.log.usable(url) if self.log is not None else None
+        return record.media if record is not None else None
+
+    def link(self, obj, field_name, url, base=None):
+        """
+        Start downloading the asset `obj.<field_name>` should point at.
+        Returns the absolute URL to pass to `resolve()`, or None if no file
+        will be available. With `skip_downloads` the field is set right
+        away, if the asset was downloaded before.
+        """
+        url = self.add(url, base)
+        if url is not None and self.skip_downloads:
+            media = self.known_media(url)
+            if media is None:
+                return None
+            setattr(obj, field_name, media.file.name)
+        return url
+
+    def wait(self, links):
+        """Wait for the downloads of `(obj, field_name, url)` links to finish."""
+        with self._lock:
+            futures = [self.futures.get(url) for _, _, url in links]
+        # Downloads resolved meanwhile are gone; they are finished anyway
+        wait([future for future in futures if future is not None])
+
+    def resolve(self, links):
+        """
+        Store the downloads of `(obj, field_name, url)` links that are not
+        stored yet and set the fields to their files. Returns the ids of
+        the objects whose download failed; their fields are left as they are.
+        """
+        downloads, unchanged, resolved = [], [], []
+        for url in sorted({url for _, _, url in links}):
+            with self._lock:
+                future = self.futures.get(url)
+            if future is None:
+                continue
+            resolved.append(url)
+            try:
+                download = future.result()
+            except (requests.RequestException, OSError) as e:
+                self.media[url] = None
+                self.errors.append((url, e))
+                continue
+            if self.log is not None and self.log.is_unchanged(url, download.result, download.sha256):
+                self.media[url] = self.log.usable(url).media
+                unchanged.append(download)
+            else:
+                downloads.append(download)
+
+        try:
+            self.created += self.store(downloads)
+        finally:
+            for download in downloads + unchanged:
+                if os.path.exists(download.path):
+                    os.remove(download.path)
+        if self.log is not None:
+            self.log.save(
+                [self.log.record(download.url, download.result) for download in unchanged]
+                + [
+                    self.log.record(
+                        download.url, download.result,
+                        content_hash=download.sha256, media=self.media[download.url]
+                    )
+                    for download in downloads
+                ]
+            )
+        with self._lock:
+            # Every resolved URL is in `media` by now
+            for url in resolved:
+                del self.futures[url]
+
+        failed = set()
+        for obj, field_name, url in links:
+            media = self.media.get(url) or self.known_media(url)
+            if media is None:
+                failed.add(id(obj))
+            else:
+                setattr(obj, field_name, media.file.name)
+        return failed
+
+    def close(self):
+        """Stop downloading and remove the files of downloads never resolved."""
+        self.pool.shutdown(cancel_futures=True)
+        with self._lock:
+            futures = list(self.futures.values())
+        for future in futures:
+            if not future.cancelled() and future.exception() is None:
+                path = future.result().path
+                if os.path.exists(path):
+                    os.remove(path)
+        self.futures = {}
+
+    def fetch_asset(self, url, index):
+        """Stream one URL into a temporary file. Runs in a worker thread."""
+        handle, path = tempfile.mkstemp(suffix='.download')
+        try:
+            with os.fdopen(handle, 'wb') as f:
+                writer = HashingWriter(f)
+                headers = self.log.validators(url) if self.log is not None else None
+                result = self.fetcher.fetch(url, headers=headers, file=writer)
+            if result.status == 304:
+                width, height, color, placeholder = None, None, '', ''
+            else:
+                width, height, color, placeholder = probe_image(path)
+        except BaseException:
+            os.remove(path)
+            raise
+        return Download(
+            url=url,
+            path=path,
+            filename=filename_for(result.url, result.headers.get('content-type'), index),
+            sha256=writer.hasher.hexdigest(),
+            size=writer.size,
+            width=width,
+            height=height,
+            dominant_color=color,
+            placeholder=placeholder,
+            result=result,
+        )
+
+    def store(self, downloads):
+        """Map each download to a `Media` row, inserting the new contents in bulk."""
+        hashes = {download.sha256 for download in downloads}
+        by_hash = {}
+        for media in Media.objects.filter(content_hash__in=hashes).order_by('pk'):
+            by_hash.setdefault(media.content_hash, media)
+        self.reused += len(by_hash)
+
+        blobs = MediaBlob.objects.in_bulk(hashes - set(by_hash), field_name='sha256')
+        objects = []
+        moved_blobs = []
+        for download in downloads:
+            if download.sha256 in by_hash:
+                continue
+            media = Media(
+                title=download.filename,
+                media_type=media_type_for_name(download.filename),
+                file_size=download.size,
+                width=download.width,
+                height=download.height,
+                dominant_color=download.dominant_color,
+                placeholder=download.placeholder,
+                content_hash=download.sha256,
+                # Images Pillow cannot read fail here as they would in process_media
+                processing_status='failed' if self.is_unreadable(download) else 'ready',
+                uploaded_by=self.user,
+            )
+            blob = blobs.get(download.sha256)
+            if blob is not None and default_storage.exists(blob.name):
+                media.file.name = blob.name
+            else:
+                name = media.file.field.generate_filename(media, download.filename)
+                with open(download.path, 'rb') as f:
+                    media.file.name = default_storage.save(
+                        name, AssembledUpload(f, download.filename, download.path, download.sha256)
+                    )
+                if blob is not None:
+                    blob.name = media.file.name
+                    moved_blobs.append(blob)
+            by_hash[download.sha256] = media
+            objects.append(media)
+
+        with transaction.atomic():
+            created = Media.objects.bulk_create(objects)
+            record_changes(Media, [media.pk for media in created], 'created')
+            MediaBlob.acquire_many(created, blobs)
+            MediaBlob.objects.bulk_update(moved_blobs, ['name'])
+            if created:
+                transaction.on_commit(autocomplete.mark_stale)
+
+        for download in downloads:
+            self.media[download.url] = by_hash[download.sha256]
+        return len(created)
+
+    def is_unreadable(self, download):
+        return (media_type_for_name(download.filename) == 'image' and download.width is None
+                and not download.filename.lower().endswith('.svg'))
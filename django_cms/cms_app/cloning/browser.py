@@ -0,0 +1,234 @@
+"""
+Headless browser rendering for the site import.
+
+A `BrowserPool` holds up to `size` Chrome sessions. Each session is started
+on first use and then reused for every later page, so a crawl pays the
+browser start-up once per session rather than once per page. `fetch()` has
+the signature of `Fetcher.fetch`, which lets the `Crawler` render pages on
+the pool just as it fetches them over HTTP, one page per session at a time.
+
+A page counts as loaded once its document is complete and the network is
+idle, i.e. no resource (script, XHR, image...) has finished loading for
+`idle_time` seconds. This replaces fixed sleeps, which were too short for
+slow pages and wasted time on fast ones. A page whose network never goes
+idle (polling, analytics beacons) is taken as it is after `ready_timeout`.
+
+Sites behind bot protection set cookies in the browser that the asset
+downloads need as well; `share_cookies()` copies them into a `Fetcher`,
+which should also send the pool's `user_agent`.
+"""
+import queue
+import re
+import threading
+import time
+from contextlib import contextmanager
+import requests
+from .fetch import FetchResult
+
+try:
+    from selenium import webdriver
+    from selenium.common.exceptions import TimeoutException, WebDriverException
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from webdriver_manager.chrome import ChromeDriverManager
+    SELENIUM_AVAILABLE = True
+except ImportError:
+    SELENIUM_AVAILABLE = False
+
+USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+)
+POLL_INTERVAL = 0.1
+NUMBER_RE = re.compile(r'\d+')
+
+# Resource timing stops recording after 250 entries by default, which would
+# make busy pages look idle. Raised before any of the page's scripts run.
+RESOURCE_BUFFER_SCRIPT = 'performance.setResourceTimingBufferSize(100000)'
+RESOURCE_COUNT_SCRIPT = "return performance.getEntriesByType('resource').length"
+
+
+def rgb_to_hex(rgb_string):
+    """Convert a CSS "rgb(r, g, b)" or "rgba(r, g, b, a)" color to hex; None if it is neither."""
+    if rgb_string.startswith('#'):
+        return rgb_string
+    numbers = NUMBER_RE.findall(rgb_string)
+    if len(numbers) >= 3:
+        r, g, b = int(numbers[0]), int(numbers[1]), int(numbers[2])
+        return f'#{r:02x}{g:02x}{b:02x}'
+    return None
+
+
+def computed_colors(driver, primary_selector):
+    """
+    Colors read from the computed styles of the page loaded in a session:
+    the primary color is the background of the first element matching
+    `primary_selector`. Colors that cannot be read are left out.
+    """
+    colors = {}
+    try:
+        elements = driver.find_elements(By.CSS_SELECTOR, primary_selector)
+        if elements:
+            primary = rgb_to_hex(elements[0].value_of_css_property('background-color') or '')
+            if primary:
+                colors['primary'] = primary
+    except WebDriverException:
+        pass
+    return colors
+
+
+class RenderError(requests.RequestException):
+    """A page the browser could not load."""
+
+
+class BrowserPool:
+    """Reusable headless Chrome sessions; safe to share between threads."""
+
+    def __init__(self, size=4, headless=True, page_load_timeout=30, ready_timeout=15, idle_time=0.5,
+                 user_agent=USER_AGENT):
+        self.size = size
+        self.headless = headless
+        self.page_load_timeout = page_load_timeout
+        self.ready_timeout = ready_timeout
+        self.idle_time = idle_time
+        self.user_agent = user_agent
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.SimpleQueue()
+        self._drivers = []
+        self._lock = threading.Lock()
+        self._driver_path = None
+
+    def start_driver(self):
+        """Start a Chrome session."""
+        with self._lock:
+            if self._driver_path is None:
+                self._driver_path = ChromeDriverManager().install()
+
+        options = Options()
+        if self.headless:
+            options.add_argument('--headless=new')
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        options.add_argument('--disable-blink-features=AutomationControlled')
+        options.add_argument(f'--user-agent={self.user_agent}')
+
+        driver = webdriver.Chrome(service=Service(self._driver_path), options=options)
+        driver.set_page_load_timeout(self.page_load_timeout)
+        driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': RESOURCE_BUFFER_SCRIPT})
+        with self._lock:
+            self._drivers.append(driver)
+        return driver
+
+    @contextmanager
+    def session(self):
+        """
+        Borrow a browser session, waiting for one if all `size` are in use.
+        A session that fails other than by timing out is closed, not reused.
+        """
+        with self._slots:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                driver = self.start_driver()
+            try:
+                yield driver
+            except TimeoutException:
+                self._idle.put(driver)
+                raise
+            except WebDriverException:
+                self.discard(driver)
+                raise
+            else:
+                self._idle.put(driver)
+
+    def discard(self, driver):
+        with self._lock:
+            self._drivers.remove(driver)
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    def render(self, driver, url):
+        """Load `url` in a session and return the rendered document as a `FetchResult`."""
+        started = time.perf_counter()
+        driver.get(url)
+        WebDriverWait(driver, self.ready_timeout, poll_frequency=POLL_INTERVAL).until(
+            lambda d: d.execute_script('return document.readyState') == 'complete'
+        )
+        self.wait_for_network_idle(driver)
+        return FetchResult(
+            url=driver.current_url,
+            # WebDriver does not expose the response status
+            status=200,
+            headers={'content-type': 'text/html; charset=utf-8'},
+            body=driver.page_source.encode('utf-8'),
+            elapsed=time.perf_counter() - started,
+        )
+
+    def wait_for_network_idle(self, driver):
+        """
+        Wait until no resource has finished loading for `idle_time`. Returns
+        False if that did not happen within `ready_timeout`.
+        """
+        deadline = time.monotonic() + self.ready_timeout
+        count = driver.execute_script(RESOURCE_COUNT_SCRIPT)
+        idle_since = time.monotonic()
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            current = driver.execute_script(RESOURCE_COUNT_SCRIPT)
+            if current != count:
+                count, idle_since = current, time.monotonic()
+            elif time.monotonic() - idle_since >= self.idle_time:
+                return True
+        return False
+
+    def fetch(self, url, headers=None):
+        """
+        Render a page on the next free session, like `Fetcher.fetch`.
+        `headers` are ignored: a browser cannot make conditional requests.
+        Raises `RenderError` if the page cannot be loaded.
+        """
+        try:
+            with self.session() as driver:
+                return self.render(driver, url)
+        except WebDriverException as e:
+            raise RenderError(f'Could not render {url}: {e.msg or e.__class__.__name__}') from e
+
+    def share_cookies(self, fetcher):
+        """
+        Copy the cookies of all sessions into `fetcher`'s cookie jar. Call
+        it while no session is in use, e.g. once the first page is rendered
+        and before the asset downloads start.
+        """
+        with self._lock:
+            drivers = list(self._drivers)
+        shared = 0
+        for driver in drivers:
+            for cookie in driver.get_cookies():
+                fetcher.cookies.set(
+                    cookie['name'], cookie['value'],
+                    domain=cookie.get('domain', ''), path=cookie.get('path', '/'),
+                    secure=cookie.get('secure', False),
+                )
+                shared += 1
+        return shared
+
+    def close(self):
+        """Quit all sessions."""
+        with self._lock:
+            drivers, self._drivers = self._drivers, []
+        self._idle = queue.SimpleQueue()
+        for driver in drivers:
+            try:
+                driver.quit()
+            except WebDriverException:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
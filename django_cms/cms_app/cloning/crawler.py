@@ -0,0 +1,204 @@
+"""
+Breadth-first crawling for the site import pipeline.
+
+A `Frontier` hands out the URLs to crawl: links to the start URL's site
+only, each URL once, up to `max_pages` pages, with `index` and `depth`
+recording the discovery order. A `Crawler` provides the two crawl stages of
+the pipeline (see `cms_app.cloning.pipeline`). `fetch` gets a page, and
+`parse` builds its soup and adds its internal links to the frontier. The
+frontier runs dry once nothing is queued and every URL it handed out has
+been fetched and parsed.
+
+With a `FetchLog` (see `cms_app.cloning.incremental`) pages are fetched
+conditionally. A page that has not changed since the last run is passed on
+without a soup, and its recorded links are followed. Pages the current run
+already completed are not fetched at all.
+
+The fetcher can be anything with `Fetcher.fetch`'s signature, such as a
+`BrowserPool` that renders pages in headless browsers. Responses the caller
+already has can be passed as `prefetched` so they are not fetched again.
+"""
+import hashlib
+import os
+import threading
+from collections import deque, namedtuple
+from urllib.parse import urljoin, urlsplit, urlunsplit
+import requests
+from .fetch import is_html
+from .parsers import DEFAULT_PARSER, parse
+
+# A fetched page on its way to the parse stage
+FetchedPage = namedtuple('FetchedPage', ['url', 'index', 'depth', 'result', 'content_hash'])
+
+# `soup` is None for pages that have not changed since they were recorded;
+# `result` is None for pages the current run already completed.
+CrawledPage = namedtuple('CrawledPage', ['url', 'index', 'depth', 'soup', 'links', 'result', 'content_hash'])
+
+# Links to files rather than pages are not crawled.
+SKIP_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif', '.svg', '.ico', '.bmp',
+    '.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.zip', '.rar',
+    '.mp4', '.webm', '.mov', '.mp3', '.wav', '.css', '.js', '.json', '.xml', '.txt',
+}
+
+
+def normalize_url(url, base=None):
+    """
+    Absolute URL without fragment, with lowercase scheme and host and a
+    non-empty path; None for links that are not http(s).
+    """
+    url = urljoin(base, url.strip()) if base else url.strip()
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.netloc:
+        return None
+    netloc = parts.netloc.lower()
+    if (parts.scheme, netloc.rsplit(':', 1)[-1]) in (('http', '80'), ('https', '443')):
+        netloc = netloc.rsplit(':', 1)[0]
+    return urlunsplit((parts.scheme.lower(), netloc, parts.path or '/', parts.query, ''))
+
+
+def site_of(url):
+    """Host of a URL without a leading `www.`, to compare sites."""
+    host = urlsplit(url).netloc.lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def is_page_link(url):
+    return os.path.splitext(urlsplit(url).path)[1].lower() not in SKIP_EXTENSIONS
+
+
+class Frontier:
+    """
+    The URLs left to crawl. Iterating yields `(url, index, depth)` and
+    blocks until a URL is queued or the crawl is over.
+    """
+
+    def __init__(self, start_url, max_pages=200):
+        self.max_pages = max_pages
+        self.seen = {start_url}
+        self.crawled = set()
+        self.queue = deque([(start_url, 0)])
+        self.scheduled = 0
+        # URLs handed out and not yet done
+        self.in_progress = 0
+        self.closed = False
+        self._condition = threading.Condition()
+
+    def __iter__(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self.queue or not self.in_progress or self.closed)
+                if self.closed or not self.queue:
+                    return
+                url, depth = self.queue.popleft()
+                index = self.scheduled
+                self.scheduled += 1
+                self.in_progress += 1
+            yield url, index, depth
+
+    def add(self, links, depth):
+        """Queue the links not seen yet, as long as the page limit allows."""
+        with self._condition:
+            for link in links:
+                if link not in self.seen and len(self.seen) < self.max_pages:
+                    self.seen.add(link)
+                    self.queue.append((link, depth))
+            self._condition.notify_all()
+
+    def claim(self, url):
+        """Whether the page at `url` (a final URL, after redirects) is crawled for the first time."""
+        with self._condition:
+            if url in self.crawled:
+                return False
+            self.crawled.add(url)
+            self.seen.add(url)
+            return True
+
+    def done(self):
+        """Mark a URL handed out as finished: its links, if any, are queued."""
+        with self._condition:
+            self.in_progress -= 1
+            self._condition.notify_all()
+
+    def close(self):
+        """End the crawl early."""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+
+class Crawler:
+    """The fetch and parse stages of a crawl of the site of `start_url`."""
+
+    def __init__(self, fetcher, start_url, max_pages=200, log=None, parser=DEFAULT_PARSER, prefetched=None):
+        self.fetcher = fetcher
+        self.start_url = normalize_url(start_url)
+        self.site = site_of(self.start_url)
+        self.frontier = Frontier(self.start_url, max_pages)
+        self.log = log
+        self.parser = parser
+        # Normalized URL -> FetchResult
+        self.prefetched = {normalize_url(url): result for url, result in (prefetched or {}).items()}
+        self.errors = []
+
+    def is_internal(self, url):
+        return url is not None and site_of(url) == self.site and is_page_link(url)
+
+    def fetch(self, item):
+        """
+        Fetch stage: fetch a `(url, index, depth)` from the frontier. Pages
+        that need no parsing go on as `CrawledPage`s, the others as
+        `FetchedPage`s; failures and responses that are not HTML end here.
+        """
+        url, index, depth = item
+        # The start page is always parsed: the site configuration and the
+        # menu come from it.
+        conditional = self.log is not None and url != self.start_url
+        if conditional and self.log.is_done(url):
+            return self.skip(CrawledPage(url, index, depth, None, self.log.usable(url).links, None, ''))
+
+        try:
+            result = self.prefetched.pop(url, None) or self.fetcher.fetch(
+                url, headers=self.log.validators(url) if conditional else None
+            )
+        except requests.RequestException as e:
+            self.errors.append((url, e))
+            self.frontier.done()
+            return []
+        content_hash = hashlib.sha256(result.body).hexdigest()
+        if conditional and self.log.is_unchanged(url, result, content_hash):
+            return self.skip(CrawledPage(url, index, depth, None, self.log.usable(url).links, result, content_hash))
+        if not is_html(result):
+            self.frontier.done()
+            return []
+        return [FetchedPage(url, index, depth, result, content_hash)]
+
+    def skip(self, page):
+        """Pass on a page that is not parsed again, following its recorded links."""
+        try:
+            if not self.frontier.claim(page.url):
+                return []
+            self.frontier.add(page.links, page.depth + 1)
+            return [page]
+        finally:
+            self.frontier.done()
+
+    def parse(self, page):
+        """Parse stage: build the soup of a `FetchedPage` and queue its internal links."""
+        if isinstance(page, CrawledPage):
+            return [page]
+        try:
+            url = normalize_url(page.result.url)
+            if not self.frontier.claim(url):
+                # A redirect to a page crawled already
+                return []
+            soup = parse(page.result.body, self.parser)
+            links = []
+            for anchor in soup.find_all('a', href=True):
+                link = normalize_url(anchor['href'], page.result.url)
+                if self.is_internal(link):
+                    links.append(link)
+            self.frontier.add(links, page.depth + 1)
+        finally:
+            self.frontier.done()
+        return [CrawledPage(url, page.index, page.depth, soup, links, page.result, page.content_hash)]
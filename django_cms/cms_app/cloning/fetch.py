@@ -0,0 +1,134 @@
+"""
+HTTP fetching for the clone commands.
+
+A `Fetcher` can be shared by any number of threads: each thread gets its own
+`requests.Session` (sessions are not thread-safe), and a `HostLimiter` caps
+the requests in flight to each host and spaces their starts by a politeness
+delay. All sessions share one cookie jar, `Fetcher.cookies`, which can be
+seeded with cookies from elsewhere (see `BrowserPool.share_cookies`).
+Transient failures (connection errors, 429 and 5xx responses) are
+retried with exponential backoff. Large files can be streamed into a file
+object instead of being read into memory; a download that fails after part
+of its body was written is not retried, as the file cannot be taken back.
+"""
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+import requests
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'DNT': '1',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# `url` is the final URL after redirects; `headers` has lowercase names;
+# `body` is None for responses streamed into a file.
+FetchResult = namedtuple('FetchResult', ['url', 'status', 'headers', 'body', 'elapsed'])
+
+
+def is_html(result):
+    return 'html' in result.headers.get('content-type', 'text/html')
+
+
+class HostLimiter:
+    """
+    At most `per_host` concurrent requests per host, started at least
+    `delay` seconds apart.
+    """
+
+    def __init__(self, per_host=4, delay=0.0):
+        self.per_host = per_host
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_start = {}
+
+    @contextmanager
+    def slot(self, host):
+        with self._lock:
+            semaphore = self._semaphores.setdefault(host, threading.BoundedSemaphore(self.per_host))
+        semaphore.acquire()
+        try:
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_start.get(host, 0))
+                self._next_start[host] = start + self.delay
+            if start > now:
+                time.sleep(start - now)
+            yield
+        finally:
+            semaphore.release()
+
+
+class Fetcher:
+    """Thread-safe, host-limited HTTP GETs."""
+
+    def __init__(self, per_host=4, delay=0.0, timeout=30, retries=2, headers=None):
+        self.limiter = HostLimiter(per_host, delay)
+        self.timeout = timeout
+        self.retries = retries
+        self.headers = dict(DEFAULT_HEADERS, **(headers or {}))
+        # CookieJar locks internally, so the thread sessions can share it
+        self.cookies = requests.cookies.RequestsCookieJar()
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        """The calling thread's session."""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            session.cookies = self.cookies
+            self._local.session = session
+        return session
+
+    def fetch(self, url, headers=None, file=None):
+        """
+        GET a URL and return a `FetchResult`. With `file`, a successful
+        response's body is written to it in chunks instead. Raises
+        `requests.RequestException` when the request still fails after the
+        retries, or fails once part of the body was written to `file`.
+        """
+        host = urlsplit(url).netloc
+        written = False
+        for attempt in range(self.retries + 1):
+            try:
+                with self.limiter.slot(host):
+                    started = time.perf_counter()
+                    response = self.session.get(
+                        url, headers=headers, timeout=self.timeout, stream=file is not None
+                    )
+                    if file is not None and response.ok:
+                        body = None
+                        for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                            written = True
+                            file.write(chunk)
+                    else:
+                        body = response.content
+                    elapsed = time.perf_counter() - started
+            except (requests.ConnectionError, requests.Timeout):
+                # A retry would append the whole body to the part written
+                if attempt == self.retries or written:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    response.raise_for_status()
+                    return FetchResult(
+                        url=response.url,
+                        status=response.status_code,
+                        headers={name.lower(): value for name, value in response.headers.items()},
+                        body=body,
+                        elapsed=elapsed,
+                    )
+            time.sleep(2 ** attempt)
@@ -0,0 +1,405 @@
+"""
+Import of a whole site into the CMS.
+
+A `SiteImport` crawls a site and recreates every page in the CMS through a
+`Pipeline` (see `cms_app.cloning.pipeline`) of five stages:
+
+    fetch    pages over HTTP, or rendered by a `BrowserPool`
+    parse    the HTML, queueing the internal links to crawl
+    map      the soup onto unsaved sections and blocks (`SiteMapper`),
+             starting the image downloads
+    assets   wait for the page's images
+    persist  the page, its sections and blocks and its new media items;
+             new pages in batches written in bulk (`PageTreeWriter`),
+             pages cloned before in one transaction each
+
+Only the persist stage writes to the database. Once the crawl is done,
+buttons and menu links pointing at crawled pages are rewritten to link to
+the CMS pages.
+
+Re-runs are incremental (see `cms_app.cloning.incremental`): unchanged
+pages are not parsed again, and only content that differs is written.
+"""
+from urllib.parse import urljoin, urlsplit
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+from cms_app.bulk import PageTreeWriter, create_objects, delete_objects, update_objects
+from cms_app.models import CloneRun, ContentBlock, MenuItem, Page, Section, SiteConfiguration
+from cms_app.signals import coalesced_changes
+from .assets import AssetDownloader
+from .browser import BrowserPool, computed_colors
+from .crawler import Crawler, normalize_url
+from .incremental import FetchLog, sync_objects
+from .mapping import SiteMapper
+from .parsers import DEFAULT_PARSER
+from .pipeline import Pipeline, Stage
+
+User = get_user_model()
+
+# Fields compared when re-cloned content is diffed against existing rows
+SECTION_FIELDS = [
+    'section_type', 'title', 'anchor_id', 'is_visible', 'background_color', 'background_image', 'order'
+]
+BLOCK_FIELDS = [
+    'block_type', 'title', 'content', 'image', 'image_alt', 'link_text', 'link_url', 'button_style', 'order'
+]
+MENU_FIELDS = ['label', 'link_type', 'page_id', 'section_id', 'external_url', 'is_visible', 'order']
+
+# Records of unchanged pages are saved in batches of this size
+RECORD_BATCH_SIZE = 100
+# New pages are written in batches of this size
+PAGE_BATCH_SIZE = 25
+
+
+class SiteImport:
+    """
+    One import of the site described by `rules` (see `cms_app.cloning.sites`),
+    fetching pages with `fetcher` and images with `asset_fetcher`. Progress
+    is written to `stdout`, styled with `style`.
+    """
+
+    def __init__(self, rules, fetcher, stdout, style, asset_fetcher=None, start_url=None, max_pages=200,
+                 concurrency=8, full=False, resume=False, parser=DEFAULT_PARSER, skip_images=False):
+        self.rules = rules
+        self.fetcher = fetcher
+        self.asset_fetcher = asset_fetcher or fetcher
+        self.stdout = stdout
+        self.style = style
+        self.start_url = start_url or rules.start_url
+        self.max_pages = max_pages
+        self.concurrency = concurrency
+        self.full = full
+        self.resume = resume
+        self.parser = parser
+        self.skip_images = skip_images
+        # Crawled (normalized) URL -> cloned Page
+        self.pages_by_url = {}
+        # (button block, absolute link URL), rewritten once all pages exist
+        self.button_links = []
+        # Slugs taken, by cloned pages and by pages authored in the CMS
+        self.slugs = set()
+        self.unchanged_records = []
+        # (mapped page, unsaved Page) of new pages not written yet
+        self.new_pages = []
+        self.home_soup = None
+        self.cloned = self.unchanged = 0
+
+    def run(self):
+        """Import the site. Returns False if the homepage could not be fetched."""
+        self.user = User.objects.filter(is_superuser=True).first()
+        self.clone_run = self.start_run()
+        self.log = FetchLog(self.clone_run, full=self.full)
+        self.pages_by_url = {url: record.page for url, record in self.log.records.items() if record.page}
+        # Pages not cloned before are never taken over, only the homepage
+        self.slugs = set(Page.objects.values_list('slug', flat=True))
+        self.assets = AssetDownloader(
+            self.asset_fetcher, user=self.user, workers=self.concurrency, log=self.log,
+            skip_downloads=self.skip_images,
+        )
+
+        try:
+            prefetched, colors = {}, None
+            if isinstance(self.fetcher, BrowserPool):
+                # The colors come from the live homepage, and the cookies the
+                # site sets on the first visit are needed for the images.
+                self.stdout.write('Loading homepage...')
+                with self.fetcher.session() as driver:
+                    prefetched[self.start_url] = self.fetcher.render(driver, self.start_url)
+                    colors = computed_colors(driver, self.rules.primary_color_selector)
+                self.fetcher.share_cookies(self.asset_fetcher)
+
+            self.stdout.write(f'Importing {self.start_url}...')
+            crawler = Crawler(
+                self.fetcher, self.start_url, max_pages=self.max_pages, log=self.log, parser=self.parser,
+                prefetched=prefetched,
+            )
+            self.mapper = SiteMapper(self.rules, self.assets, colors=colors)
+            pipeline = Pipeline([
+                Stage('fetch', crawler.fetch, workers=self.concurrency),
+                Stage('parse', crawler.parse),
+                Stage('map', self.mapper.map),
+                Stage('assets', self.wait_for_assets, workers=self.concurrency),
+                Stage('persist', self.persist),
+            ], source=crawler.frontier)
+            pipeline.run()
+            self.save_new_pages()
+        finally:
+            self.assets.close()
+        self.log.save(self.unchanged_records)
+
+        for url, error in crawler.errors:
+            self.stdout.write(self.style.WARNING(f'Failed to fetch {url}: {str(error)}'))
+        for url, error in self.assets.errors:
+            self.stdout.write(self.style.WARNING(f'  ✗ Failed to download {url}: {str(error)}'))
+        if self.home_soup is None:
+            self.stdout.write(self.style.ERROR('Failed to fetch homepage'))
+            return False
+        self.stdout.write(self.style.SUCCESS(
+            f'  ✓ Cloned {self.cloned} pages ({self.unchanged} unchanged); '
+            f'{self.assets.created} images added to the library ({self.assets.reused} already there)'
+        ))
+
+        self.stdout.write('Setting up navigation...')
+        self.rewrite_button_links()
+        self.setup_navigation(self.home_soup)
+
+        self.clone_run.finished_at = timezone.now()
+        self.clone_run.save(update_fields=['finished_at'])
+
+        self.stdout.write('')
+        self.stdout.write('Stage timings:')
+        for line in pipeline.report():
+            self.stdout.write(f'  {line}')
+        return True
+
+    def start_run(self):
+        """The interrupted run to resume, or a new run."""
+        if self.resume:
+            run = CloneRun.objects.filter(start_url=self.start_url, finished_at__isnull=True).first()
+            if run:
+                self.stdout.write(f'Resuming the run started {run.started_at:%Y-%m-%d %H:%M}')
+                return run
+            self.stdout.write('No interrupted run to resume; starting a new one')
+        return CloneRun.objects.create(start_url=self.start_url)
+
+    def wait_for_assets(self, mapped):
+        """Assets stage: wait until the page's images are downloaded."""
+        if mapped.assets:
+            self.assets.wait(mapped.assets)
+        return [mapped]
+
+    def persist(self, mapped):
+        """Persist stage: write a mapped page, in one transaction."""
+        crawled = mapped.crawled
+        if crawled.soup is None:
+            self.unchanged += 1
+            if crawled.result is not None:
+                self.unchanged_records.append(self.log.record(crawled.url, crawled.result))
+            if len(self.unchanged_records) >= RECORD_BATCH_SIZE:
+                self.log.save(self.unchanged_records)
+                self.unchanged_records = []
+            return
+
+        page = self.pages_by_url.get(crawled.url)
+        if crawled.index != 0 and page is None:
+            self.add_new_page(mapped, self.slug_for(crawled.url))
+            return
+
+        # Cache invalidation and search reindex happen once, at commit.
+        with transaction.atomic(), coalesced_changes():
+            missing = self.assets.resolve(mapped.assets)
+            self.link_buttons(mapped)
+            if crawled.index == 0:
+                self.setup_site_config(mapped.site, missing)
+                page = self.save_homepage(mapped, missing)
+                self.home_soup = crawled.soup
+            else:
+                self.save_page(mapped, page, missing)
+            self.log.save([self.page_record(crawled, page)])
+        self.pages_by_url[crawled.url] = page
+        self.cloned += 1
+
+    def page_record(self, crawled, page):
+        return self.log.record(
+            crawled.url, crawled.result, page=page, links=crawled.links, content_hash=crawled.content_hash,
+        )
+
+    def link_buttons(self, mapped):
+        """Point the page's buttons at pages cloned so far; the rest are rewritten at the end."""
+        for block, url in mapped.buttons:
+            block.link_url = self.cms_url_for(url) or block.link_url
+        self.button_links.extend(mapped.buttons)
+
+    def add_new_page(self, mapped, slug):
+        """Queue a page that is not in the CMS yet, writing the queue once it is full."""
+        values = dict(mapped.values, title=mapped.values['title'] or slug)
+        page = Page(
+            slug=slug, status='published', order=mapped.crawled.index,
+            created_by=self.user, updated_by=self.user, **values
+        )
+        # Links to it can point at its CMS URL before it is written
+        self.pages_by_url[mapped.crawled.url] = page
+        self.new_pages.append((mapped, page))
+        if len(self.new_pages) >= PAGE_BATCH_SIZE:
+            self.save_new_pages()
+
+    def save_new_pages(self):
+        """
+        Write the queued new pages with their sections, blocks, media items
+        and fetch records, all in one transaction.
+        """
+        batch, self.new_pages = self.new_pages, []
+        if not batch:
+            return
+        writer = PageTreeWriter()
+        with transaction.atomic(), coalesced_changes():
+            missing = self.assets.resolve([link for mapped, page in batch for link in mapped.assets])
+            for mapped, page in batch:
+                self.link_buttons(mapped)
+                writer.add_page(page, [
+                    # Blocks whose image failed to download are left out
+                    (section, [block for block in blocks if id(block) not in missing])
+                    for section, blocks in mapped.sections
+                ])
+            rows = writer.save()
+            self.log.save([self.page_record(mapped.crawled, page) for mapped, page in batch])
+        for mapped, page in batch:
+            self.stdout.write(self.style.SUCCESS(f'  ✓ Page /{page.slug}/: {page.title} (new)'))
+        self.stdout.write(self.style.SUCCESS(f'  ✓ Wrote {len(batch)} new pages ({rows} rows)'))
+        self.cloned += len(batch)
+
+    def setup_site_config(self, site, missing):
+        """Apply the site configuration read from the homepage."""
+        config, created = SiteConfiguration.objects.get_or_create(id=1)
+        for name, value in vars(site).items():
+            if name != 'logo' or id(site) not in missing:
+                setattr(config, name, value)
+        config.save()
+        self.stdout.write(self.style.SUCCESS(f'  ✓ Site configured: {config.site_name}'))
+
+    def save_homepage(self, mapped, missing):
+        """Write the homepage."""
+        homepage, created = Page.objects.get_or_create(
+            slug='home',
+            defaults={
+                'title': 'Home',
+                'status': 'published',
+                'is_home': True,
+                'order': 0,
+                'created_by': self.user,
+                'updated_by': self.user,
+            }
+        )
+        # The homepage keeps its title
+        values = {name: value for name, value in mapped.values.items() if name != 'title'}
+        self.update_page(homepage, values)
+        counts = self.save_sections(homepage, mapped.sections, missing)
+        self.slugs.add(homepage.slug)
+        self.stdout.write(self.style.SUCCESS(f'  ✓ Homepage: {self.describe_counts(counts)}'))
+        return homepage
+
+    def slug_for(self, url):
+        """A slug for a crawled URL, not taken by any page."""
+        parts = urlsplit(url)
+        base = slugify(f'{parts.path} {parts.query}')[:190] or 'page'
+        slug, suffix = base, 2
+        while slug in self.slugs:
+            slug = f'{base}-{suffix}'
+            suffix += 1
+        self.slugs.add(slug)
+        return slug
+
+    def save_page(self, mapped, page, missing):
+        """Write a crawled page over the page it was cloned into before."""
+        values = dict(mapped.values, title=mapped.values['title'] or page.slug)
+        self.update_page(page, values)
+
+        counts = self.save_sections(page, mapped.sections, missing)
+        self.stdout.write(self.style.SUCCESS(
+            f'  ✓ Page /{page.slug}/: {values["title"]} ({self.describe_counts(counts)})'
+        ))
+
+    def update_page(self, page, values):
+        """Set page fields, saving the page only if one of them changed."""
+        changed = [name for name, value in values.items() if getattr(page, name) != value]
+        for name in changed:
+            setattr(page, name, values[name])
+        if changed:
+            page.save()
+
+    def save_sections(self, page, parsed, missing):
+        """
+        Write parsed `(section, blocks)` over the page's sections and
+        blocks, changing only what differs. Objects in `missing` lack their
+        image. Returns the number of rows (created, updated, deleted).
+        """
+        existing_blocks = {}
+        for block in ContentBlock.objects.filter(section__page=page).order_by('order', 'pk'):
+            existing_blocks.setdefault(block.section_id, []).append(block)
+
+        def is_missing(obj):
+            return id(obj) in missing
+
+        sections = [section for section, blocks in parsed]
+        for section in sections:
+            section.page = page
+        counts = [sync_objects(
+            Section, list(page.sections.order_by('order', 'pk')), sections, SECTION_FIELDS,
+            is_missing=is_missing, insert_missing=True,
+        )]
+        for section, blocks in parsed:
+            for block in blocks:
+                block.section = section
+            counts.append(sync_objects(
+                ContentBlock, existing_blocks.get(section.pk, []), blocks, BLOCK_FIELDS,
+                is_missing=is_missing,
+            ))
+        return tuple(sum(count[index] for count in counts) for index in range(3))
+
+    def describe_counts(self, counts):
+        created, updated, deleted = counts
+        if not any(counts):
+            return 'no changes'
+        return f'{created} rows created, {updated} updated, {deleted} deleted'
+
+    def cms_url_for(self, url):
+        """CMS URL of a link to a cloned page (keeping its #anchor), or None."""
+        page = self.pages_by_url.get(normalize_url(url))
+        if page is None:
+            return None
+        fragment = urlsplit(url).fragment
+        return f'{page.get_absolute_url()}#{fragment}' if fragment else page.get_absolute_url()
+
+    def rewrite_button_links(self):
+        """Point buttons that link to pages cloned after them at the cloned pages."""
+        rewritten = []
+        for block, url in self.button_links:
+            target = self.cms_url_for(url)
+            if block.pk and target and target != block.link_url:
+                block.link_url = target
+                rewritten.append(block)
+        with transaction.atomic(), coalesced_changes():
+            update_objects(ContentBlock, rewritten, ['link_url'])
+        self.stdout.write(self.style.SUCCESS(f'  ✓ Rewrote {len(rewritten)} button links'))
+
+    def setup_navigation(self, soup):
+        """Setup navigation menu from the site; the menu is only rewritten if it changed."""
+        links = self.mapper.menu_links(soup)
+        if links is None:
+            self.stdout.write(self.style.WARNING('  No navigation found'))
+            links = []
+
+        items = []
+        for text, href in links:
+            # Links to cloned pages and their sections stay inside the CMS
+            url = urljoin(self.start_url, href)
+            page = self.pages_by_url.get(normalize_url(url))
+            fragment = urlsplit(url).fragment
+            section = page.sections.filter(anchor_id=fragment).first() if page and fragment else None
+
+            if section:
+                item = MenuItem(label=text, link_type='section', page=page, section=section)
+            elif page:
+                item = MenuItem(label=text, link_type='page', page=page)
+            else:
+                # External link, or a page that was not crawled
+                item = MenuItem(label=text, link_type='external', external_url=href)
+            item.is_visible = True
+            item.order = len(items)
+            items.append(item)
+
+        existing = list(MenuItem.objects.order_by('order', 'pk'))
+        internal = sum(1 for item in items if item.link_type != 'external')
+        if list(map(self.menu_signature, items)) == list(map(self.menu_signature, existing)):
+            self.stdout.write(self.style.SUCCESS(f'  ✓ Menu unchanged ({len(items)} items)'))
+            return
+
+        with transaction.atomic(), coalesced_changes():
+            delete_objects(MenuItem, [item.pk for item in existing])
+            create_objects(MenuItem, items)
+        self.stdout.write(self.style.SUCCESS(f'  ✓ Created {len(items)} menu items ({internal} internal)'))
+
+    def menu_signature(self, item):
+        return tuple(getattr(item, name) for name in MENU_FIELDS)
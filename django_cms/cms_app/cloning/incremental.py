@@ -0,0 +1,137 @@
+"""
+Incremental re-cloning.
+
+A `FetchLog` keeps one `FetchRecord` per URL a clone run fetched. A record
+holds the response's ETag and Last-Modified, which are sent back as
+If-None-Match and If-Modified-Since so that unchanged resources come back
+as an empty 304. It also holds the SHA-256 of the body, which recognizes
+unchanged pages on servers without validators. Finally it holds the page or
+media item made from the URL and the page's links, so an unchanged page is
+still crawled through without being fetched again.
+
+Records double as the checkpoint of a run: each one names the last
+`CloneRun` that completed the URL, and a resumed run skips the URLs it has
+already completed.
+
+`sync_objects` writes freshly parsed content over the existing rows
+position by position, writing only the rows that differ.
+"""
+from django.db.models.fields.files import FieldFile
+from cms_app.bulk import create_objects, delete_objects, update_objects
+from cms_app.models import FetchRecord
+
+RECORD_FIELDS = ['etag', 'last_modified', 'content_hash', 'links', 'page', 'media', 'last_run', 'fetched_at']
+
+
+class FetchLog:
+    """The fetch records of a clone run; `full` ignores them for conditional fetching."""
+
+    def __init__(self, run, full=False):
+        self.run = run
+        self.full = full
+        self.records = {
+            record.url: record
+            for record in FetchRecord.objects.select_related('page', 'media')
+        }
+
+    def usable(self, url):
+        """The record of `url` if the page or media made from it still exists."""
+        record = self.records.get(url)
+        if record is not None and (record.page_id or record.media_id):
+            return record
+        return None
+
+    def is_done(self, url):
+        """Whether the current run already completed `url` (before it was interrupted)."""
+        record = self.usable(url)
+        return record is not None and record.last_run_id == self.run.pk
+
+    def validators(self, url):
+        """Conditional request headers for `url`."""
+        record = self.usable(url)
+        if record is None or self.full:
+            return {}
+        headers = {}
+        if record.etag:
+            headers['If-None-Match'] = record.etag
+        if record.last_modified:
+            headers['If-Modified-Since'] = record.last_modified
+        return headers
+
+    def is_unchanged(self, url, result, content_hash):
+        """Whether a response shows that `url` has not changed since it was recorded."""
+        record = self.usable(url)
+        if record is None or self.full:
+            return False
+        return result.status == 304 or (bool(content_hash) and content_hash == record.content_hash)
+
+    def record(self, url, result=None, **values):
+        """
+        The updated, unsaved record of `url`: validators from `result`
+        (unless it is a 304), this run as the last one to complete it, and
+        other fields from `values`.
+        """
+        record = self.records.get(url) or FetchRecord(url=url)
+        if result is not None and result.status != 304:
+            record.etag = result.headers.get('etag', '')[:255]
+            record.last_modified = result.headers.get('last-modified', '')[:64]
+        record.last_run = self.run
+        for name, value in values.items():
+            setattr(record, name, value)
+        return record
+
+    def save(self, records):
+        """Insert or update records in one statement."""
+        if records:
+            FetchRecord.objects.bulk_create(
+                records, update_conflicts=True, unique_fields=['url'], update_fields=RECORD_FIELDS
+            )
+            for record in records:
+                self.records[record.url] = record
+
+
+def field_value(obj, name):
+    value = getattr(obj, name)
+    if isinstance(value, FieldFile):
+        return value.name or ''
+    return value
+
+
+def sync_objects(model, existing, parsed, fields, is_missing=None, insert_missing=False):
+    """
+    Make the rows `existing` match the unsaved instances `parsed`, both in
+    order: the n-th instance takes over the n-th row, and only rows whose
+    `fields` differ are written. Instances left over are inserted and rows
+    left over are deleted. Instances for which `is_missing` returns True
+    lack their file because its download failed (see
+    `AssetDownloader.resolve`). An empty file field on them keeps the row's
+    file, and unless `insert_missing` they are not inserted. Returns the
+    number of rows (created, updated, deleted).
+    """
+    is_missing = is_missing or (lambda obj: False)
+    new, changed, changed_fields = [], [], set()
+    for index, obj in enumerate(parsed):
+        row = existing[index] if index < len(existing) else None
+        if row is None:
+            if insert_missing or not is_missing(obj):
+                new.append(obj)
+            continue
+
+        obj.pk = row.pk
+        obj._state.adding = False
+        obj._state.db = row._state.db
+        differences = []
+        for name in fields:
+            value = field_value(obj, name)
+            if value == '' and is_missing(obj) and isinstance(getattr(obj, name), FieldFile):
+                setattr(obj, name, getattr(row, name).name)
+            elif value != field_value(row, name):
+                differences.append(name)
+        if differences:
+            changed.append(obj)
+            changed_fields.update(differences)
+
+    created = create_objects(model, new)
+    update_objects(model, changed, changed_fields)
+    deleted = delete_objects(model, [row.pk for row in existing[len(parsed):]])
+    return len(created), len(changed), deleted
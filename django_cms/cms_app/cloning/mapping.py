@@ -0,0 +1,265 @@
+"""
+Mapping of crawled pages onto CMS content, for the site import.
+
+A `SiteMapper` turns the soup of a crawled page into unsaved `Section`s and
+`ContentBlock`s, following the `SiteRules` of the site (see
+`cms_app.cloning.sites`). It touches no database, so it runs in a pipeline
+stage of its own. Images are only linked (see `AssetDownloader.link`),
+which starts their downloads; buttons keep their original link until the
+persist stage can point them at the cloned pages. The homepage also yields
+the site configuration and the menu.
+"""
+import re
+from collections import namedtuple
+from types import SimpleNamespace
+from urllib.parse import urljoin
+from cms_app.models import ContentBlock, Section
+
+BACKGROUND_COLOR_RE = re.compile(r'background-color:\s*([^;]+)')
+NON_SLUG_RE = re.compile(r'[^a-z0-9]+')
+
+DEFAULT_COLORS = {
+    'primary': '#007bff',
+    'secondary': '#6c757d',
+    'background': '#ffffff',
+    'text': '#212529',
+}
+
+# `values` are `Page` fields; `sections` are unsaved `(section, blocks)`;
+# `assets` are `(obj, field_name, url)` links and `buttons` are
+# `(block, absolute url)`. `site` holds `SiteConfiguration` fields and is
+# None except for the homepage. All but `crawled` are None for pages that
+# were not parsed.
+MappedPage = namedtuple('MappedPage', ['crawled', 'values', 'sections', 'assets', 'buttons', 'site'])
+
+
+class SiteMapper:
+    """Maps crawled pages onto CMS content by the `rules` of their site."""
+
+    def __init__(self, rules, assets, colors=None):
+        self.rules = rules
+        self.assets = assets
+        # Colors read from the rendered homepage, if any
+        self.colors = colors
+
+    def map(self, crawled):
+        """Map stage: the `MappedPage` of a `CrawledPage`."""
+        if crawled.soup is None:
+            return [MappedPage(crawled, None, None, None, None, None)]
+        soup = crawled.soup
+        assets, buttons = [], []
+        sections = self.sections(soup, crawled.url, assets, buttons)
+        site = self.site_values(soup, crawled.url, assets) if crawled.index == 0 else None
+        return [MappedPage(crawled, self.page_values(soup), sections, assets, buttons, site)]
+
+    def link_image(self, obj, field_name, src, base, assets):
+        url = self.assets.link(obj, field_name, src, base)
+        if url is not None:
+            assets.append((obj, field_name, url))
+        return url
+
+    def page_values(self, soup):
+        """Title and meta fields of the page; the title is empty if the page has none."""
+        heading = soup.find('h1')
+        title_tag = soup.find('title')
+        page_title = title_tag.get_text(strip=True) if title_tag else ''
+        values = {
+            'title': ((heading.get_text(strip=True) if heading else '') or page_title)[:200],
+        }
+        if page_title:
+            values['meta_title'] = page_title[:200]
+        meta_desc = soup.find('meta', attrs={'name': 'description'})
+        if meta_desc:
+            values['meta_description'] = meta_desc.get('content', '')[:160]
+        return values
+
+    def extract_colors(self, soup):
+        """Extract color scheme from the page."""
+        colors = dict(DEFAULT_COLORS, **(self.colors or {}))
+        if self.colors is None:
+            # Try to extract from inline styles
+            for style_tag in soup.find_all('style'):
+                style_content = style_tag.string
+                if style_content:
+                    primary_match = self.rules.primary_color.search(style_content)
+                    if primary_match:
+                        colors['primary'] = primary_match.group(1)
+        return colors
+
+    def site_values(self, soup, base, assets):
+        """`SiteConfiguration` fields from the homepage, the logo linked."""
+        colors = self.extract_colors(soup)
+        title_tag = soup.find('title')
+        site = SimpleNamespace(
+            site_name=(title_tag.get_text(strip=True) if title_tag else '') or self.rules.site_name,
+            primary_color=colors['primary'],
+            secondary_color=colors['secondary'],
+            text_color=colors['text'],
+            background_color=colors['background'],
+        )
+
+        logo = soup.find('img', class_=self.rules.logo) or soup.find('img', alt=self.rules.logo)
+        if logo and logo.get('src'):
+            self.link_image(site, 'logo', logo['src'], base, assets)
+
+        footer = soup.find('footer')
+        if footer:
+            site.footer_text = str(footer)
+            site.footer_background_color = '#343a40'
+            site.footer_text_color = '#ffffff'
+
+        meta_desc = soup.find('meta', attrs={'name': 'description'})
+        if meta_desc:
+            site.default_meta_description = meta_desc.get('content', '')
+        return site
+
+    def find_first(self, soup, candidates):
+        for tag, kwargs in candidates:
+            element = soup.find(tag, **kwargs)
+            if element:
+                return element
+        return None
+
+    def sections(self, soup, base, assets, buttons):
+        """Parse the page into unsaved `(section, blocks)` pairs."""
+        main_content = self.find_first(soup, self.rules.main_content) or soup.body
+        if not main_content:
+            return []
+
+        # Look for common section patterns
+        elements = main_content.find_all(self.rules.section_tags, class_=self.rules.section_class)
+        if not elements:
+            # Fallback: treat major divs as sections
+            elements = main_content.find_all('div', recursive=False)
+
+        parsed = [
+            self.section_from_element(element, order, base, assets, buttons)
+            for order, element in enumerate(elements[:self.rules.max_sections])
+        ]
+
+        # If no sections found, create a generic content section
+        if not parsed:
+            parsed.append(self.generic_section(main_content))
+        return parsed
+
+    def section_type(self, class_str):
+        for keywords, section_type in self.rules.section_types:
+            if any(keyword in class_str for keyword in keywords):
+                return section_type
+        return 'text'
+
+    def section_from_element(self, element, order, base, assets, buttons):
+        """Create an unsaved CMS section and its blocks from an HTML element."""
+        class_str = ' '.join(element.get('class', [])).lower()
+
+        title_elem = element.find(['h1', 'h2', 'h3'])
+        title = title_elem.get_text(strip=True) if title_elem else f'Section {order + 1}'
+
+        bg_color = None
+        style = element.get('style', '')
+        if 'background-color' in style:
+            color_match = BACKGROUND_COLOR_RE.search(style)
+            if color_match:
+                bg_color = color_match.group(1).strip()
+
+        section = Section(
+            section_type=self.section_type(class_str),
+            title=title,
+            anchor_id=NON_SLUG_RE.sub('-', title.lower()).strip('-'),
+            is_visible=True,
+            background_color=bg_color,
+            order=order
+        )
+
+        bg_img_elem = element.find('img', class_=self.rules.background_class)
+        if bg_img_elem:
+            self.link_image(section, 'background_image', bg_img_elem.get('src'), base, assets)
+
+        return section, self.content_blocks(element, section, base, assets, buttons)
+
+    def content_blocks(self, element, section, base, assets, buttons):
+        """Parse unsaved content blocks from a section element."""
+        blocks = []
+
+        text_content = []
+        for child in element.children:
+            if getattr(child, 'name', None) in self.rules.text_tags:
+                text = child.get_text(strip=True)
+                if text and len(text) > self.rules.min_text_length:
+                    text_content.append(str(child))
+
+        if text_content:
+            blocks.append(ContentBlock(
+                section=section,
+                block_type='rich_text',
+                content=''.join(text_content),
+                order=len(blocks)
+            ))
+
+        for img in element.find_all('img', limit=self.rules.max_images):
+            src = img.get('src')
+            if src and not self.is_background_image(img):
+                block = ContentBlock(
+                    section=section,
+                    block_type='image',
+                    image_alt=img.get('alt', ''),
+                    title=img.get('title', ''),
+                    order=len(blocks)
+                )
+                if self.link_image(block, 'image', src, base, assets):
+                    blocks.append(block)
+
+        for btn in element.find_all('a', class_=self.rules.button_class, limit=self.rules.max_buttons):
+            href = btn.get('href', '#')
+            text = btn.get_text(strip=True)
+            if text:
+                block = ContentBlock(
+                    section=section,
+                    block_type='button',
+                    link_text=text,
+                    link_url=href,
+                    button_style='primary',
+                    order=len(blocks)
+                )
+                blocks.append(block)
+                buttons.append((block, urljoin(base, href)))
+        return blocks
+
+    def is_background_image(self, img):
+        """Check if an image is likely a background image."""
+        class_str = ' '.join(img.get('class', [])).lower()
+        return any(keyword in class_str for keyword in self.rules.background_keywords)
+
+    def generic_section(self, content):
+        """Create an unsaved generic section with all content."""
+        section = Section(
+            section_type='text',
+            title='Main Content',
+            anchor_id='main-content',
+            order=0
+        )
+
+        text_elements = content.find_all(self.rules.generic_tags)
+        content_html = ''.join(str(elem) for elem in text_elements[:self.rules.max_generic_elements])
+
+        blocks = []
+        if content_html:
+            blocks.append(ContentBlock(
+                section=section,
+                block_type='rich_text',
+                content=content_html,
+                order=0
+            ))
+        return section, blocks
+
+    def menu_links(self, soup):
+        """`(label, href)` of the site's navigation links, in order."""
+        nav = self.find_first(soup, self.rules.navigation)
+        if not nav:
+            return None
+        links = []
+        for link in nav.find_all('a', limit=self.rules.max_menu_items):
+            text = link.get_text(strip=True)
+            if text and text.lower() not in self.rules.skip_menu_labels:
+                links.append((text, link.get('href', '#')))
+        return links
@@ -0,0 +1,33 @@
+"""
+HTML parsing backends for the clone commands.
+
+The cloners extract content through the BeautifulSoup tree API. Which
+parser builds that tree makes a large difference: lxml's C parser builds it
+several times faster than Python's `html.parser`. Installed backends are
+registered in `PARSERS` and one is selected per run (`--parser`).
+`DEFAULT_PARSER` is the fastest one available. Backends can disagree on
+malformed markup, which `benchmark_parsers` reports alongside their speed.
+"""
+from bs4 import BeautifulSoup, FeatureNotFound
+
+# Fastest first; all are BeautifulSoup tree builders
+CANDIDATES = ['lxml', 'html5lib', 'html.parser']
+
+
+def _available(name):
+    try:
+        BeautifulSoup('', name)
+    except FeatureNotFound:
+        return False
+    return True
+
+
+PARSERS = [name for name in CANDIDATES if _available(name)]
+DEFAULT_PARSER = PARSERS[0]
+
+
+def parse(markup, parser=DEFAULT_PARSER):
+    """Parse an HTML document (bytes or str) with the named backend."""
+    if parser not in PARSERS:
+        raise ValueError(f'Unknown or unavailable HTML parser {parser!r} (available: {", ".join(PARSERS)})')
+    return BeautifulSoup(markup, parser)
@@ -0,0 +1,137 @@
+"""
+Staged pipelines for the site import.
+
+A `Pipeline` runs a sequence of `Stage`s, each on its own worker threads,
+connected by bounded queues. Every stage works on its items while the stages
+before it produce more. A full queue makes the stage that feeds it wait, so
+the fetch stage cannot run arbitrarily far ahead of the database writes and
+memory stays bounded. A stage's function takes one item and returns the
+items for the next stage, any number of them. The first stage takes its
+items from a source iterable.
+
+Each stage keeps timings: the time its function ran (`busy`) and the time
+it waited for room in the next queue (`blocked`). The `report()` shows which
+stage limits the throughput. If a stage function raises, the pipeline
+stops: the source is closed (if it has a `close()`), queued items are
+dropped, and `run()` re-raises the exception.
+"""
+import queue
+import threading
+import time
+from django.db import connections
+
+DEFAULT_QUEUE_SIZE = 16
+# End of the stream, one per worker
+DONE = object()
+
+
+class Stage:
+    """A pipeline step: `function` applied by `workers` threads to the items of a bounded queue."""
+
+    def __init__(self, name, function, workers=1, queue_size=DEFAULT_QUEUE_SIZE):
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.inbox = queue.Queue(maxsize=queue_size)
+        self.items = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+        self._lock = threading.Lock()
+
+    def account(self, busy=0.0, blocked=0.0, items=0):
+        with self._lock:
+            self.busy += busy
+            self.blocked += blocked
+            self.items += items
+
+
+class Pipeline:
+    """Stages run concurrently over the items of `source`."""
+
+    def __init__(self, stages, source):
+        self.stages = stages
+        self.source = source
+        self.error = None
+        self.elapsed = 0.0
+        self._aborted = threading.Event()
+        self._lock = threading.Lock()
+        self._running = [stage.workers for stage in stages]
+
+    def run(self):
+        """Push every item of the source through the stages; returns when all are done."""
+        started = time.perf_counter()
+        threads = [
+            threading.Thread(target=self.work, args=(index,), name=f'{stage.name}-{worker}', daemon=True)
+            for index, stage in enumerate(self.stages)
+            for worker in range(stage.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for item in self.source:
+                if self._aborted.is_set():
+                    break
+                self.stages[0].inbox.put(item)
+        except BaseException as e:
+            self.abort(e)
+        finally:
+            for _ in range(self.stages[0].workers):
+                self.stages[0].inbox.put(DONE)
+            for thread in threads:
+                thread.join()
+            self.elapsed = time.perf_counter() - started
+        if self.error is not None:
+            raise self.error
+
+    def work(self, index):
+        stage = self.stages[index]
+        following = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        try:
+            while True:
+                item = stage.inbox.get()
+                if item is DONE:
+                    break
+                if self._aborted.is_set():
+                    continue
+                started = time.perf_counter()
+                try:
+                    outputs = list(stage.function(item) or ())
+                except BaseException as e:
+                    self.abort(e)
+                    continue
+                finished = time.perf_counter()
+                if following is not None:
+                    for output in outputs:
+                        following.inbox.put(output)
+                stage.account(busy=finished - started, blocked=time.perf_counter() - finished, items=1)
+        finally:
+            # Database connections are per thread
+            connections.close_all()
+            with self._lock:
+                self._running[index] -= 1
+                last = not self._running[index]
+            if last and following is not None:
+                for _ in range(following.workers):
+                    following.inbox.put(DONE)
+
+    def abort(self, error):
+        with self._lock:
+            if self.error is None:
+                self.error = error
+        self._aborted.set()
+        close = getattr(self.source, 'close', None)
+        if close is not None:
+            close()
+
+    def report(self):
+        """One line of timings per stage."""
+        lines = []
+        for stage in self.stages:
+            capacity = self.elapsed * stage.workers
+            lines.append(
+                f'{stage.name:<8} {stage.items:6d} items  {stage.workers:2d} workers  '
+                f'busy {stage.busy:7.2f}s  blocked {stage.blocked:6.2f}s  '
+                f'{stage.busy / capacity if capacity else 0:4.0%} utilized'
+            )
+        lines.append(f'{"total":<8} {self.elapsed:.2f}s')
+        return lines
@@ -0,0 +1,76 @@
+"""
+A local stand-in for a site to clone, for tests and benchmarks.
+
+`StaticSiteServer` serves a directory over HTTP on a local port from a
+background thread, answering conditional requests as a real server would.
+`delay` adds latency to every response. With `cookie` ("name=value") it
+behaves like a site behind bot protection: pages set the cookie, and every
+other file is refused with 403 unless the request sends the cookie back.
+This is how asset downloads fail when they do not share the browser's
+cookies.
+
+    with StaticSiteServer('/tmp/site', cookie='visitor=ok') as server:
+        call_command('import_site', server.url)
+"""
+import functools
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+
+class StaticSiteHandler(SimpleHTTPRequestHandler):
+    def __init__(self, *args, site=None, **kwargs):
+        self.site = site
+        super().__init__(*args, directory=site.root, **kwargs)
+
+    def is_page(self):
+        path = urlsplit(self.path).path
+        return path.endswith(('/', '.html', '.htm'))
+
+    def do_GET(self):
+        if self.site.delay:
+            time.sleep(self.site.delay)
+        if self.site.cookie and not self.is_page() and self.site.cookie not in self.headers.get('Cookie', ''):
+            self.send_error(403, 'Cookie required')
+            return
+        super().do_GET()
+
+    def end_headers(self):
+        if self.site.cookie and self.is_page():
+            self.send_header('Set-Cookie', f'{self.site.cookie}; Path=/')
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StaticSiteServer:
+    """Serves the files under `root` at `url`; `port` 0 picks a free one."""
+
+    def __init__(self, root, port=0, cookie=None, delay=0.0):
+        self.root = str(root)
+        self.cookie = cookie
+        self.delay = delay
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), functools.partial(StaticSiteHandler, site=self))
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.httpd.server_port}'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
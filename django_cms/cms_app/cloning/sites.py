@@ -0,0 +1,102 @@
+"""
+Mapping rules for the sites `import_site` knows.
+
+A `SiteRules` describes how the pages of one site map onto CMS content:
+which element holds the content, which elements are sections and what type
+each is, where images, buttons, the logo and the menu are found, and whether
+the site needs a real browser to render. The class attributes are the rules
+that suit most sites; a site registered in `SITES` overrides the ones that
+do not fit it. Any other site can be imported by URL with the defaults.
+"""
+import re
+from .crawler import normalize_url, site_of
+
+LOGO_RE = re.compile('logo', re.I)
+MAIN_CONTENT_RE = re.compile('content|main', re.I)
+SECTION_CLASS_RE = re.compile('section|block|hero|feature|about|contact', re.I)
+BACKGROUND_CLASS_RE = re.compile('background|bg', re.I)
+BUTTON_CLASS_RE = re.compile('btn|button|cta', re.I)
+NAV_CLASS_RE = re.compile('nav|menu', re.I)
+PRIMARY_COLOR_RE = re.compile(r'--primary[:\s]+([#\w]+)')
+
+
+class SiteRules:
+    """How one site maps onto CMS content; keyword arguments override the defaults."""
+
+    start_url = None
+    # Render pages in headless browsers instead of fetching them over HTTP
+    browser = False
+    # Used when the homepage has no <title>
+    site_name = 'Imported Site'
+
+    # (tag, find() arguments) of the element holding the content, first
+    # match first; <body> if none matches
+    main_content = [('main', {}), ('div', {'class_': MAIN_CONTENT_RE})]
+    section_tags = ['section', 'div']
+    section_class = SECTION_CLASS_RE
+    max_sections = 10
+    # Keywords looked for in a section's classes, and the section type they mean
+    section_types = [
+        (('hero', 'banner', 'jumbotron'), 'hero'),
+        (('feature', 'service'), 'features'),
+        (('gallery', 'portfolio'), 'gallery'),
+        (('testimonial',), 'testimonials'),
+        (('contact',), 'contact'),
+        (('faq',), 'faq'),
+        (('cta', 'call-to-action'), 'cta'),
+    ]
+    background_class = BACKGROUND_CLASS_RE
+    # Images with one of these in their classes are backgrounds, not content
+    background_keywords = ('background', 'bg')
+
+    # Direct children of a section that make up its rich text, if their
+    # text is longer than `min_text_length`
+    text_tags = ['p', 'div', 'span']
+    min_text_length = 10
+    max_images = 5
+    button_class = BUTTON_CLASS_RE
+    max_buttons = 3
+    # Content of pages without recognizable sections
+    generic_tags = ['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol']
+    max_generic_elements = 20
+
+    logo = LOGO_RE
+    # Primary color in the page's <style> tags, or, when rendered in a
+    # browser, the background of the first element matching the selector
+    primary_color = PRIMARY_COLOR_RE
+    primary_color_selector = '.btn-primary, .bg-primary, [class*="primary"]'
+
+    # (tag, find() arguments) of the navigation, first match first
+    navigation = [('nav', {}), ('div', {'class_': NAV_CLASS_RE})]
+    max_menu_items = 10
+    skip_menu_labels = {'login', 'signup', 'register'}
+
+    def __init__(self, name, **overrides):
+        self.name = name
+        for key, value in overrides.items():
+            if not hasattr(self, key):
+                raise TypeError(f'Unknown site rule {key!r}')
+            setattr(self, key, value)
+
+
+SITES = {
+    rules.name: rules for rules in [
+        SiteRules(
+            'arhiva',
+            start_url='https://info.arhivadefacturi.ro',
+            site_name='Arhiva de Facturi',
+        ),
+    ]
+}
+
+
+def rules_for(site):
+    """
+    The rules registered as `site`, or the default rules for a site given
+    by URL. Raises `ValueError` for anything else.
+    """
+    if site in SITES:
+        return SITES[site]
+    if normalize_url(site) is None:
+        raise ValueError(f'Unknown site {site!r}: use a URL or one of {", ".join(sorted(SITES))}')
+    return SiteRules(site_of(site), start_url=site)
@@ -0,0 +1,109 @@
+"""
+Streaming NDJSON export of the whole site.
+
+Every record is one JSON line:
+
+    {"model": "page", "id": 3, "cursor": "page:3", "fields": {...}}
+
+Models are exported in dependency order and rows in primary key order, read
+through `iterator()` so memory stays constant (server-side cursors on
+PostgreSQL). Each line carries a cursor; passing the last one back as `after`
+resumes the export right after that record.
+"""
+import zlib
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from .models import (
+    SiteConfiguration, Page, Section, ContentBlock, GalleryImage,
+    MenuItem, Media, ChangeLogEntry
+)
+
+EXPORT_VERSION = 1
+
+EXPORT_MODELS = [
+    SiteConfiguration, Page, Section, ContentBlock, GalleryImage, MenuItem, Media,
+]
+
+
+class InvalidCursor(ValueError):
+    """Raised for cursors that do not name an exported model and id."""
+
+
+def parse_cursor(cursor):
+    """Split a `model:pk` cursor into the model index and primary key."""
+    names = [model._meta.model_name for model in EXPORT_MODELS]
+    try:
+        model_name, pk = cursor.split(':', 1)
+        return names.index(model_name), int(pk)
+    except ValueError:
+        raise InvalidCursor(f'Invalid export cursor: {cursor!r}')
+
+
+def iter_records(after=None, chunk_size=2000, header=True):
+    """
+    Yield export records as dicts, starting after the given cursor. The
+    first is a header record, unless `header` is False (e.g. to append to an
+    interrupted export).
+    """
+    start_index, start_pk = parse_cursor(after) if after else (0, None)
+
+    if header:
+        yield {
+            'model': 'export',
+            'version': EXPORT_VERSION,
+            'exported_at': timezone.now(),
+            'after': after,
+            # Follow /api/changes/ from here to stay in sync after importing.
+            'change_cursor': ChangeLogEntry.latest_cursor(),
+        }
+
+    for index, model in enumerate(EXPORT_MODELS[start_index:], start=start_index):
+        model_name = model._meta.model_name
+        fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+        names = [field.name for field in fields]
+
+        queryset = model.objects.order_by('pk')
+        if index == start_index and start_pk is not None:
+            queryset = queryset.filter(pk__gt=start_pk)
+
+        rows = queryset.values_list('pk', *[field.attname for field in fields])
+        for pk, *values in rows.iterator(chunk_size=chunk_size):
+            yield {
+                'model': model_name,
+                'id': pk,
+                'cursor': f'{model_name}:{pk}',
+                'fields': dict(zip(names, values)),
+            }
+
+
+def iter_lines(after=None, header=True):
+    """Yield export records encoded as NDJSON lines (bytes)."""
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for record in iter_records(after=after, header=header):
+        yield (encoder.encode(record) + '\n').encode('utf-8')
+
+
+def iter_chunks(after=None, compress=False, chunk_size=64 * 1024, header=True):
+    """
+    Yield the export in chunks of roughly `chunk_size` bytes, optionally
+    gzip-compressed on the fly.
+    """
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+    buffer, size = [], 0
+
+    for line in iter_lines(after=after, header=header):
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            data = b''.join(buffer)
+            buffer, size = [], 0
+            if compressor:
+                data = compressor.compress(data)
+            if data:
+                yield data
+
+    data = b''.join(buffer)
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
@@ -0,0 +1,166 @@
+"""
+Small database-backed job queue for work that should not run in a request.
+
+Handlers are registered by name with `@job(...)` (see `cms_app.tasks`) and
+queued with `enqueue(name, **payload)`. The job row is written in the
+caller's transaction, so it exists exactly when the data it refers to does.
+`manage.py run_jobs` workers claim jobs with a conditional UPDATE, which is
+safe with any number of workers and needs no row locks. Failed jobs are
+retried with exponential backoff until `max_attempts`. Jobs left `running`
+by a crashed worker are claimed again after `JOB_LOCK_TIMEOUT` seconds.
+
+With `JOB_QUEUE_EAGER = True` jobs run in-process right after the enqueueing
+transaction commits, for development without a worker.
+"""
+import logging
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+
+class Handler:
+    def __init__(self, func, name, max_attempts, on_failure):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.on_failure = on_failure
+
+    def __call__(self, **payload):
+        return self.func(**payload)
+
+
+def job(name, max_attempts=5, on_failure=None):
+    """
+    Register a job handler. `on_failure(**payload)` is called once the last
+    attempt has failed.
+    """
+    def decorator(func):
+        _handlers[name] = Handler(func, name, max_attempts, on_failure)
+        return func
+    return decorator
+
+
+def get_handler(name):
+    return _handlers.get(name)
+
+
+def enqueue(name, run_after=None, **payload):
+    """Queue a job as part of the current transaction and return it."""
+    handler = get_handler(name)
+    if handler is None:
+        raise ValueError(f'Unknown job: {name}')
+
+    queued = Job.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=handler.max_attempts,
+        run_after=run_after or timezone.now(),
+    )
+    if getattr(settings, 'JOB_QUEUE_EAGER', False):
+        transaction.on_commit(lambda: run_job_by_id(queued.pk))
+    return queued
+
+
+def backoff(attempts):
+    """Delay before retry number `attempts`: 10s, 20s, 40s... capped at one hour."""
+    base = getattr(settings, 'JOB_RETRY_DELAY', 10)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), 3600))
+
+
+def claimable(now=None):
+    """Jobs a worker may take: due queued jobs, and running jobs whose worker died."""
+    now = now or timezone.now()
+    lock_timeout = timedelta(seconds=getattr(settings, 'JOB_LOCK_TIMEOUT', 600))
+    return Job.objects.filter(
+        Q(status='queued', run_after__lte=now)
+        | Q(status='running', locked_at__lt=now - lock_timeout)
+    )
+
+
+def claim(names=None, batch_size=10):
+    """
+    Claim the next due job, or return None.
+
+    Candidates are read without locks; each claim is an UPDATE that only
+    succeeds if the job is still claimable, so two workers never run the
+    same job.
+    """
+    now = timezone.now()
+    candidates = claimable(now)
+    if names:
+        candidates = candidates.filter(name__in=names)
+    candidate_ids = list(candidates.order_by('run_after', 'id').values_list('id', flat=True)[:batch_size])
+
+    for job_id in candidate_ids:
+        claimed = claimable(now).filter(pk=job_id).update(
+            status='running',
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=job_id)
+    return None
+
+
+def run_job(queued):
+    """Run a claimed job and record the outcome. Returns True on success."""
+    handler = get_handler(queued.name)
+    try:
+        if handler is None:
+            raise LookupError(f'No handler registered for job {queued.name!r}')
+        handler(**queued.payload)
+    except Exception:
+        error = traceback.format_exc()
+        final = handler is None or queued.attempts >= queued.max_attempts
+        logger.warning('Job %s failed (attempt %s/%s)', queued, queued.attempts, queued.max_attempts)
+
+        Job.objects.filter(pk=queued.pk).update(
+            status='failed' if final else 'queued',
+            run_after=timezone.now() + backoff(queued.attempts),
+            locked_at=None,
+            last_error=error,
+            finished_at=timezone.now() if final else None,
+        )
+        if final and handler is not None and handler.on_failure:
+            try:
+                handler.on_failure(**queued.payload)
+            except Exception:
+                logger.exception('on_failure hook of job %s failed', queued)
+        return False
+
+    Job.objects.filter(pk=queued.pk).update(
+        status='done',
+        locked_at=None,
+        last_error='',
+        finished_at=timezone.now(),
+    )
+    return True
+
+
+def run_job_by_id(job_id):
+    """Claim and run one specific job (used by eager mode)."""
+    claimed = claimable().filter(pk=job_id).update(
+        status='running',
+        locked_at=timezone.now(),
+        attempts=F('attempts') + 1,
+    )
+    if claimed:
+        run_job(Job.objects.get(pk=job_id))
+
+
+def retry(queryset):
+    """Put failed jobs back in the queue with a fresh attempt budget."""
+    return queryset.filter(status='failed').update(
+        status='queued',
+        attempts=0,
+        run_after=timezone.now(),
+        finished_at=None,
+    )
@@ -0,0 +1,56 @@
+"""
+Management command to record the dimensions of content block and gallery
+images, which the page renderer emits as `width`/`height` attributes.
+
+New saves and bulk writes record them; run this once after upgrading. Only
+rows with an image and no recorded dimensions are processed.
+
+Usage: python manage.py backfill_image_dimensions [--batch-size 500]
+"""
+from django.core.management.base import BaseCommand
+from cms_app.models import ContentBlock, GalleryImage, record_image_dimensions
+
+
+class Command(BaseCommand):
+    help = 'Records the width and height of content block and gallery images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of rows processed per batch',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model in (ContentBlock, GalleryImage):
+            field_name, width_field, height_field = model.image_dimension_fields
+            queryset = (
+                model.objects.exclude(**{f'{field_name}__isnull': True})
+                .exclude(**{field_name: ''})
+                .filter(**{f'{width_field}__isnull': True})
+                .order_by('pk')
+            )
+            processed = recorded = 0
+            last_pk = 0
+
+            while True:
+                objects = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+                if not objects:
+                    break
+                last_pk = objects[-1].pk
+
+                record_image_dimensions(objects)
+                # Plain UPDATEs: dimensions are not content changes for the
+                # change feed or the search index.
+                model.objects.bulk_update(objects, [width_field, height_field])
+
+                processed += len(objects)
+                recorded += sum(1 for obj in objects if getattr(obj, width_field))
+                self.stdout.write(f'  {processed} {model._meta.verbose_name_plural.lower()} processed')
+
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ Recorded dimensions for {recorded} of {processed} '
+                f'{model._meta.verbose_name_plural.lower()}'
+            ))
@@ -0,0 +1,62 @@
+"""
+Management command to fill the tag relation from the comma-separated
+`Media.tags` strings.
+
+New saves keep both in sync; run this once after upgrading, or after bulk
+imports that bypass `Media.save()`. It is idempotent.
+
+Usage: python manage.py backfill_media_tags [--batch-size 1000]
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from cms_app.models import Media, Tag
+
+
+class Command(BaseCommand):
+    help = 'Creates Tag rows and media-tag links from the Media.tags strings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of media files processed per batch',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        MediaTag = Media.tag_set.through
+        processed = links = 0
+        last_pk = 0
+
+        while True:
+            rows = list(
+                Media.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', 'tags')[:batch_size]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+
+            parsed = {pk: Tag.parse(tags) for pk, tags in rows}
+            with transaction.atomic():
+                tags = Tag.get_or_create_many(
+                    name for names in parsed.values() for name in names
+                )
+                MediaTag.objects.filter(media_id__in=parsed).delete()
+                created = MediaTag.objects.bulk_create(
+                    [
+                        MediaTag(media_id=pk, tag_id=tags[name].pk)
+                        for pk, names in parsed.items()
+                        for name in names
+                    ],
+                    batch_size=batch_size,
+                )
+
+            processed += len(rows)
+            links += len(created)
+            self.stdout.write(f'  {processed} media files processed')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Backfilled tags for {processed} media files ({links} tag links)'
+        ))
@@ -0,0 +1,123 @@
+"""
+Management command to benchmark the serializer-free list endpoints.
+
+Renders each list endpoint through the regular DRF serializers and through the
+fast path, checks that both produce identical bytes and reports the speedup.
+
+Usage: python manage.py benchmark_api [--iterations 200] [--seed 40]
+"""
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+from cms_app.models import Page, Section, ContentBlock, Media, GalleryImage
+from cms_app.api.views import PageViewSet, ContentBlockViewSet, MediaViewSet
+from cms_app.api.fast_serializers import ORJSON_AVAILABLE
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks serializer vs. fast-path rendering of the API list endpoints'
+
+    endpoints = [
+        ('pages', PageViewSet),
+        ('content-blocks', ContentBlockViewSet),
+        ('media', MediaViewSet),
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=200,
+            help='Requests per endpoint and path',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Create this many temporary rows per model (rolled back afterwards)',
+        )
+
+    def handle(self, *args, **options):
+        self.factory = APIRequestFactory()
+        self.host = next(
+            (host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'),
+            'localhost'
+        )
+
+        self.stdout.write(f'JSON encoder: {"orjson" if ORJSON_AVAILABLE else "json (stdlib)"}')
+
+        with transaction.atomic():
+            if options['seed']:
+                self.seed(options['seed'])
+            try:
+                for name, viewset in self.endpoints:
+                    self.benchmark(name, viewset, options['iterations'])
+            finally:
+                # Never keep seeded rows around.
+                transaction.set_rollback(True)
+
+    def seed(self, count):
+        """Create throwaway rows without going through save() or signals."""
+        page = Page.objects.create(title='Benchmark', slug='benchmark-api', status='published')
+        section = Section.objects.create(page=page, title='Benchmark')
+        Page.objects.bulk_create([
+            Page(title=f'Benchmark page {i}', slug=f'benchmark-api-{i}',
+                 meta_description='Benchmark page', status='published', order=i)
+            for i in range(count)
+        ])
+        blocks = ContentBlock.objects.bulk_create([
+            ContentBlock(section=section, block_type='rich_text', title=f'Block {i}',
+                         content='<p>Benchmark content</p>', config={'icon': 'bi-star'}, order=i)
+            for i in range(count)
+        ])
+        GalleryImage.objects.bulk_create([
+            GalleryImage(content_block=block, image=f'galleries/benchmark-{block.pk}-{i}.jpg', order=i)
+            for block in blocks[:5] for i in range(3)
+        ])
+        Media.objects.bulk_create([
+            Media(title=f'Benchmark {i}', file=f'uploads/benchmark/{i}.jpg', media_type='image',
+                  file_size=1024, width=800, height=600, tags='benchmark')
+            for i in range(count)
+        ])
+
+    def render(self, view, name):
+        request = self.factory.get(f'/api/{name}/', HTTP_ACCEPT='application/json', HTTP_HOST=self.host)
+        response = view(request)
+        if hasattr(response, 'render'):
+            response.render()
+        if response.status_code != 200:
+            raise CommandError(f'/api/{name}/ returned {response.status_code}')
+        return response.content
+
+    def timed(self, view, name, iterations):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            self.render(view, name)
+        return (time.perf_counter() - start) / iterations * 1000
+
+    def benchmark(self, name, viewset, iterations):
+        serializer_view = viewset.as_view({'get': 'list'}, use_fast_list=False)
+        fast_view = viewset.as_view({'get': 'list'})
+
+        expected = self.render(serializer_view, name)
+        actual = self.render(fast_view, name)
+        if expected != actual:
+            offset = next(
+                (i for i, (a, b) in enumerate(zip(expected, actual)) if a != b),
+                min(len(expected), len(actual))
+            )
+            raise CommandError(
+                f'/api/{name}/ output differs at byte {offset}:\n'
+                f'  serializer: {expected[offset - 40:offset + 40]!r}\n'
+                f'  fast path:  {actual[offset - 40:offset + 40]!r}'
+            )
+
+        serializer_ms = self.timed(serializer_view, name, iterations)
+        fast_ms = self.timed(fast_view, name, iterations)
+        self.stdout.write(
+            f'/api/{name}/  {len(expected)} bytes  '
+            f'serializer {serializer_ms:.2f} ms  fast {fast_ms:.2f} ms  '
+            + self.style.SUCCESS(f'{serializer_ms / fast_ms:.1f}x')
+        )
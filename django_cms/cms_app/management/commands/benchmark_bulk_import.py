@@ -0,0 +1,140 @@
+"""
+Management command to benchmark writing imported pages.
+
+Builds synthetic page trees (pages, sections, content blocks) and writes
+them three ways: one `objects.create()` per row, with its signals and its
+own commit, as the cloners used to; the same rows in one transaction with
+coalesced signal handling; and in bulk with `PageTreeWriter`. Every run
+commits, so the time includes the work done at commit (search index). The
+benchmark pages are deleted after each run.
+
+Run it against a development database: the change feed keeps the entries of
+the benchmark rows.
+
+Usage: python manage.py benchmark_bulk_import [--blocks 10000]
+                                              [--sections-per-page 5]
+                                              [--blocks-per-section 10]
+"""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from cms_app.bulk import PageTreeWriter
+from cms_app.models import ContentBlock, Page, Section
+from cms_app.signals import coalesced_changes
+
+SLUG_PREFIX = 'benchmark-bulk-'
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks row-by-row vs. bulk writes of imported page trees'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--blocks',
+            type=int,
+            default=10000,
+            help='Content blocks to write per run',
+        )
+        parser.add_argument(
+            '--sections-per-page',
+            type=int,
+            default=5,
+        )
+        parser.add_argument(
+            '--blocks-per-section',
+            type=int,
+            default=10,
+        )
+
+    def handle(self, *args, **options):
+        if Page.objects.filter(slug__startswith=SLUG_PREFIX).exists():
+            raise CommandError(f'Pages with slugs starting with {SLUG_PREFIX!r} exist already')
+        self.sections_per_page = options['sections_per_page']
+        self.blocks_per_section = options['blocks_per_section']
+        per_page = self.sections_per_page * self.blocks_per_section
+        self.page_count = -(-options['blocks'] // per_page)
+
+        self.stdout.write(
+            f'{self.page_count} pages, {self.page_count * self.sections_per_page} sections, '
+            f'{self.page_count * per_page} blocks per run'
+        )
+        for name, write in [
+            ('row by row', self.write_rows),
+            ('coalesced', self.write_rows_coalesced),
+            ('bulk', self.write_bulk),
+        ]:
+            self.benchmark(name, write)
+
+    def trees(self):
+        """Unsaved (page, [(section, [blocks])]) trees."""
+        for p in range(self.page_count):
+            page = Page(
+                title=f'Benchmark page {p}', slug=f'{SLUG_PREFIX}{p}', status='published', order=p,
+                meta_description='Benchmark page',
+            )
+            sections = []
+            for s in range(self.sections_per_page):
+                section = Section(section_type='text', title=f'Section {s}', order=s)
+                blocks = [
+                    ContentBlock(
+                        block_type='button', link_text='Read more', link_url=f'/{SLUG_PREFIX}{p}/', order=b,
+                    ) if b % 5 == 4 else ContentBlock(
+                        block_type='rich_text',
+                        content=f'<h3>Block {b}</h3><p>Benchmark content for section {s} of page {p}.</p>',
+                        order=b,
+                    )
+                    for b in range(self.blocks_per_section)
+                ]
+                sections.append((section, blocks))
+            yield page, sections
+
+    def write_rows(self):
+        for page, sections in self.trees():
+            page.save()
+            for section, blocks in sections:
+                section.page = page
+                section.save()
+                for block in blocks:
+                    block.section = section
+                    block.save()
+
+    def write_rows_coalesced(self):
+        with transaction.atomic(), coalesced_changes():
+            self.write_rows()
+
+    def write_bulk(self):
+        writer = PageTreeWriter()
+        for page, sections in self.trees():
+            writer.add_page(page, sections)
+        writer.save()
+
+    def benchmark(self, name, write):
+        signals, queries = [], []
+
+        def count_signal(**kwargs):
+            signals.append(kwargs['sender'])
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        post_save.connect(count_signal, weak=False)
+        try:
+            with connection.execute_wrapper(count_query):
+                start = time.perf_counter()
+                write()
+                elapsed = time.perf_counter() - start
+        finally:
+            post_save.disconnect(count_signal)
+            self.clean_up()
+
+        rows = self.page_count * (1 + self.sections_per_page * (1 + self.blocks_per_section))
+        self.stdout.write(
+            f'{name:<11} {elapsed:8.2f} s  {rows / elapsed:9.0f} rows/s  '
+            f'{len(queries):6d} queries  {len(signals):6d} post_save signals'
+        )
+
+    def clean_up(self):
+        with transaction.atomic(), coalesced_changes():
+            Page.objects.filter(slug__startswith=SLUG_PREFIX).delete()
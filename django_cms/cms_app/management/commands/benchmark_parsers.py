@@ -0,0 +1,118 @@
+"""
+Management command to compare the HTML parsing backends of the clone commands.
+
+Every HTML page in an archive recorded with `clone_arhiva_site --record` is
+parsed with each backend, and the cloner's section extraction is run on the
+result (`--site` picks the mapping rules). The report gives parse and
+extraction time per page, the peak Python memory of a parsed page, and on how
+many pages the backend extracted the same sections and blocks as
+`html.parser`, the reference parser.
+
+Usage: python manage.py benchmark_parsers site.sqlite [--repeat 3] [--parser lxml]
+                                          [--site arhiva]
+"""
+import os
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand, CommandError
+from cms_app.cloning.archive import Archive
+from cms_app.cloning.assets import AssetDownloader
+from cms_app.cloning.crawler import CrawledPage
+from cms_app.cloning.fetch import is_html
+from cms_app.cloning.mapping import SiteMapper
+from cms_app.cloning.parsers import PARSERS, parse
+from cms_app.cloning.sites import SITES, rules_for
+
+REFERENCE_PARSER = 'html.parser'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the HTML parsing backends on a recorded clone archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archive', help='Archive file recorded with clone_arhiva_site --record')
+        parser.add_argument(
+            '--site', default='arhiva',
+            help=f'Mapping rules to extract with: a URL, or one of {", ".join(sorted(SITES))} (default: arhiva)'
+        )
+        parser.add_argument('--repeat', type=int, default=3, help='Timed passes per backend (default: 3)')
+        parser.add_argument(
+            '--parser', action='append', choices=PARSERS, dest='parsers',
+            help='Backend to benchmark; repeat for several (default: all available)'
+        )
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['archive']):
+            raise CommandError(f'Archive {options["archive"]} does not exist')
+        try:
+            rules = rules_for(options['site'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.mapper = SiteMapper(rules, AssetDownloader(None, workers=1, skip_downloads=True))
+        pages = self.load_pages(Archive(options['archive']))
+        if not pages:
+            raise CommandError(f'Archive {options["archive"]} has no HTML pages')
+        size = sum(len(body) for _, body in pages)
+        self.stdout.write(f'{len(pages)} pages, {size / 1024:.0f} KB of HTML, {options["repeat"]} passes\n')
+
+        reference = [self.summarize(self.extract(url, parse(body, REFERENCE_PARSER))) for url, body in pages]
+        for name in options['parsers'] or PARSERS:
+            self.benchmark(name, pages, reference, options['repeat'])
+
+    def load_pages(self, archive):
+        """(url, body) of the successful HTML responses in the archive."""
+        pages = []
+        for url in archive.urls():
+            result = archive.get(url)
+            if result.status == 200 and is_html(result):
+                pages.append((result.url, result.body))
+        return pages
+
+    def extract(self, url, soup):
+        """Map a parsed page onto sections and blocks, as the import's map stage does."""
+        return self.mapper.map(CrawledPage(url, 1, 1, soup, [], None, ''))[0].sections
+
+    def summarize(self, parsed):
+        """What extraction produced, for comparing backends."""
+        return [
+            (section.section_type, section.title,
+             [(block.block_type, block.content, block.link_text, block.link_url) for block in blocks])
+            for section, blocks in parsed
+        ]
+
+    def benchmark(self, name, pages, reference, repeat):
+        parse_time = extract_time = 0.0
+        for _ in range(repeat):
+            for url, body in pages:
+                started = time.perf_counter()
+                soup = parse(body, name)
+                parsed_at = time.perf_counter()
+                self.extract(url, soup)
+                parse_time += parsed_at - started
+                extract_time += time.perf_counter() - parsed_at
+
+        # Memory in a separate pass, as tracing slows everything down
+        peaks = []
+        same = 0
+        tracemalloc.start()
+        try:
+            for (url, body), expected in zip(pages, reference):
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+                soup = parse(body, name)
+                peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+                same += self.summarize(self.extract(url, soup)) == expected
+                del soup
+        finally:
+            tracemalloc.stop()
+
+        runs = len(pages) * repeat
+        parse_ms = parse_time / runs * 1000
+        extract_ms = extract_time / runs * 1000
+        agreement = f'{same}/{len(pages)} pages match {REFERENCE_PARSER}'
+        self.stdout.write(
+            f'{name:<12} parse {parse_ms:6.2f} ms  extract {extract_ms:6.2f} ms  '
+            f'{runs / (parse_time + extract_time):7.1f} pages/s  '
+            f'peak {sum(peaks) / len(peaks) / 1024:7.0f} KB avg {max(peaks) / 1024:7.0f} KB max  '
+            + (self.style.SUCCESS(agreement) if same == len(pages) else self.style.WARNING(agreement))
+        )
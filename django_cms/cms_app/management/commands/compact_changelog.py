@@ -0,0 +1,50 @@
+"""
+Management command to compact the change feed log.
+
+Only the latest entry per object is needed to bring a consumer up to date,
+so superseded entries can be dropped without breaking any cursor.
+
+Usage: python manage.py compact_changelog [--older-than-days 30] [--dry-run]
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils import timezone
+from cms_app.models import ChangeLogEntry
+
+
+class Command(BaseCommand):
+    help = 'Removes change log entries superseded by a later change to the same object'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=0,
+            help='Only remove superseded entries older than this many days',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report how many entries would be removed without deleting them',
+        )
+
+    def handle(self, *args, **options):
+        latest_ids = (
+            ChangeLogEntry.objects
+            .values('model', 'object_id')
+            .annotate(last_id=Max('id'))
+            .values('last_id')
+        )
+        stale = ChangeLogEntry.objects.exclude(id__in=latest_ids)
+
+        if options['older_than_days']:
+            cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+            stale = stale.filter(changed_at__lt=cutoff)
+
+        if options['dry_run']:
+            self.stdout.write(f'{stale.count()} entries would be removed')
+            return
+
+        deleted, _ = stale.delete()
+        self.stdout.write(self.style.SUCCESS(f'✓ Removed {deleted} superseded entries'))
@@ -0,0 +1,85 @@
+"""
+Management command to compute the low-quality placeholders (dominant color
+and tiny preview) that the page renderer paints while images load.
+
+New uploads and saves get their placeholders from background jobs; run this
+once after upgrading. Media library images are processed first, so content
+block and gallery images that use library files copy their placeholders
+instead of decoding the file again. Each batch is decoded and its dominant
+colors computed in one vectorized pass (see `cms_app.placeholders`).
+
+Usage: python manage.py compute_placeholders [--batch-size 200] [--force]
+"""
+import time
+from django.core.management.base import BaseCommand
+from cms_app.models import ContentBlock, GalleryImage, Media, MediaBlob, record_placeholders
+from cms_app import placeholders
+
+
+class Command(BaseCommand):
+    help = 'Computes placeholders for media library, content block and gallery images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Number of images processed per batch',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Recompute placeholders that are already set',
+        )
+
+    def handle(self, *args, **options):
+        if not placeholders.NUMPY_AVAILABLE:
+            self.stdout.write(self.style.WARNING('NumPy is not installed; colors are computed per image'))
+
+        media = Media.objects.filter(media_type='image', processing_status='ready')
+        self.process(Media, media, options, update_blobs=True)
+        for model in (ContentBlock, GalleryImage):
+            field_name = model.placeholder_fields[0]
+            queryset = model.objects.exclude(**{f'{field_name}__isnull': True}).exclude(**{field_name: ''})
+            self.process(model, queryset, options, copy_from_media=True)
+
+    def process(self, model, queryset, options, update_blobs=False, copy_from_media=False):
+        field_name, color_field, placeholder_field = model.placeholder_fields
+        if not options['force']:
+            queryset = queryset.filter(**{placeholder_field: ''})
+        queryset = queryset.order_by('pk')
+        name = model._meta.verbose_name_plural.lower()
+        started = time.perf_counter()
+        processed = computed = 0
+        last_pk = 0
+
+        while True:
+            objects = list(queryset.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not objects:
+                break
+            last_pk = objects[-1].pk
+
+            pending = record_placeholders(objects) if copy_from_media else objects
+            placeholders.fill(pending)
+            # Plain UPDATEs: placeholders are not content changes for the
+            # change feed or the search index.
+            model.objects.bulk_update(objects, [color_field, placeholder_field])
+            if update_blobs:
+                # Later uploads of the same bytes reuse the placeholder.
+                for obj in objects:
+                    if obj.content_hash:
+                        MediaBlob.objects.filter(sha256=obj.content_hash).update(
+                            dominant_color=obj.dominant_color, placeholder=obj.placeholder
+                        )
+
+            processed += len(objects)
+            computed += len(pending)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'  {processed} {name} processed ({processed / elapsed if elapsed else 0:.1f}/s)'
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {processed} {name}: {computed} computed, {processed - computed} copied from the media library'
+            if copy_from_media else f'✓ {processed} {name} computed'
+        ))
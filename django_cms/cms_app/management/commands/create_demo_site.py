@@ -1,11 +1,17 @@
 """
 Management command to create demo site content.
+
+Pages that do not exist yet are built in memory with their sections and
+blocks, then written in bulk in one transaction (see `cms_app.bulk`).
 """
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from cms_app.bulk import PageTreeWriter, create_objects
 from cms_app.models import (
     SiteConfiguration, Page, Section, ContentBlock, MenuItem
 )
+from cms_app.signals import coalesced_changes
 
 User = get_user_model()
 
@@ -17,7 +23,7 @@ class Command(BaseCommand):
         self.stdout.write('Creating demo site content...\n')
 
         # Get or create admin user
-        user, created = User.objects.get_or_create(
+        user, user_created = User.objects.get_or_create(
             username='admin',
             defaults={
                 'is_staff': True,
@@ -25,11 +31,29 @@ class Command(BaseCommand):
                 'email': 'admin@example.com'
             }
         )
-        if created:
+        if user_created:
             user.set_password('admin')
             user.save()
             self.stdout.write(self.style.SUCCESS('✓ Created admin user (username: admin, password: admin)'))
 
+        # Cache invalidation and search reindex happen once, at commit.
+        with transaction.atomic(), coalesced_changes():
+            self.create_content(user)
+
+        self.stdout.write('\n')
+        self.stdout.write(self.style.SUCCESS('=' * 50))
+        self.stdout.write(self.style.SUCCESS('Demo site created successfully!'))
+        self.stdout.write(self.style.SUCCESS('=' * 50))
+        self.stdout.write('\n')
+        self.stdout.write('Visit http://localhost:8000/ to see your demo site')
+        self.stdout.write('Login to admin at http://localhost:8000/admin/')
+        if user_created:
+            self.stdout.write('  Username: admin')
+            self.stdout.write('  Password: admin')
+        self.stdout.write('\n')
+
+    def create_content(self, user):
+        """Create the site configuration, pages and menu items that do not exist yet."""
         # Create site configuration
         config, created = SiteConfiguration.objects.get_or_create(
             id=1,
@@ -50,26 +74,28 @@ class Command(BaseCommand):
         if created:
             self.stdout.write(self.style.SUCCESS('✓ Created site configuration'))
 
+        # New pages are written together once they are all built
+        pages = Page.objects.in_bulk(['home', 'about', 'services', 'contact'], field_name='slug')
+        writer = PageTreeWriter()
+
         # Create Homepage
-        homepage, created = Page.objects.get_or_create(
-            slug='home',
-            defaults={
-                'title': 'Home',
-                'meta_title': 'Welcome to Our Website',
-                'meta_description': 'Discover our amazing products and services',
-                'status': 'published',
-                'is_home': True,
-                'order': 0,
-                'created_by': user,
-                'updated_by': user,
-            }
-        )
-        if created:
+        homepage = pages.get('home')
+        if homepage is None:
+            homepage = writer.add_page(Page(
+                slug='home',
+                title='Home',
+                meta_title='Welcome to Our Website',
+                meta_description='Discover our amazing products and services',
+                status='published',
+                is_home=True,
+                order=0,
+                created_by=user,
+                updated_by=user,
+            ))
             self.stdout.write(self.style.SUCCESS('✓ Created homepage'))
 
             # Hero Section
-            hero = Section.objects.create(
-                page=homepage,
+            hero = writer.add_section(homepage, Section(
                 section_type='hero',
                 title='Welcome Section',
                 anchor_id='welcome',
@@ -77,32 +103,29 @@ class Command(BaseCommand):
                 padding_top=100,
                 padding_bottom=100,
                 order=0
-            )
-            ContentBlock.objects.create(
-                section=hero,
+            ))
+            writer.add_block(hero, ContentBlock(
                 block_type='rich_text',
                 content='<h1 class="display-3 fw-bold mb-4">Welcome to Our CMS</h1><p class="lead">Build beautiful websites with ease using our powerful content management system.</p>',
                 order=0
-            )
-            ContentBlock.objects.create(
-                section=hero,
+            ))
+            writer.add_block(hero, ContentBlock(
                 block_type='button',
                 link_text='Get Started',
                 link_url='#features',
                 button_style='primary',
                 order=1
-            )
+            ))
 
             # Features Section
-            features = Section.objects.create(
-                page=homepage,
+            features = writer.add_section(homepage, Section(
                 section_type='features',
                 title='Features',
                 anchor_id='features',
                 padding_top=80,
                 padding_bottom=80,
                 order=1
-            )
+            ))
             feature_items = [
                 ('Easy to Use', 'Intuitive admin interface that anyone can master', 'bi-star-fill'),
                 ('Responsive Design', 'Mobile-first design that looks great on all devices', 'bi-phone-fill'),
@@ -112,18 +135,16 @@ class Command(BaseCommand):
                 ('REST API', 'Full-featured API for headless CMS usage', 'bi-code-slash'),
             ]
             for i, (title, desc, icon) in enumerate(feature_items):
-                ContentBlock.objects.create(
-                    section=features,
+                writer.add_block(features, ContentBlock(
                     block_type='icon_text',
                     title=title,
                     content=f'<p>{desc}</p>',
                     config={'icon': icon},
                     order=i
-                )
+                ))
 
             # CTA Section
-            cta = Section.objects.create(
-                page=homepage,
+            cta = writer.add_section(homepage, Section(
                 section_type='cta',
                 title='Ready to Get Started?',
                 anchor_id='cta',
@@ -132,83 +153,75 @@ class Command(BaseCommand):
                 padding_top=80,
                 padding_bottom=80,
                 order=2
-            )
-            ContentBlock.objects.create(
-                section=cta,
+            ))
+            writer.add_block(cta, ContentBlock(
                 block_type='rich_text',
                 content='<h2>Start Building Your Website Today</h2><p class="lead">Join thousands of users who trust our CMS</p>',
                 order=0
-            )
-            ContentBlock.objects.create(
-                section=cta,
+            ))
+            writer.add_block(cta, ContentBlock(
                 block_type='button',
                 link_text='Contact Us',
                 link_url='/contact/',
                 button_style='light',
                 order=1
-            )
+            ))
 
         # Create About Page
-        about, created = Page.objects.get_or_create(
-            slug='about',
-            defaults={
-                'title': 'About Us',
-                'meta_title': 'About Our Company',
-                'meta_description': 'Learn more about our company and what we do',
-                'status': 'published',
-                'order': 1,
-                'created_by': user,
-                'updated_by': user,
-            }
-        )
-        if created:
+        about = pages.get('about')
+        if about is None:
+            about = writer.add_page(Page(
+                slug='about',
+                title='About Us',
+                meta_title='About Our Company',
+                meta_description='Learn more about our company and what we do',
+                status='published',
+                order=1,
+                created_by=user,
+                updated_by=user,
+            ))
             self.stdout.write(self.style.SUCCESS('✓ Created about page'))
 
-            about_section = Section.objects.create(
-                page=about,
+            about_section = writer.add_section(about, Section(
                 section_type='two_column',
                 title='Our Story',
                 padding_top=80,
                 padding_bottom=80,
                 order=0
-            )
-            ContentBlock.objects.create(
-                section=about_section,
+            ))
+            writer.add_block(about_section, ContentBlock(
                 block_type='rich_text',
                 content='<h2>Who We Are</h2><p>We are a team of passionate developers and designers dedicated to creating the best content management system for modern websites.</p><p>Our mission is to make website creation accessible to everyone, regardless of technical expertise.</p>',
                 order=0
-            )
-            ContentBlock.objects.create(
-                section=about_section,
+            ))
+            writer.add_block(about_section, ContentBlock(
                 block_type='rich_text',
                 content='<h2>What We Do</h2><p>We provide a powerful, flexible CMS that enables businesses and individuals to create stunning websites without writing code.</p><p>Our platform combines ease of use with advanced features, giving you the best of both worlds.</p>',
                 order=1
-            )
+            ))
 
         # Create Services Page
-        services, created = Page.objects.get_or_create(
-            slug='services',
-            defaults={
-                'title': 'Services',
-                'meta_title': 'Our Services',
-                'meta_description': 'Explore our range of services',
-                'status': 'published',
-                'order': 2,
-                'created_by': user,
-                'updated_by': user,
-            }
-        )
-        if created:
+        services = pages.get('services')
+        if services is None:
+            services = writer.add_page(Page(
+                slug='services',
+                title='Services',
+                meta_title='Our Services',
+                meta_description='Explore our range of services',
+                status='published',
+                order=2,
+                created_by=user,
+                updated_by=user,
+            ))
             self.stdout.write(self.style.SUCCESS('✓ Created services page'))
 
-            services_section = Section.objects.create(
-                page=services,
+            services_section = writer.add_section(services, Section(
                 section_type='three_column',
                 title='What We Offer',
                 padding_top=80,
                 padding_bottom=80,
                 order=0
-            )
+            ))
             service_items = [
                 ('Website Development', 'Custom website solutions tailored to your needs'),
                 ('Content Management', 'Easy-to-use CMS for managing your content'),
@@ -218,39 +231,35 @@ class Command(BaseCommand):
                 ('Technical Support', '24/7 support to help you succeed'),
             ]
             for i, (title, desc) in enumerate(service_items):
-                ContentBlock.objects.create(
-                    section=services_section,
+                writer.add_block(services_section, ContentBlock(
                     block_type='rich_text',
                     content=f'<h3>{title}</h3><p>{desc}</p>',
                     order=i
-                )
+                ))
 
         # Create Contact Page
-        contact, created = Page.objects.get_or_create(
-            slug='contact',
-            defaults={
-                'title': 'Contact',
-                'meta_title': 'Contact Us',
-                'meta_description': 'Get in touch with us',
-                'status': 'published',
-                'order': 3,
-                'created_by': user,
-                'updated_by': user,
-            }
-        )
-        if created:
+        contact = pages.get('contact')
+        if contact is None:
+            contact = writer.add_page(Page(
+                slug='contact',
+                title='Contact',
+                meta_title='Contact Us',
+                meta_description='Get in touch with us',
+                status='published',
+                order=3,
+                created_by=user,
+                updated_by=user,
+            ))
             self.stdout.write(self.style.SUCCESS('✓ Created contact page'))
 
-            contact_section = Section.objects.create(
-                page=contact,
+            contact_section = writer.add_section(contact, Section(
                 section_type='contact',
                 title='Get In Touch',
                 padding_top=80,
                 padding_bottom=80,
                 order=0
-            )
-            ContentBlock.objects.create(
-                section=contact_section,
+            ))
+            writer.add_block(contact_section, ContentBlock(
                 block_type='rich_text',
                 content='''
                 <h2>Contact Information</h2>
@@ -261,7 +270,9 @@ class Command(BaseCommand):
                 <p>We'd love to hear from you! Send us a message and we'll respond as soon as possible.</p>
                 ''',
                 order=0
-            )
+            ))
+
+        writer.save()
 
         # Create Navigation Menu
         menu_items = [
@@ -271,28 +282,20 @@ class Command(BaseCommand):
             ('Contact', 'page', contact, None, None, 3),
         ]
 
-        for label, link_type, page, section, parent, order in menu_items:
-            MenuItem.objects.get_or_create(
+        existing = set(MenuItem.objects.filter(
+            label__in=[item[0] for item in menu_items]
+        ).values_list('label', flat=True))
+        create_objects(MenuItem, [
+            MenuItem(
                 label=label,
-                defaults={
-                    'link_type': link_type,
-                    'page': page,
-                    'section': section,
-                    'parent': parent,
-                    'is_visible': True,
-                    'order': order,
-                }
+                link_type=link_type,
+                page=page,
+                section=section,
+                parent=parent,
+                is_visible=True,
+                order=order,
             )
+            for label, link_type, page, section, parent, order in menu_items
+            if label not in existing
+        ])
         self.stdout.write(self.style.SUCCESS('✓ Created navigation menu'))
-
-        self.stdout.write('\n')
-        self.stdout.write(self.style.SUCCESS('=' * 50))
-        self.stdout.write(self.style.SUCCESS('Demo site created successfully!'))
-        self.stdout.write(self.style.SUCCESS('=' * 50))
-        self.stdout.write('\n')
-        self.stdout.write('Visit http://localhost:8000/ to see your demo site')
-        self.stdout.write('Login to admin at http://localhost:8000/admin/')
-        if created:
-            self.stdout.write('  Username: admin')
-            self.stdout.write('  Password: admin')
-        self.stdout.write('\n')
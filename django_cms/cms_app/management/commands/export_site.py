@@ -0,0 +1,98 @@
+"""
+Management command to export the whole site as NDJSON.
+
+Usage:
+    python manage.py export_site --output backup.ndjson
+    python manage.py export_site --output backup.ndjson.gz --gzip
+    python manage.py export_site --output backup.ndjson --resume
+    python manage.py export_site --after section:120 > rest.ndjson
+"""
+import json
+import os
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from cms_app.export import iter_chunks, parse_cursor, InvalidCursor
+
+
+class Command(BaseCommand):
+    help = 'Exports site configuration, pages, sections, blocks, menus and media metadata as NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            help='File to write to (default: stdout)',
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Compress the output with gzip',
+        )
+        parser.add_argument(
+            '--after',
+            help='Start after this record cursor (e.g. "section:120")',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue an interrupted uncompressed export in --output',
+        )
+
+    def handle(self, *args, **options):
+        output = options['output']
+        after = options['after']
+        mode = 'wb'
+        header = True
+
+        if options['resume']:
+            if not output or options['gzip']:
+                raise CommandError('--resume needs an uncompressed --output file; '
+                                   'for gzip exports start a new file with --after')
+            # Without a complete record the file is written over from the start
+            cursor = self.recover_cursor(output) if os.path.exists(output) else None
+            if cursor:
+                # The file has its header already
+                after, mode, header = cursor, 'ab', False
+
+        if after:
+            try:
+                parse_cursor(after)
+            except InvalidCursor as e:
+                raise CommandError(str(e))
+
+        stream = open(output, mode) if output else sys.stdout.buffer
+        written = 0
+        try:
+            for chunk in iter_chunks(after=after, compress=options['gzip'], header=header):
+                stream.write(chunk)
+                written += len(chunk)
+        finally:
+            if output:
+                stream.close()
+            else:
+                stream.flush()
+
+        if output:
+            resumed = f' (resumed after {after})' if after else ''
+            self.stderr.write(self.style.SUCCESS(f'✓ Wrote {written} bytes to {output}{resumed}'))
+
+    def recover_cursor(self, path):
+        """
+        Find the cursor of the last complete record in `path` and drop any
+        partially written line after it.
+        """
+        cursor, good_end, offset = None, 0, 0
+        with open(path, 'rb') as f:
+            for line in f:
+                offset += len(line)
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                good_end = offset
+                cursor = record.get('cursor') or cursor
+
+        with open(path, 'r+b') as f:
+            f.truncate(good_end)
+        return cursor
@@ -0,0 +1,59 @@
+"""
+Management command to generate image renditions ahead of time.
+
+Renditions are otherwise created on the first request for each size and
+format; run this after a bulk import or a change of RENDITION_WIDTHS to avoid
+slow first page views.
+
+Usage: python manage.py generate_renditions [--limit 100]
+"""
+import time
+from django.core.management.base import BaseCommand
+from cms_app.models import Media, ContentBlock, GalleryImage
+from cms_app import renditions
+
+
+class Command(BaseCommand):
+    help = 'Generates resized WebP/AVIF/original-format renditions for all images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=0,
+            help='Stop after this many source images (0 = all)',
+        )
+
+    def iter_sources(self):
+        """Yield `(name, width)` for every distinct image, widths where known."""
+        seen = set()
+        sources = [
+            Media.objects.filter(media_type='image').values_list('file', 'width'),
+            ContentBlock.objects.exclude(image='').exclude(image=None).values_list('image'),
+            GalleryImage.objects.exclude(image='').values_list('image'),
+        ]
+        for queryset in sources:
+            for name, *width in queryset.iterator():
+                if name and name not in seen and renditions.is_resizable(name):
+                    seen.add(name)
+                    yield name, (width[0] if width else None)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        images = files = failed = 0
+
+        for name, width in self.iter_sources():
+            if options['limit'] and images >= options['limit']:
+                break
+            images += 1
+            try:
+                files += len(renditions.generate_all(name, width))
+            except (OSError, ValueError) as e:
+                # Missing or unreadable source; keep going with the rest.
+                failed += 1
+                self.stderr.write(self.style.WARNING(f'  ✗ {name}: {e}'))
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {files} renditions for {images} images in {elapsed:.1f}s ({failed} failed)'
+        ))
@@ -0,0 +1,221 @@
+"""
+Django management command to import a website into the CMS.
+
+The site is crawled, and every internal page becomes a `Page` with its
+sections and content blocks, through the staged pipeline of
+`cms_app.cloning.importer`: fetch, parse, map, assets, persist. The stages
+run concurrently, and their timings are printed at the end. How pages map
+onto CMS content follows the rules registered for the site in
+`cms_app.cloning.sites`. A site given by URL gets the default rules.
+
+Pages are fetched over HTTP, at most `--concurrency` at a time and started
+at least `--delay` seconds apart, or with `--browser` rendered by that many
+headless browser sessions (see `cms_app.cloning.browser`). Images are
+downloaded as pages are mapped (see `cms_app.cloning.assets`).
+
+Re-running the command is incremental (see `cms_app.cloning.incremental`).
+Pages and images are fetched conditionally, so unchanged ones are not
+parsed or downloaded again. The sections and blocks of changed pages are
+diffed against the existing rows, and only rows that differ are written.
+`--full` re-parses every page. `--resume` continues an interrupted run
+without refetching the URLs it already completed.
+
+`--record FILE` stores every response in an archive file, and `--replay FILE`
+imports from such an archive without network access (see
+`cms_app.cloning.archive`). `--parser` selects the HTML parsing backend
+(see `cms_app.cloning.parsers`).
+
+Usage: python manage.py import_site SITE [--url URL] [--max-pages 200]
+                                    [--concurrency 8] [--delay 0]
+                                    [--browser [--headless]] [--skip-images]
+                                    [--full] [--resume]
+                                    [--record FILE | --replay FILE]
+                                    [--parser lxml]
+       python manage.py import_site --list
+"""
+import os
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from cms_app.cloning.archive import Archive, RecordingFetcher, ReplayFetcher
+from cms_app.cloning.browser import SELENIUM_AVAILABLE, BrowserPool
+from cms_app.cloning.fetch import Fetcher
+from cms_app.cloning.importer import SiteImport
+from cms_app.cloning.parsers import DEFAULT_PARSER, PARSERS
+from cms_app.cloning.sites import SITES, rules_for
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Imports a website into the CMS'
+    # Set by commands that import one fixed site
+    site = None
+    browser = False
+
+    def add_arguments(self, parser):
+        if self.site is None:
+            parser.add_argument(
+                'site',
+                nargs='?',
+                help=f'Site to import: a URL, or one of {", ".join(sorted(SITES))}',
+            )
+            parser.add_argument(
+                '--list',
+                action='store_true',
+                help='List the sites with mapping rules and exit',
+            )
+            parser.add_argument(
+                '--url',
+                help="Start URL, instead of the site's own",
+            )
+        if not self.browser:
+            parser.add_argument(
+                '--browser',
+                action='store_true',
+                help='Render pages in headless browsers instead of fetching them over HTTP',
+            )
+        parser.add_argument(
+            '--headless',
+            action='store_true',
+            help='Run browsers in headless mode',
+        )
+        parser.add_argument(
+            '--skip-images',
+            action='store_true',
+            help='Skip downloading images',
+        )
+        parser.add_argument(
+            '--max-pages',
+            type=int,
+            default=200,
+            help='Maximum number of pages to clone',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            help='Pages fetched in parallel (per host); browser sessions with --browser (default: 8, 4 browsers)',
+        )
+        parser.add_argument(
+            '--delay',
+            type=float,
+            default=0.0,
+            help='Minimum seconds between the starts of requests to one host',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Re-parse every page, even if it has not changed since the last run',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue the last interrupted run',
+        )
+        parser.add_argument(
+            '--record',
+            metavar='FILE',
+            help='Store every fetched response in this archive file (implies --full)',
+        )
+        parser.add_argument(
+            '--replay',
+            metavar='FILE',
+            help='Fetch from this archive file instead of the network',
+        )
+        parser.add_argument(
+            '--parser',
+            choices=PARSERS,
+            default=DEFAULT_PARSER,
+            help=f'HTML parsing backend (default: {DEFAULT_PARSER})',
+        )
+
+    def handle(self, *args, **options):
+        if options.get('list'):
+            for name, rules in sorted(SITES.items()):
+                self.stdout.write(f'{name:<12} {rules.start_url}' + ('  (browser)' if rules.browser else ''))
+            return
+
+        site = self.site or options.get('site')
+        if not site:
+            raise CommandError('Name the site to import (see --list) or give its URL')
+        try:
+            rules = rules_for(site)
+        except ValueError as e:
+            raise CommandError(str(e))
+        start_url = options.get('url') or rules.start_url
+        browser = self.browser or options.get('browser') or rules.browser
+        if options['concurrency'] is None:
+            options['concurrency'] = 4 if browser else 8
+
+        if browser and not SELENIUM_AVAILABLE:
+            self.stdout.write(self.style.ERROR(
+                'Selenium not installed. Install with: pip install -r requirements_scraping.txt'
+            ))
+            return
+        fetcher = self.make_fetcher(options, browser)
+
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write(self.style.SUCCESS(f'  Importing {start_url}'))
+        if browser:
+            self.stdout.write(self.style.SUCCESS('  Using Selenium WebDriver'))
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write('')
+
+        if not User.objects.filter(is_superuser=True).exists():
+            self.stdout.write(self.style.ERROR('No superuser found. Please create one first.'))
+            return
+
+        asset_fetcher = None
+        if browser:
+            # Downloads look like the browsers, cookies included (see share_cookies)
+            asset_fetcher = Fetcher(
+                per_host=options['concurrency'], delay=options['delay'],
+                headers={'User-Agent': fetcher.user_agent},
+            )
+        site_import = SiteImport(
+            rules, fetcher, self.stdout, self.style,
+            asset_fetcher=asset_fetcher,
+            start_url=start_url,
+            max_pages=options['max_pages'],
+            concurrency=options['concurrency'],
+            # Recording needs whole responses, not 304s
+            full=options['full'] or bool(options['record']),
+            resume=options['resume'],
+            parser=options['parser'],
+            skip_images=options['skip_images'],
+        )
+        try:
+            if not site_import.run():
+                return
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Error: {str(e)}'))
+            import traceback
+            traceback.print_exc()
+            return
+        finally:
+            if browser:
+                fetcher.close()
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write(self.style.SUCCESS('  Site cloned successfully!'))
+        self.stdout.write(self.style.SUCCESS('=' * 70))
+        self.stdout.write('')
+        self.stdout.write('Visit http://localhost:8000/ to see the cloned site')
+        self.stdout.write('')
+
+    def make_fetcher(self, options, browser):
+        if options['record'] and options['replay']:
+            raise CommandError('--record and --replay cannot be combined')
+        if browser:
+            if options['record'] or options['replay']:
+                raise CommandError('--record and --replay need pages fetched over HTTP, not --browser')
+            return BrowserPool(size=options['concurrency'], headless=options['headless'])
+        if options['replay']:
+            if not os.path.exists(options['replay']):
+                raise CommandError(f'Archive {options["replay"]} does not exist')
+            return ReplayFetcher(Archive(options['replay']))
+        if options['record']:
+            return RecordingFetcher(
+                Archive(options['record']), per_host=options['concurrency'], delay=options['delay']
+            )
+        return Fetcher(per_host=options['concurrency'], delay=options['delay'])
@@ -0,0 +1,77 @@
+"""
+Management command to run background jobs.
+
+Usage:
+    python manage.py run_jobs                 # work until stopped
+    python manage.py run_jobs --once          # drain the queue and exit
+    python manage.py run_jobs --name process_media
+"""
+import signal
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from cms_app.jobs import claim, run_job
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs (media processing etc.)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit when no job is due instead of waiting for more',
+        )
+        parser.add_argument(
+            '--name',
+            action='append',
+            help='Only run jobs with this name (repeatable)',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when the queue is empty',
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=0,
+            help='Exit after this many jobs (0 = no limit), e.g. to recycle workers',
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        succeeded = failed = 0
+        while not self.stopping:
+            close_old_connections()
+            queued = claim(names=options['name'])
+            if queued is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            started = time.perf_counter()
+            ok = run_job(queued)
+            elapsed = (time.perf_counter() - started) * 1000
+            if ok:
+                succeeded += 1
+                self.stdout.write(f'  ✓ {queued.name} #{queued.pk} ({elapsed:.0f} ms)')
+            else:
+                failed += 1
+                self.stderr.write(self.style.WARNING(
+                    f'  ✗ {queued.name} #{queued.pk} attempt {queued.attempts}/{queued.max_attempts}'
+                ))
+
+            if options['max_jobs'] and succeeded + failed >= options['max_jobs']:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f'✓ {succeeded} jobs done, {failed} failed'))
+
+    def stop(self, signum, frame):
+        # Finish the current job, then exit.
+        self.stopping = True
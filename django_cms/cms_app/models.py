@@ -1,14 +1,19 @@
 """
 Core models for Django CMS application.
 """
-from django.db import models
+from datetime import timedelta
+from django.conf import settings
+from django.db import models, transaction, IntegrityError
 from django.contrib.auth.models import User
+from django.core.files.images import get_image_dimensions
+from django.utils import timezone
 from django.utils.text import slugify
 from django.urls import reverse
 from ckeditor.fields import RichTextField
-from PIL import Image
-import os
+from . import renditions
+from .uploads import content_hash, media_type_for_name
 import json
+import uuid
 
 
 class SiteConfiguration(models.Model):
@@ -106,6 +111,12 @@ class Page(models.Model):
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_status = instance.__dict__.get('status')
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
@@ -118,6 +129,7 @@ class Page(models.Model):
             Page.objects.filter(is_home=True).exclude(pk=self.pk).update(is_home=False)
 
         super().save(*args, **kwargs)
+        self._saved_status = self.status
 
     def get_absolute_url(self):
         if self.is_home:
@@ -190,10 +202,17 @@ class Section(models.Model):
     def __str__(self):
         return f"{self.page.title} - {self.get_section_type_display()} ({self.order})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_is_visible = instance.__dict__.get('is_visible')
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.anchor_id and self.title:
             self.anchor_id = slugify(self.title)
         super().save(*args, **kwargs)
+        self._saved_is_visible = self.is_visible
 
 
 class ContentBlock(models.Model):
@@ -225,6 +244,10 @@ class ContentBlock(models.Model):
     # Image
     image = models.ImageField(upload_to='content_blocks/', blank=True, null=True)
     image_alt = models.CharField(max_length=200, blank=True, null=True)
+    image_width = models.IntegerField(blank=True, null=True, editable=False)
+    image_height = models.IntegerField(blank=True, null=True, editable=False)
+    image_dominant_color = models.CharField(max_length=7, blank=True, default='', editable=False)
+    image_placeholder = models.TextField(blank=True, default='', editable=False)
 
     # Link/Button
     link_url = models.CharField(max_length=500, blank=True, null=True)
@@ -272,9 +295,29 @@ class ContentBlock(models.Model):
         verbose_name = "Content Block"
         verbose_name_plural = "Content Blocks"
 
+    # Image field and the fields its dimensions are recorded in
+    image_dimension_fields = ('image', 'image_width', 'image_height')
+    # ... and the fields its placeholder is recorded in
+    placeholder_fields = ('image', 'image_dominant_color', 'image_placeholder')
+
     def __str__(self):
         return f"{self.section} - {self.get_block_type_display()} ({self.order})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_image_name = instance.__dict__.get('image')
+        return instance
+
+    def save(self, *args, **kwargs):
+        pending = []
+        if self.image.name != getattr(self, '_saved_image_name', None):
+            record_image_dimensions([self])
+            pending = record_placeholders([self])
+        super().save(*args, **kwargs)
+        self._saved_image_name = self.image.name
+        schedule_placeholders(pending)
+
 
 class MenuItem(models.Model):
     """
@@ -335,6 +378,112 @@ class MenuItem(models.Model):
         return '#'
 
 
+class Tag(models.Model):
+    """
+    Normalized media tag. Names are stored lowercase and trimmed, so the
+    unique index serves exact lookups and the pattern-ops index (used by
+    PostgreSQL only) case-sensitive prefix lookups.
+    """
+    name = models.CharField(max_length=100, unique=True)
+
+    class Meta:
+        ordering = ['name']
+        indexes = [
+            models.Index(fields=['name'], name='tag_name_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    @staticmethod
+    def normalize(name):
+        """Lowercase a tag and collapse its whitespace."""
+        return ' '.join((name or '').split()).lower()[:100]
+
+    @classmethod
+    def parse(cls, tags):
+        """Split a comma-separated tag string into unique normalized names, in order."""
+        names = (cls.normalize(name) for name in (tags or '').split(','))
+        return list(dict.fromkeys(name for name in names if name))
+
+    @classmethod
+    def get_or_create_many(cls, names):
+        """Return `{name: Tag}` for normalized names, creating missing tags in bulk."""
+        names = set(names)
+        if not names:
+            return {}
+        cls.objects.bulk_create([cls(name=name) for name in names], ignore_conflicts=True)
+        return {tag.name: tag for tag in cls.objects.filter(name__in=names)}
+
+
+class MediaBlob(models.Model):
+    """
+    A stored file, identified by the SHA-256 of its content.
+
+    Media rows with the same `content_hash` share one blob, so identical
+    uploads are stored and processed once. `ref_count` counts those rows;
+    blobs that drop to zero keep their file until it is garbage collected,
+    as other content (e.g. block images) may still point at the path.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, help_text='Storage path of the file')
+    size = models.BigIntegerField(blank=True, null=True)
+    width = models.IntegerField(blank=True, null=True)
+    height = models.IntegerField(blank=True, null=True)
+    dominant_color = models.CharField(max_length=7, blank=True, default='')
+    placeholder = models.TextField(blank=True, default='')
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Media Blob"
+        verbose_name_plural = "Media Blobs"
+
+    def __str__(self):
+        return f"{self.sha256[:12]} {self.name}"
+
+    @classmethod
+    def acquire(cls, sha256, name=None, size=None):
+        """
+        Add a reference to the blob for `sha256`, creating it for a newly
+        stored file (`name`) if there is none yet. Returns the blob.
+        """
+        updated = cls.objects.filter(sha256=sha256).update(ref_count=models.F('ref_count') + 1)
+        if not updated:
+            try:
+                with transaction.atomic():
+                    return cls.objects.create(sha256=sha256, name=name, size=size, ref_count=1)
+            except IntegrityError:
+                # Registered concurrently by another upload of the same bytes.
+                cls.objects.filter(sha256=sha256).update(ref_count=models.F('ref_count') + 1)
+        return cls.objects.get(sha256=sha256)
+
+    @classmethod
+    def acquire_many(cls, media_list, blobs):
+        """
+        Bulk `acquire` for media inserted without `save()`, each with a
+        distinct `content_hash`: one reference per row, to the blob in
+        `blobs` ({sha256: blob}) or to a new blob for the row's file.
+        """
+        cls.objects.filter(sha256__in=blobs).update(ref_count=models.F('ref_count') + 1)
+        cls.objects.bulk_create([
+            cls(
+                sha256=media.content_hash, name=media.file.name, size=media.file_size,
+                width=media.width, height=media.height, ref_count=1,
+                dominant_color=media.dominant_color, placeholder=media.placeholder,
+            )
+            for media in media_list if media.content_hash not in blobs
+        ])
+
+    @classmethod
+    def release(cls, sha256):
+        """Drop a reference to the blob for `sha256`."""
+        if sha256:
+            cls.objects.filter(sha256=sha256, ref_count__gt=0).update(
+                ref_count=models.F('ref_count') - 1
+            )
+
+
 class Media(models.Model):
     """
     Media library for managing uploaded files.
@@ -346,6 +495,13 @@ class Media(models.Model):
         ('other', 'Other'),
     ]
 
+    PROCESSING_STATUSES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
     title = models.CharField(max_length=200)
     file = models.FileField(upload_to='uploads/%Y/%m/')
     media_type = models.CharField(max_length=20, choices=MEDIA_TYPES, default='image')
@@ -357,8 +513,27 @@ class Media(models.Model):
     width = models.IntegerField(blank=True, null=True)
     height = models.IntegerField(blank=True, null=True)
 
+    # Low-quality placeholder shown while the image loads (see cms_app.placeholders)
+    dominant_color = models.CharField(max_length=7, blank=True, default='', editable=False)
+    placeholder = models.TextField(blank=True, default='', editable=False)
+
     # Organization
     tags = models.CharField(max_length=500, blank=True, null=True, help_text='Comma-separated tags')
+    tag_set = models.ManyToManyField(Tag, blank=True, related_name='media')
+
+    # Private files are only served to staff (see cms_app.protected_media)
+    is_private = models.BooleanField(default=False, help_text='Only staff can download the file')
+
+    # SHA-256 of the file content; rows with equal hashes share a MediaBlob
+    content_hash = models.CharField(max_length=64, blank=True, default='', db_index=True, editable=False)
+
+    # 64-bit perceptual hash (hex) and the group of near-duplicate images this
+    # one belongs to, set by find_near_duplicates (see cms_app.similarity)
+    perceptual_hash = models.CharField(max_length=16, blank=True, default='', editable=False)
+    duplicate_group = models.IntegerField(blank=True, null=True, db_index=True, editable=False)
+
+    # Processing of new files (dimensions, renditions) runs in a background job
+    processing_status = models.CharField(max_length=20, choices=PROCESSING_STATUSES, default='ready')
 
     # Timestamps
     uploaded_at = models.DateTimeField(auto_now_add=True)
@@ -369,38 +544,87 @@ class Media(models.Model):
         verbose_name = "Media File"
         verbose_name_plural = "Media Library"
 
+    placeholder_fields = ('file', 'dominant_color', 'placeholder')
+
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_file_name = instance.__dict__.get('file')
+        instance._saved_content_hash = instance.__dict__.get('content_hash')
+        return instance
+
     def save(self, *args, **kwargs):
-        if self.file:
+        file_changed = (
+            'file' not in self.get_deferred_fields()
+            and bool(self.file)
+            and self.file.name != getattr(self, '_saved_file_name', None)
+        )
+        blob_file_missing = False
+        if file_changed:
             # Determine media type from file extension
-            ext = os.path.splitext(self.file.name)[1].lower()
-            if ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg']:
-                self.media_type = 'image'
-            elif ext in ['.pdf', '.doc', '.docx', '.xls', '.xlsx']:
-                self.media_type = 'document'
-            elif ext in ['.mp4', '.avi', '.mov', '.wmv']:
-                self.media_type = 'video'
+            self.media_type = media_type_for_name(self.file.name)
+
+            # The size of a fresh upload is known without touching storage;
+            # everything else is filled in by the process_media job.
+            self.width = self.height = None
+            self.dominant_color = self.placeholder = self.perceptual_hash = ''
+            self.duplicate_group = None
+            self.processing_status = 'pending'
+            if not self.file._committed:
+                self.file_size = self.file.size
+                self.content_hash = content_hash(self.file)
+                blob = MediaBlob.objects.filter(sha256=self.content_hash).first()
+                if blob is not None and self.file.storage.exists(blob.name):
+                    # Same bytes are already stored: point at them instead of
+                    # writing another copy.
+                    self.file.name = blob.name
+                    self.file._committed = True
+                    self.file_size = blob.size or self.file_size
+                    self.width, self.height = blob.width, blob.height
+                    self.dominant_color, self.placeholder = blob.dominant_color, blob.placeholder
+                    if self.media_type != 'image' or blob.width:
+                        self.processing_status = 'ready'
+                else:
+                    # Nothing to reuse. A blob whose file is gone from
+                    # storage gets the copy written now.
+                    blob_file_missing = blob is not None
             else:
-                self.media_type = 'other'
-
-            # Get file size
-            self.file_size = self.file.size
-
-            # For images, get dimensions
-            if self.media_type == 'image' and ext != '.svg':
-                try:
-                    img = Image.open(self.file)
-                    self.width, self.height = img.size
-                except Exception:
-                    pass
+                # Pointed at an existing path; hashed when processed.
+                self.content_hash = ''
 
         super().save(*args, **kwargs)
+        self._saved_file_name = self.file.name
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'tags' in update_fields:
+            self.sync_tags()
+
+        if file_changed:
+            previous_hash = getattr(self, '_saved_content_hash', None)
+            if previous_hash != self.content_hash:
+                if self.content_hash:
+                    MediaBlob.acquire(self.content_hash, name=self.file.name, size=self.file_size)
+                MediaBlob.release(previous_hash)
+            self._saved_content_hash = self.content_hash
+            if blob_file_missing:
+                MediaBlob.objects.filter(sha256=self.content_hash).update(name=self.file.name)
+
+            if self.processing_status == 'pending':
+                from .jobs import enqueue
+                enqueue('process_media', media_id=self.pk)
+
+    def sync_tags(self):
+        """Mirror the comma-separated `tags` field into `tag_set`."""
+        tags = Tag.get_or_create_many(Tag.parse(self.tags))
+        self.tag_set.set(tags.values())
 
     def get_thumbnail_url(self):
         """Get thumbnail URL for images."""
         if self.media_type == 'image':
+            if renditions.is_resizable(self.file.name) and self.processing_status != 'failed':
+                return renditions.thumbnail_url(self.file)
             return self.file.url
         return None
 
@@ -415,10 +639,17 @@ class GalleryImage(models.Model):
         related_name='gallery_images'
     )
     image = models.ImageField(upload_to='galleries/')
+    width = models.IntegerField(blank=True, null=True, editable=False)
+    height = models.IntegerField(blank=True, null=True, editable=False)
+    dominant_color = models.CharField(max_length=7, blank=True, default='', editable=False)
+    placeholder = models.TextField(blank=True, default='', editable=False)
     alt_text = models.CharField(max_length=200, blank=True, null=True)
     caption = models.CharField(max_length=500, blank=True, null=True)
     order = models.IntegerField(default=0)
 
+    image_dimension_fields = ('image', 'width', 'height')
+    placeholder_fields = ('image', 'dominant_color', 'placeholder')
+
     class Meta:
         ordering = ['order']
         verbose_name = "Gallery Image"
@@ -426,3 +657,301 @@ class GalleryImage(models.Model):
 
     def __str__(self):
         return f"Gallery image for {self.content_block}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_image_name = instance.__dict__.get('image')
+        return instance
+
+    def save(self, *args, **kwargs):
+        pending = []
+        if self.image.name != getattr(self, '_saved_image_name', None):
+            record_image_dimensions([self])
+            pending = record_placeholders([self])
+        super().save(*args, **kwargs)
+        self._saved_image_name = self.image.name
+        schedule_placeholders(pending)
+
+
+def record_image_dimensions(objects):
+    """
+    Set the stored width/height of the images of content blocks or gallery
+    images (per their `image_dimension_fields`). Dimensions of media library
+    files are taken from `Media` in one query; other images are read from
+    their file header. Unreadable images get no dimensions.
+    """
+    objects = list(objects)
+    if not objects:
+        return
+    field_name, width_field, height_field = objects[0].image_dimension_fields
+    files = [getattr(obj, field_name) for obj in objects]
+    known = {
+        name: (width, height)
+        for name, width, height in Media.objects.filter(
+            file__in={file.name for file in files if file and file._committed},
+            width__isnull=False,
+        ).values_list('file', 'width', 'height')
+    }
+
+    for obj, file in zip(objects, files):
+        width = height = None
+        if file:
+            if file._committed and file.name in known:
+                width, height = known[file.name]
+            else:
+                try:
+                    # Also works for files assigned from a plain FileField
+                    # (e.g. `Media.file`), which have no width/height.
+                    width, height = get_image_dimensions(file)
+                except (OSError, ValueError):
+                    pass
+        setattr(obj, width_field, width)
+        setattr(obj, height_field, height)
+
+
+def record_placeholders(objects):
+    """
+    Set the placeholders of content block or gallery images (per their
+    `placeholder_fields`) from the media library, in one query. Returns the
+    objects whose image is not a processed library file; their placeholders
+    are computed by the `compute_placeholders` job (see
+    `schedule_placeholders`).
+    """
+    objects = list(objects)
+    if not objects:
+        return []
+    field_name, color_field, placeholder_field = objects[0].placeholder_fields
+    files = [getattr(obj, field_name) for obj in objects]
+    known = {
+        name: (color, placeholder)
+        for name, color, placeholder in Media.objects.filter(
+            file__in={file.name for file in files if file and file._committed},
+            processing_status='ready',
+        ).values_list('file', 'dominant_color', 'placeholder')
+    }
+
+    pending = []
+    for obj, file in zip(objects, files):
+        color, placeholder = known.get(file.name, ('', '')) if file and file._committed else ('', '')
+        setattr(obj, color_field, color)
+        setattr(obj, placeholder_field, placeholder)
+        if file and not (file._committed and file.name in known):
+            pending.append(obj)
+    return pending
+
+
+def schedule_placeholders(objects):
+    """Queue the computation of placeholders for saved objects."""
+    if objects:
+        from .jobs import enqueue
+        enqueue(
+            'compute_placeholders',
+            model=objects[0]._meta.label_lower,
+            pks=[obj.pk for obj in objects],
+        )
+
+
+class SearchDocument(models.Model):
+    """
+    Denormalized full-text search document for a published page, built from
+    its title, section titles, block titles and stripped rich text.
+    Kept up to date by `cms_app.search` when the page's content changes.
+    """
+    page = models.OneToOneField(
+        Page,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document'
+    )
+    title = models.CharField(max_length=200)
+    body = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Search Document"
+        verbose_name_plural = "Search Documents"
+
+    def __str__(self):
+        return self.title
+
+
+class ChangeLogEntry(models.Model):
+    """
+    Append-only log of content changes, used by the change feed API.
+    The primary key doubles as the sync cursor.
+
+    Entries are inserted in the transaction that makes the change, so a
+    change is never committed without its entry. Ids are allocated at
+    insert, though, so concurrent writers can make a lower id visible after
+    a higher one. The feed therefore only hands out `settled()` entries,
+    which are older than `CHANGE_FEED_SAFETY_LAG` seconds (longer than a
+    transaction stays open after writing its entries), and delivery is at
+    least once: a consumer may see an entry again, but never skips one.
+    """
+    ACTION_CHOICES = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+    ]
+
+    model = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    changed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['model', 'object_id'], name='changelog_object_idx'),
+        ]
+        verbose_name = "Change Log Entry"
+        verbose_name_plural = "Change Log"
+
+    def __str__(self):
+        return f"#{self.pk} {self.model}:{self.object_id} {self.action}"
+
+    @classmethod
+    def record(cls, model, object_ids, action):
+        """Append entries for the given objects, in the current transaction."""
+        model_name = model._meta.model_name
+        cls.objects.bulk_create([
+            cls(model=model_name, object_id=object_id, action=action)
+            for object_id in object_ids
+        ])
+
+    @classmethod
+    def settled(cls):
+        """
+        Entries that no lower id can appear before any more: all entries
+        up to the first one written within the safety lag.
+        """
+        lag = getattr(settings, 'CHANGE_FEED_SAFETY_LAG', 5)
+        cutoff = timezone.now() - timedelta(seconds=lag)
+        first_recent = cls.objects.filter(changed_at__gt=cutoff).order_by('id').values_list('id', flat=True).first()
+        entries = cls.objects.all()
+        if first_recent is not None:
+            entries = entries.filter(id__lt=first_recent)
+        return entries
+
+    @classmethod
+    def latest_cursor(cls):
+        """Return the cursor of the most recent settled entry (0 if there is none)."""
+        return cls.settled().order_by('-id').values_list('id', flat=True).first() or 0
+
+
+class Job(models.Model):
+    """
+    Background job, run by `manage.py run_jobs`.
+    See `cms_app.jobs` for enqueueing, claiming and retries.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_queue_idx'),
+        ]
+        verbose_name = "Background Job"
+        verbose_name_plural = "Background Jobs"
+
+    def __str__(self):
+        return f"#{self.pk} {self.name} ({self.status})"
+
+
+class UploadSession(models.Model):
+    """
+    A chunked, resumable upload in progress. Chunks are appended to a
+    temporary file; once `offset` reaches `size` the file becomes a Media
+    item. See `cms_app.chunked_uploads`.
+    """
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField(max_length=255)
+    title = models.CharField(max_length=200, blank=True)
+    # Metadata given to the Media item once the upload completes
+    alt_text = models.CharField(max_length=200, blank=True)
+    caption = models.TextField(blank=True)
+    tags = models.CharField(max_length=500, blank=True, help_text='Comma-separated tags')
+    is_private = models.BooleanField(default=False)
+    size = models.BigIntegerField(help_text='Total size in bytes')
+    offset = models.BigIntegerField(default=0, help_text='Bytes received so far')
+    sha256 = models.CharField(max_length=64, blank=True, help_text='Expected SHA-256 of the whole file')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='uploading')
+    media = models.ForeignKey('Media', on_delete=models.SET_NULL, null=True, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Upload Session"
+        verbose_name_plural = "Upload Sessions"
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
+
+
+class CloneRun(models.Model):
+    """
+    One run of a site clone command. A run that did not finish can be
+    resumed: URLs it already processed are not fetched again.
+    """
+    start_url = models.URLField(max_length=500)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-started_at']
+        verbose_name = "Clone Run"
+        verbose_name_plural = "Clone Runs"
+
+    def __str__(self):
+        return f"{self.start_url} ({self.started_at:%Y-%m-%d %H:%M})"
+
+
+class FetchRecord(models.Model):
+    """
+    What a clone command last fetched from a URL: validators for conditional
+    requests, the content hash, the page or media item made from it, and
+    (for pages) the links it contains. See `cms_app.cloning.incremental`.
+    """
+    url = models.URLField(max_length=1000, unique=True)
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)
+    links = models.JSONField(default=list, blank=True)
+    page = models.ForeignKey(Page, on_delete=models.SET_NULL, null=True, blank=True, related_name='fetch_records')
+    media = models.ForeignKey(Media, on_delete=models.SET_NULL, null=True, blank=True, related_name='fetch_records')
+    last_run = models.ForeignKey(CloneRun, on_delete=models.SET_NULL, null=True, blank=True, related_name='records')
+    fetched_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['url']
+        verbose_name = "Fetch Record"
+        verbose_name_plural = "Fetch Records"
+
+    def __str__(self):
+        return self.url
@@ -0,0 +1,143 @@
+"""
+Low-quality image placeholders.
+
+Every image gets a dominant color and a tiny preview (at most
+`PREVIEW_SIZE` pixels on its longest side) encoded as a data URI of a few
+hundred bytes. The page renderer inlines both as the `<img>` background, so
+something resembling the image is painted with the HTML, before the image
+itself arrives, without extra requests.
+
+Images are decoded at reduced size where the format allows (JPEG draft
+mode). Dominant colors of a batch are computed in one vectorized pass with
+NumPy when it is installed, and per image otherwise. Images with
+transparency get no placeholder, as it would show through them.
+"""
+import base64
+import io
+from collections import Counter
+from PIL import Image
+from . import renditions
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+PREVIEW_SIZE = 16
+
+# Dominant colors are the mean of the most common bucket of colors reduced
+# to 4 bits per channel, sampled on a COLOR_SAMPLE_SIZE square.
+COLOR_SAMPLE_SIZE = 16
+COLOR_BITS = 4
+
+PREVIEW_FORMAT = 'WEBP' if renditions.WEBP_AVAILABLE else 'JPEG'
+
+
+def small_image(file):
+    """
+    Decode an image file into a small RGB image for placeholders, or None
+    for files that cannot be read or have transparency.
+    """
+    try:
+        if hasattr(file, 'open'):
+            file.open('rb')
+        with Image.open(file) as image:
+            # Lets JPEG decode at 1/2 to 1/8 scale; a no-op for other formats.
+            image.draft('RGB', (PREVIEW_SIZE * 4, PREVIEW_SIZE * 4))
+            image.thumbnail((PREVIEW_SIZE * 4, PREVIEW_SIZE * 4), Image.BILINEAR)
+            if has_transparency(image):
+                return None
+            return image.convert('RGB')
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    finally:
+        if hasattr(file, 'close'):
+            file.close()
+
+
+def has_transparency(image):
+    if image.mode == 'P':
+        return 'transparency' in image.info
+    if image.mode in ('RGBA', 'LA', 'PA'):
+        return image.getchannel('A').getextrema()[0] < 255
+    return False
+
+
+def preview_uri(image):
+    """Data URI of a preview of a small RGB image."""
+    preview = image.copy()
+    preview.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE), Image.LANCZOS)
+    buffer = io.BytesIO()
+    preview.save(buffer, PREVIEW_FORMAT, quality=40)
+    encoded = base64.b64encode(buffer.getvalue()).decode('ascii')
+    return f'data:image/{PREVIEW_FORMAT.lower()};base64,{encoded}'
+
+
+def to_hex(rgb):
+    return '#{:02x}{:02x}{:02x}'.format(*(int(round(value)) for value in rgb))
+
+
+def dominant_colors(images):
+    """Hex dominant colors of a list of RGB images."""
+    if not images:
+        return []
+    size = (COLOR_SAMPLE_SIZE, COLOR_SAMPLE_SIZE)
+    samples = [image.resize(size, Image.BILINEAR) for image in images]
+    if not NUMPY_AVAILABLE:
+        return [_dominant_color(sample) for sample in samples]
+
+    shift = 8 - COLOR_BITS
+    buckets = 1 << (3 * COLOR_BITS)
+    pixels = np.stack([np.asarray(sample) for sample in samples]).reshape(len(samples), -1, 3)
+    quantized = (pixels >> shift).astype(np.int64)
+    bucket = (quantized[..., 0] << (2 * COLOR_BITS)) | (quantized[..., 1] << COLOR_BITS) | quantized[..., 2]
+    # One histogram for the whole batch: each image gets its own range of buckets.
+    index = (bucket + np.arange(len(samples))[:, None] * buckets).ravel()
+    counts = np.bincount(index, minlength=len(samples) * buckets).reshape(len(samples), buckets)
+    top = counts.argmax(axis=1)
+    top_index = top + np.arange(len(samples)) * buckets
+    means = [
+        np.bincount(index, weights=pixels[..., channel].ravel(), minlength=len(samples) * buckets)[top_index]
+        / counts[np.arange(len(samples)), top]
+        for channel in range(3)
+    ]
+    return [to_hex(rgb) for rgb in np.stack(means, axis=1)]
+
+
+def _dominant_color(sample):
+    shift = 8 - COLOR_BITS
+    pixels = list(sample.getdata())
+    bucket, _ = Counter((r >> shift, g >> shift, b >> shift) for r, g, b in pixels).most_common(1)[0]
+    members = [pixel for pixel in pixels if (pixel[0] >> shift, pixel[1] >> shift, pixel[2] >> shift) == bucket]
+    return to_hex(sum(pixel[channel] for pixel in members) / len(members) for channel in range(3))
+
+
+def compute(files):
+    """
+    `(dominant color, preview data URI)` for each image file, or `('', '')`
+    for files that get no placeholder.
+    """
+    images = [small_image(file) for file in files]
+    readable = [image for image in images if image is not None]
+    colors = iter(dominant_colors(readable))
+    return [
+        (next(colors), preview_uri(image)) if image is not None else ('', '')
+        for image in images
+    ]
+
+
+def fill(objects):
+    """
+    Compute and set the placeholders of model instances (per their
+    `placeholder_fields`) in one batch. Returns the instances changed.
+    """
+    objects = [obj for obj in objects if getattr(obj, obj.placeholder_fields[0])]
+    if not objects:
+        return []
+    field_name, color_field, placeholder_field = objects[0].placeholder_fields
+    results = compute([getattr(obj, field_name) for obj in objects])
+    for obj, (color, placeholder) in zip(objects, results):
+        setattr(obj, color_field, color)
+        setattr(obj, placeholder_field, placeholder)
+    return objects
@@ -0,0 +1,190 @@
+"""
+Access-controlled media delivery.
+
+Every request under `MEDIA_URL` (and every rendition) is authorized here,
+then the transfer is handed to the web server so no Python worker is tied
+up streaming the file. `PROTECTED_MEDIA_SERVER` selects how:
+
+- 'nginx': an `X-Accel-Redirect` to `PROTECTED_MEDIA_INTERNAL_URL`, an
+  `internal` nginx location aliased to `MEDIA_ROOT`
+- 'sendfile': an `X-Sendfile` header with the file's path (Apache
+  mod_xsendfile, lighttpd)
+- 'django': a `FileResponse` streamed by Django, with single-range
+  `Range` support for video seeking and resumable downloads
+
+A file is public unless it belongs only to private media library items, or
+is used only by pages that are not published. Staff can access everything.
+Decisions are cached for `PROTECTED_MEDIA_CACHE_TIMEOUT` seconds and
+dropped when content changes.
+"""
+import mimetypes
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.http import HttpResponse, HttpResponseNotModified, FileResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.static import was_modified_since
+from .models import Page, Section, ContentBlock, GalleryImage, Media
+
+CACHE_KEY_PREFIX = 'media_access:'
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def get_setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _cache_key(name):
+    # Storage names can contain characters memcached does not allow in keys.
+    return CACHE_KEY_PREFIX + quote(name, safe='')
+
+
+def _check_is_public(name):
+    is_private = set(Media.objects.filter(file=name).values_list('is_private', flat=True))
+    if is_private:
+        # Library items sharing the file (same content) make it public.
+        return False in is_private
+
+    statuses = set(
+        Page.objects.filter(
+            Q(og_image=name)
+            | Q(pk__in=Section.objects.filter(background_image=name).values('page_id'))
+            | Q(pk__in=ContentBlock.objects.filter(image=name).values('section__page_id'))
+            | Q(pk__in=GalleryImage.objects.filter(image=name).values('content_block__section__page_id'))
+        ).values_list('status', flat=True)
+    )
+    # Files nothing refers to (branding, editor uploads) stay public.
+    return not statuses or 'published' in statuses
+
+
+def is_public(name):
+    """Whether anyone may download the file stored under `name`."""
+    key = _cache_key(name)
+    public = cache.get(key)
+    if public is None:
+        public = _check_is_public(name)
+        cache.set(key, public, get_setting('PROTECTED_MEDIA_CACHE_TIMEOUT', 60))
+    return public
+
+
+def forget(name):
+    """Drop the cached decision for a file, e.g. after its media item changed."""
+    if name:
+        cache.delete(_cache_key(name))
+
+
+class FileRange:
+    """Read-only view of `length` bytes of a file, starting at `start`."""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    `(start, end)` (inclusive) of a single `bytes=` range, or None when the
+    whole file should be sent (no header, several ranges, bad syntax).
+    Raises ValueError for ranges outside the file.
+    """
+    match = RANGE_RE.match(header or '')
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the last N bytes
+        length = int(last)
+        if not length:
+            raise ValueError('Empty suffix range')
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError('Range not satisfiable')
+    return start, end
+
+
+def _file_response(request, name, content_type, storage):
+    try:
+        modified = storage.get_modified_time(name).timestamp()
+    except (NotImplementedError, OSError):
+        modified = None
+    if modified is not None and not was_modified_since(
+            request.META.get('HTTP_IF_MODIFIED_SINCE'), modified):
+        return HttpResponseNotModified()
+
+    size = storage.size(name)
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range or (modified is not None and parse_http_date_safe(if_range) == int(modified)):
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    file = storage.open(name, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = FileResponse(FileRange(file, start, end - start + 1), status=206,
+                                content_type=content_type)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    if modified is not None:
+        response['Last-Modified'] = http_date(modified)
+    return response
+
+
+def serve(request, name, content_type=None, public=True, storage=None):
+    """
+    Response delivering an already authorized file. `public` responses may
+    be cached by shared caches; others are marked private.
+    """
+    storage = storage or default_storage
+    content_type = content_type or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    server = get_setting('PROTECTED_MEDIA_SERVER', 'django')
+    path = _local_path(storage, name) if server == 'sendfile' else None
+
+    if server == 'nginx':
+        response = HttpResponse(content_type=content_type)
+        internal_url = get_setting('PROTECTED_MEDIA_INTERNAL_URL', '/protected/')
+        response['X-Accel-Redirect'] = internal_url + quote(name)
+    elif path:
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    else:
+        response = _file_response(request, name, content_type, storage)
+
+    if public:
+        patch_cache_control(response, public=True,
+                            max_age=get_setting('PROTECTED_MEDIA_MAX_AGE', 60 * 60))
+    else:
+        patch_cache_control(response, private=True, max_age=0)
+    return response
+
+
+def _local_path(storage, name):
+    try:
+        return storage.path(name)
+    except NotImplementedError:
+        return None
@@ -0,0 +1,197 @@
+"""
+Index of stored files that are still referenced.
+
+A file is in use when a file field points at it (media items, block, gallery,
+section background, page OG and branding images), when rich text links to
+it with `<img src>`, `srcset` or `href`, which is how CKEditor uploads are
+used, or when a button or menu item links to its URL. Thumbnails CKEditor makes for its file browser and renditions live as
+long as their source file.
+
+The index is built by streaming the referencing columns, so memory grows
+with the number of distinct files, not with the size of the content.
+"""
+import os
+import re
+from urllib.parse import quote, urlsplit, unquote
+from django.apps import apps
+from django.conf import settings
+from django.db import models
+from django.db.models import Q
+from django.urls import reverse
+from . import renditions
+from .models import ContentBlock, MenuItem, SiteConfiguration, MediaBlob
+
+# Rich text that may embed or link uploaded files
+RICH_TEXT_FIELDS = [
+    (ContentBlock, 'content'),
+    (ContentBlock, 'html_content'),
+    (SiteConfiguration, 'footer_text'),
+]
+
+# Links that may point at uploaded files (e.g. a PDF behind a button)
+URL_FIELDS = [
+    (ContentBlock, 'link_url'),
+    (MenuItem, 'external_url'),
+]
+
+URL_ATTRIBUTE_RE = re.compile(r'''\b(src|href|srcset)\s*=\s*(["'])(.*?)\2''', re.IGNORECASE | re.DOTALL)
+
+THUMBNAIL_SUFFIX = '_thumb'
+
+
+def file_fields():
+    """`(model, field name)` for every file field of the app's models."""
+    for model in apps.get_app_config('cms_app').get_models():
+        if model is MediaBlob:
+            # Blobs mirror Media.file; unused blobs are what GC reclaims.
+            continue
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField):
+                yield model, field.name
+
+
+def _url_prefixes():
+    rendition_base = reverse('rendition', kwargs={'width': 1, 'fmt': 'auto', 'name': 'x'})
+    return urlsplit(settings.MEDIA_URL).path, rendition_base[:-len('1/auto/x')]
+
+
+def _split_url(url, prefixes):
+    """`(path up to the storage name, storage name)` of a media or rendition URL."""
+    media_prefix, rendition_prefix = prefixes
+    path = unquote(urlsplit(url.strip()).path)
+    if path.startswith(media_prefix):
+        return media_prefix, path[len(media_prefix):]
+    if path.startswith(rendition_prefix):
+        # <width>/<format>/<source name>
+        parts = path[len(rendition_prefix):].split('/', 2)
+        if len(parts) == 3:
+            return rendition_prefix + parts[0] + '/' + parts[1] + '/', parts[2]
+    return None, None
+
+
+def name_from_url(url, prefixes=None):
+    """Storage name a media or rendition URL points at, or None."""
+    return _split_url(url, prefixes or _url_prefixes())[1] or None
+
+
+def rewrite_url(url, renames, prefixes=None):
+    """
+    `url` pointed at the new name if it is the URL of a file (or of a
+    rendition of a file) renamed in `renames` (`{old name: new name}`);
+    otherwise `url` unchanged.
+    """
+    head, name = _split_url(url, prefixes or _url_prefixes())
+    if name not in renames:
+        return url
+    return urlsplit(url.strip())._replace(path=quote(head + renames[name])).geturl()
+
+
+def names_in_html(html, prefixes=None):
+    """Storage names of files used by `src`, `srcset` and `href` attributes."""
+    prefixes = prefixes or _url_prefixes()
+    names = set()
+    for _, _, value in URL_ATTRIBUTE_RE.findall(html or ''):
+        # A srcset is a comma-separated list of "<url> <descriptor>".
+        candidates = [part.split()[0] for part in value.split(',') if part.split()] or [value]
+        for url in candidates:
+            name = name_from_url(url, prefixes)
+            if name:
+                names.add(name)
+    return names
+
+
+def rewrite_html(html, renames, prefixes=None):
+    """
+    Point `src`, `srcset` and `href` attributes at renamed files. Only whole
+    URLs are rewritten, never names that merely start with a renamed one.
+    """
+    prefixes = prefixes or _url_prefixes()
+
+    def rewrite(match):
+        attribute, value = match.group(1), match.group(3)
+        if attribute.lower() == 'srcset':
+            # A comma-separated list of "<url> <descriptor>"
+            candidates = []
+            for candidate in value.split(','):
+                url = candidate.split()[0] if candidate.split() else ''
+                if url:
+                    candidate = candidate.replace(url, rewrite_url(url, renames, prefixes), 1)
+                candidates.append(candidate)
+            value = ','.join(candidates)
+        else:
+            value = rewrite_url(value, renames, prefixes)
+        start = match.start(3) - match.start(0)
+        return match.group(0)[:start] + value + match.group(2)
+
+    return URL_ATTRIBUTE_RE.sub(rewrite, html or '')
+
+
+def names_in_url_fields(prefixes=None, chunk_size=2000):
+    """Yield the names of files linked from `URL_FIELDS` (names may repeat)."""
+    prefixes = prefixes or _url_prefixes()
+    for model, field_name in URL_FIELDS:
+        linked = Q()
+        for prefix in prefixes:
+            linked |= Q(**{f'{field_name}__contains': prefix})
+        queryset = model.objects.filter(linked).values_list(field_name, flat=True)
+        for url in queryset.iterator(chunk_size=chunk_size):
+            name = name_from_url(url, prefixes)
+            if name:
+                yield name
+
+
+def iter_references(chunk_size=2000):
+    """Yield the name of every referenced file (names may repeat)."""
+    for model, field_name in file_fields():
+        queryset = (
+            model.objects.exclude(**{f'{field_name}__isnull': True}).exclude(**{field_name: ''})
+            .values_list(field_name, flat=True)
+        )
+        yield from queryset.iterator(chunk_size=chunk_size)
+
+    prefixes = _url_prefixes()
+    for model, field_name in RICH_TEXT_FIELDS:
+        queryset = model.objects.filter(**{f'{field_name}__contains': '='}).values_list(field_name, flat=True)
+        for html in queryset.iterator(chunk_size=chunk_size):
+            yield from names_in_html(html, prefixes)
+
+    yield from names_in_url_fields(prefixes, chunk_size)
+
+
+def build_index(chunk_size=2000):
+    """Set of the names of all referenced files."""
+    return set(iter_references(chunk_size))
+
+
+def source_of(name):
+    """The file a derived file (rendition, CKEditor thumbnail) belongs to, or None."""
+    parsed = renditions.parse_rendition_name(name)
+    if parsed:
+        return parsed[0]
+    stem, ext = os.path.splitext(name)
+    if stem.endswith(THUMBNAIL_SUFFIX):
+        return stem[:-len(THUMBNAIL_SUFFIX)] + ext
+    return None
+
+
+def is_referenced(name, index):
+    """Whether a stored file is in use according to `index`."""
+    if name in index:
+        return True
+    source = source_of(name)
+    return source is not None and source in index
+
+
+def referenced_among(names):
+    """
+    The subset of `names` referenced by file fields or links right now; a
+    cheap re-check before deleting files found unreferenced by an older index.
+    """
+    names = set(names)
+    found = set()
+    for model, field_name in file_fields():
+        found.update(
+            model.objects.filter(**{f'{field_name}__in': names}).values_list(field_name, flat=True)
+        )
+    found.update(name for name in names_in_url_fields() if name in names)
+    return found
@@ -0,0 +1,267 @@
+"""
+Resized and re-encoded variants ("renditions") of uploaded images.
+
+Renditions are generated with Pillow on first request (or ahead of time with
+`generate_renditions`) and stored next to the uploads under deterministic,
+reversible names:
+
+    renditions/<source name>/<width>.<format>
+    renditions/uploads/2024/01/hero.jpg/640.webp
+
+They are served by `/renditions/<width>/<format>/<source name>`, where the
+format may be `auto` to pick AVIF, WebP or the original format from the
+browser's `Accept` header. Widths are restricted to `RENDITION_WIDTHS`, so
+the number of files per image is bounded. Images are never upscaled: widths
+above the source width are encoded at the source width.
+"""
+import os
+from io import BytesIO
+from urllib.parse import quote
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse, get_script_prefix
+from django.utils.http import RFC3986_SUBDELIMS
+from PIL import Image, ImageOps, features
+
+# Optional AVIF support (Pillow < 11 needs the pillow-avif-plugin package)
+try:
+    import pillow_avif  # noqa: F401  (registers the AVIF codec with Pillow)
+except ImportError:
+    pass
+
+AVIF_AVAILABLE = 'AVIF' in Image.SAVE
+WEBP_AVAILABLE = features.check('webp')
+
+RENDITION_PREFIX = 'renditions/'
+
+DEFAULT_WIDTHS = [160, 320, 640, 960, 1280, 1920]
+THUMBNAIL_WIDTH = 320
+DEFAULT_QUALITY = {'avif': 60, 'webp': 80, 'jpeg': 82}
+
+# Source extensions that can be resized, and the format they are re-encoded to
+# when the browser accepts neither AVIF nor WebP.
+SOURCE_FORMATS = {
+    '.jpg': 'jpeg',
+    '.jpeg': 'jpeg',
+    '.png': 'png',
+    '.webp': 'png',
+}
+
+CONTENT_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+}
+
+EXTENSIONS = {'avif': 'avif', 'webp': 'webp', 'jpeg': 'jpg', 'png': 'png'}
+FORMATS_BY_EXTENSION = {extension: fmt for fmt, extension in EXTENSIONS.items()}
+
+
+def get_widths():
+    return sorted(getattr(settings, 'RENDITION_WIDTHS', DEFAULT_WIDTHS))
+
+
+def nearest_width(target):
+    """The smallest ladder width at least `target` (or the largest one)."""
+    widths = get_widths()
+    return next((width for width in widths if width >= target), widths[-1])
+
+
+def get_quality(fmt):
+    return getattr(settings, 'RENDITION_QUALITY', {}).get(fmt, DEFAULT_QUALITY.get(fmt, 85))
+
+
+def modern_formats():
+    """Formats preferred over the original, best first."""
+    formats = []
+    if AVIF_AVAILABLE:
+        formats.append('avif')
+    if WEBP_AVAILABLE:
+        formats.append('webp')
+    return formats
+
+
+def fallback_format(name):
+    """Format an image is re-encoded to for browsers without AVIF/WebP support."""
+    return SOURCE_FORMATS.get(os.path.splitext(name)[1].lower())
+
+
+def is_resizable(name):
+    """Whether renditions can be made from the file (not SVG, GIF, documents...)."""
+    return bool(name) and fallback_format(name) is not None
+
+
+def formats_for(name):
+    """All formats renditions of `name` can be requested in."""
+    return modern_formats() + [fallback_format(name)]
+
+
+def rendition_name(source_name, width, fmt):
+    """Storage name of a rendition."""
+    return f'{RENDITION_PREFIX}{source_name}/{width}.{EXTENSIONS[fmt]}'
+
+
+def parse_rendition_name(name):
+    """
+    Split a rendition storage name into `(source_name, width, fmt)`.
+    Returns None for names that are not renditions.
+    """
+    if not name.startswith(RENDITION_PREFIX):
+        return None
+    source_name, _, filename = name[len(RENDITION_PREFIX):].rpartition('/')
+    width, _, extension = filename.partition('.')
+    if not source_name or not width.isdigit() or extension not in FORMATS_BY_EXTENSION:
+        return None
+    return source_name, int(width), FORMATS_BY_EXTENSION[extension]
+
+
+def is_safe_source_name(name):
+    """Reject absolute paths and parent references in user-supplied names."""
+    parts = name.split('/')
+    return (
+        bool(name) and not name.startswith('/') and '\\' not in name
+        and all(part not in ('', '.', '..') for part in parts)
+        and not name.startswith(RENDITION_PREFIX)
+    )
+
+
+def negotiate_format(name, accept):
+    """Pick the best format for an `Accept` header value."""
+    accept = accept or ''
+    for fmt in modern_formats():
+        if CONTENT_TYPES[fmt] in accept:
+            return fmt
+    return fallback_format(name)
+
+
+def _name(file_or_name):
+    return getattr(file_or_name, 'name', file_or_name) or ''
+
+
+_url_bases = {}
+
+
+def rendition_url(file_or_name, width, fmt='auto'):
+    """URL of the rendition view for a file (or storage name)."""
+    # Equivalent to reverse('rendition', ...), which is too slow for srcsets
+    # of every image in a list response.
+    script_prefix = get_script_prefix()
+    base = _url_bases.get(script_prefix)
+    if base is None:
+        base = reverse('rendition', kwargs={'width': 1, 'fmt': 'auto', 'name': 'x'})[:-len('1/auto/x')]
+        _url_bases[script_prefix] = base
+    name = quote(_name(file_or_name), safe=RFC3986_SUBDELIMS + "/~:@")
+    return f'{base}{width}/{fmt}/{name}'
+
+
+def thumbnail_url(file_or_name):
+    """URL of a small rendition for previews."""
+    return rendition_url(file_or_name, nearest_width(THUMBNAIL_WIDTH))
+
+
+def srcset_widths(source_width=None):
+    """
+    `(requested width, actual width)` pairs for a srcset: every ladder width
+    below the source width, plus one at the source width. Without a known
+    source width the whole ladder is used.
+    """
+    widths = get_widths()
+    if not source_width:
+        return [(width, width) for width in widths]
+    pairs = [(width, width) for width in widths if width < source_width]
+    larger = [width for width in widths if width >= source_width]
+    if larger:
+        pairs.append((larger[0], source_width))
+    return pairs
+
+
+def srcset(file_or_name, source_width=None, fmt='auto', build_url=None):
+    """A `srcset` attribute value for a file, or '' if it cannot be resized."""
+    name = _name(file_or_name)
+    if not is_resizable(name):
+        return ''
+    build_url = build_url or (lambda url: url)
+    return ', '.join(
+        f'{build_url(rendition_url(name, width, fmt))} {actual}w'
+        for width, actual in srcset_widths(source_width)
+    )
+
+
+def srcsets(file_or_name, source_width=None, build_url=None):
+    """`{format: srcset}` for every format renditions of a file can be served in."""
+    name = _name(file_or_name)
+    if not is_resizable(name):
+        return {}
+    return {
+        fmt: srcset(name, source_width, fmt, build_url=build_url)
+        for fmt in formats_for(name)
+    }
+
+
+def generate(source_name, width, fmt, storage=None):
+    """
+    Create a rendition unless it already exists, and return its storage name.
+    Raises `FileNotFoundError` if the source is missing, and `OSError`,
+    `ValueError` or `Image.DecompressionBombError` if it cannot be decoded.
+    """
+    storage = storage or default_storage
+    name = rendition_name(source_name, width, fmt)
+    if storage.exists(name):
+        return name
+    if not storage.exists(source_name):
+        raise FileNotFoundError(source_name)
+
+    with storage.open(source_name, 'rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+
+        if width < image.width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+
+        if fmt == 'jpeg':
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or 'A' in image.mode else 'RGB')
+
+        buffer = BytesIO()
+        options = {'quality': get_quality(fmt)}
+        if fmt in ('jpeg', 'png'):
+            options['optimize'] = True
+        if fmt == 'jpeg':
+            options['progressive'] = True
+        if fmt == 'webp':
+            options['method'] = 4
+        image.save(buffer, format=fmt.upper(), **options)
+
+    saved_name = storage.save(name, ContentFile(buffer.getvalue()))
+    if saved_name != name:
+        # Another request generated it concurrently; keep theirs.
+        storage.delete(saved_name)
+    return name
+
+
+def generate_all(source_name, source_width=None, storage=None):
+    """Generate every rendition used by `srcset()`. Returns the created names."""
+    if not is_resizable(source_name):
+        return []
+    return [
+        generate(source_name, width, fmt, storage=storage)
+        for width, _ in srcset_widths(source_width)
+        for fmt in formats_for(source_name)
+    ]
+
+
+def delete_all(source_name, storage=None):
+    """Delete the renditions of a source file."""
+    storage = storage or default_storage
+    directory = f'{RENDITION_PREFIX}{source_name}'
+    try:
+        _, files = storage.listdir(directory)
+    except (FileNotFoundError, NotImplementedError):
+        return
+    for filename in files:
+        storage.delete(f'{directory}/{filename}')
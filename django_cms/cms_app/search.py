@@ -0,0 +1,371 @@
+"""
+Full-text search over page content.
+
+Every published page has a `SearchDocument` holding its title and the text of
+its visible sections and blocks. Documents are indexed by a backend matching
+the database engine:
+
+- SQLite: an FTS5 virtual table, ranked with bm25()
+- PostgreSQL: a weighted tsvector table with a GIN index, ranked with ts_rank_cd()
+- anything else: `icontains` over the documents
+
+The index tables are created on first use (see `SearchBackend.setup`).
+Documents are rebuilt incrementally once the transaction that changed a page,
+section or block commits; `manage.py rebuild_search_index` rebuilds everything.
+"""
+import html
+import logging
+import re
+import threading
+from collections import namedtuple
+from django.conf import settings
+from django.db import connection, transaction, DatabaseError
+from django.utils.html import escape, strip_tags
+from django.utils.safestring import mark_safe
+from .models import Page, Section, ContentBlock, SearchDocument
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'\w+')
+WHITESPACE_RE = re.compile(r'\s+')
+
+# Highlight markers used by the backends; swapped for <mark> after escaping.
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+SearchResult = namedtuple('SearchResult', ['page', 'score', 'title_html', 'snippet_html'])
+
+
+def strip_html(value):
+    """Reduce rich text to plain, single-spaced text."""
+    if not value:
+        return ''
+    return WHITESPACE_RE.sub(' ', html.unescape(strip_tags(value))).strip()
+
+
+def query_terms(query):
+    """Split a user query into at most 10 lowercase word tokens."""
+    return [term.lower() for term in TOKEN_RE.findall(query or '')][:10]
+
+
+def mark_highlights(text):
+    """Escape backend output and turn the highlight markers into <mark> tags."""
+    return mark_safe(
+        escape(text or '').replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>')
+    )
+
+
+class SearchBackend:
+    """
+    Fallback backend: matches documents with `icontains` and highlights in
+    Python. Engine-specific backends override the index hooks.
+    """
+    snippet_length = 200
+
+    def setup(self):
+        """Create index structures if needed. Returns False if unsupported."""
+        return True
+
+    def clear(self):
+        pass
+
+    def index(self, documents):
+        pass
+
+    def remove(self, page_ids):
+        pass
+
+    def search(self, terms, limit, offset):
+        """Return `(page_id, score, title, snippet)` tuples, best first."""
+        queryset = SearchDocument.objects.all()
+        for term in terms:
+            queryset = queryset.filter(body__icontains=term) | queryset.filter(title__icontains=term)
+        pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+
+        results = []
+        for document in queryset.order_by('title')[offset:offset + limit]:
+            match = pattern.search(document.body)
+            start = max(0, match.start() - self.snippet_length // 3) if match else 0
+            snippet = document.body[start:start + self.snippet_length]
+            if start:
+                snippet = '…' + snippet
+            if start + self.snippet_length < len(document.body):
+                snippet += '…'
+            results.append((
+                document.pk,
+                0.0,
+                self.highlight(pattern, document.title),
+                self.highlight(pattern, snippet),
+            ))
+        return results
+
+    def highlight(self, pattern, text):
+        return pattern.sub(lambda m: f'{HIGHLIGHT_START}{m.group(0)}{HIGHLIGHT_END}', text)
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """SQLite FTS5 backend. Rows are keyed by page id."""
+    table = 'cms_app_search_fts'
+
+    def setup(self):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+                    f"USING fts5(title, body, tokenize='unicode61 remove_diacritics 2')"
+                )
+        except DatabaseError:
+            # SQLite built without FTS5.
+            return False
+        return True
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+
+    def index(self, documents):
+        self.remove([document.pk for document in documents])
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {self.table}(rowid, title, body) VALUES (%s, %s, %s)",
+                [(document.pk, document.title, document.body) for document in documents]
+            )
+
+    def remove(self, page_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {self.table} WHERE rowid = %s",
+                [(page_id,) for page_id in page_ids]
+            )
+
+    def search(self, terms, limit, offset):
+        # Terms are \w+ tokens, so quoting them is safe; the last one is a
+        # prefix match for search-as-you-type.
+        match = ' '.join(f'"{term}"' for term in terms) + '*'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, bm25({self.table}, 10.0, 1.0) AS rank, "
+                f"highlight({self.table}, 0, %s, %s), "
+                f"snippet({self.table}, 1, %s, %s, '…', 32) "
+                f"FROM {self.table} WHERE {self.table} MATCH %s "
+                f"ORDER BY rank LIMIT %s OFFSET %s",
+                [HIGHLIGHT_START, HIGHLIGHT_END, HIGHLIGHT_START, HIGHLIGHT_END, match, limit, offset]
+            )
+            # bm25() is lower-is-better; expose a higher-is-better score.
+            return [(page_id, -rank, title, snippet) for page_id, rank, title, snippet in cursor.fetchall()]
+
+
+class PostgresSearchBackend(SearchBackend):
+    """PostgreSQL tsvector backend with a GIN index. Titles weigh more than body text."""
+    table = 'cms_app_search_tsv'
+
+    @property
+    def text_config(self):
+        return getattr(settings, 'SEARCH_TEXT_CONFIG', 'simple')
+
+    def setup(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                f"page_id bigint PRIMARY KEY, document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_document_idx "
+                f"ON {self.table} USING gin(document)"
+            )
+        return True
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+
+    def index(self, documents):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {self.table} (page_id, document) VALUES (%s, "
+                f"setweight(to_tsvector(%s::regconfig, %s), 'A') || "
+                f"setweight(to_tsvector(%s::regconfig, %s), 'B')) "
+                f"ON CONFLICT (page_id) DO UPDATE SET document = EXCLUDED.document",
+                [
+                    (document.pk, self.text_config, document.title, self.text_config, document.body)
+                    for document in documents
+                ]
+            )
+
+    def remove(self, page_ids):
+        if page_ids:
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {self.table} WHERE page_id = ANY(%s)", [list(page_ids)])
+
+    def search(self, terms, limit, offset):
+        tsquery = ' & '.join(terms) + ':*'
+        options = f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT s.page_id, ts_rank_cd(s.document, q) AS rank, "
+                f"ts_headline(%s::regconfig, d.title, q, %s), "
+                f"ts_headline(%s::regconfig, d.body, q, %s) "
+                f"FROM {self.table} s "
+                f"JOIN {SearchDocument._meta.db_table} d ON d.page_id = s.page_id, "
+                f"to_tsquery(%s::regconfig, %s) q "
+                f"WHERE s.document @@ q ORDER BY rank DESC LIMIT %s OFFSET %s",
+                [
+                    self.text_config, options + ', HighlightAll=true',
+                    self.text_config, options + ', MaxWords=35, MinWords=15',
+                    self.text_config, tsquery, limit, offset,
+                ]
+            )
+            return cursor.fetchall()
+
+
+_backend = None
+
+
+def get_backend():
+    """Return the backend for the default database, creating its index on first use."""
+    global _backend
+    if _backend is None:
+        backend_class = {
+            'sqlite': SQLiteSearchBackend,
+            'postgresql': PostgresSearchBackend,
+        }.get(connection.vendor, SearchBackend)
+        backend = backend_class()
+        if not backend.setup():
+            backend = SearchBackend()
+        _backend = backend
+    return _backend
+
+
+def build_documents(page_ids):
+    """Build unsaved `SearchDocument`s for the published pages among `page_ids`."""
+    pages = list(
+        Page.objects.filter(pk__in=page_ids, status='published')
+        .values_list('id', 'title', 'meta_description')
+    )
+    parts = {page_id: [meta_description or ''] for page_id, _, meta_description in pages}
+
+    sections = dict(
+        Section.objects.filter(page_id__in=parts, is_visible=True)
+        .order_by('page_id', 'order')
+        .values_list('id', 'page_id')
+    )
+    for page_id, title in (
+        Section.objects.filter(id__in=sections).order_by('order').values_list('page_id', 'title')
+    ):
+        parts[page_id].append(title or '')
+
+    blocks = (
+        ContentBlock.objects.filter(section_id__in=sections)
+        .exclude(block_type='code')
+        .order_by('section__order', 'order')
+        .values_list('section_id', 'title', 'content', 'html_content', 'link_text')
+    )
+    for section_id, title, content, html_content, link_text in blocks:
+        parts[sections[section_id]].extend([
+            title or '', strip_html(content), strip_html(html_content), link_text or '',
+        ])
+
+    return [
+        SearchDocument(
+            page_id=page_id,
+            title=title,
+            body=' '.join(part for part in parts[page_id] if part),
+        )
+        for page_id, title, _ in pages
+    ]
+
+
+def reindex_pages(page_ids):
+    """Rebuild the documents of the given pages, dropping unpublished or deleted ones."""
+    page_ids = set(page_ids)
+    if not page_ids:
+        return
+    backend = get_backend()
+    documents = build_documents(page_ids)
+    with transaction.atomic():
+        SearchDocument.objects.filter(pk__in=page_ids).delete()
+        SearchDocument.objects.bulk_create(documents)
+        backend.remove(page_ids - {document.pk for document in documents})
+        backend.index(documents)
+
+
+def rebuild_index(batch_size=200):
+    """Rebuild the whole index. Returns the number of indexed pages."""
+    backend = get_backend()
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        backend.clear()
+
+    page_ids = list(Page.objects.filter(status='published').values_list('id', flat=True))
+    for start in range(0, len(page_ids), batch_size):
+        reindex_pages(page_ids[start:start + batch_size])
+    return len(page_ids)
+
+
+_pending = threading.local()
+
+
+def schedule_reindex(page_ids=(), section_ids=()):
+    """
+    Queue pages (directly, or through their sections) for reindexing once the
+    current transaction commits. Each page is rebuilt once per transaction.
+    """
+    if not hasattr(_pending, 'pages'):
+        _pending.pages, _pending.sections = set(), set()
+    _pending.pages.update(page_ids)
+    _pending.sections.update(section_ids)
+    # Registering per call is cheap: the first callback drains the queue and
+    # later ones find it empty. Queued ids from a rolled back transaction are
+    # harmless, as pages are rebuilt from committed state.
+    transaction.on_commit(_flush_pending)
+
+
+def schedule_for_objects(objects):
+    """Queue the pages affected by saved or deleted pages, sections and blocks."""
+    page_ids, section_ids = set(), set()
+    for obj in objects:
+        if isinstance(obj, Page):
+            page_ids.add(obj.pk)
+        elif isinstance(obj, Section):
+            page_ids.add(obj.page_id)
+        elif isinstance(obj, ContentBlock):
+            section_ids.add(obj.section_id)
+    if page_ids or section_ids:
+        schedule_reindex(page_ids, section_ids)
+
+
+def _flush_pending():
+    page_ids, section_ids = getattr(_pending, 'pages', set()), getattr(_pending, 'sections', set())
+    if not page_ids and not section_ids:
+        return
+    _pending.pages, _pending.sections = set(), set()
+
+    try:
+        if section_ids:
+            page_ids |= set(Section.objects.filter(pk__in=section_ids).values_list('page_id', flat=True))
+        reindex_pages(page_ids)
+    except Exception:
+        # Content is already committed; a stale index must not fail the save.
+        logger.exception('Search index update failed for pages %s', sorted(page_ids))
+
+
+def search_pages(query, limit=10, offset=0):
+    """
+    Search published pages. Returns `(results, has_more)` where results is a
+    list of `SearchResult` with escaped, highlighted title and snippet HTML.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return [], False
+
+    rows = get_backend().search(terms, limit + 1, offset)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    pages = Page.objects.filter(status='published').in_bulk([row[0] for row in rows])
+    results = [
+        SearchResult(pages[page_id], score, mark_highlights(title), mark_highlights(snippet))
+        for page_id, score, title, snippet in rows
+        if page_id in pages
+    ]
+    return results, has_more
@@ -1,10 +1,90 @@
 """
 Signal handlers for CMS app.
 """
+import threading
+from contextlib import contextmanager
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.core.cache import cache
-from .models import Page, Section, ContentBlock, MenuItem, SiteConfiguration
+from .models import (
+    Page, Section, ContentBlock, MenuItem, Media, SiteConfiguration,
+    ChangeLogEntry, MediaBlob, GalleryImage
+)
+from .search import schedule_for_objects
+from . import autocomplete, protected_media
+
+_batch = threading.local()
+
+
+@contextmanager
+def coalesced_changes():
+    """
+    Coalesce change handling for bulk writes.
+
+    Inside the block, per-row signals only collect what changed. On exit the
+    change log is written in one batch, in the surrounding transaction, and
+    the cache is cleared once when that transaction commits. Nested blocks
+    join the outermost one.
+    """
+    if getattr(_batch, 'changes', None) is not None:
+        yield
+        return
+
+    _batch.changes = {}
+    try:
+        yield
+        changes = _batch.changes
+    finally:
+        _batch.changes = None
+
+    for (model, action), object_ids in changes.items():
+        ChangeLogEntry.record(model, object_ids, action)
+    transaction.on_commit(cache.clear)
+
+
+def record_changes(model, object_ids, action):
+    """
+    Record changes made without per-row signals (e.g. `bulk_create`).
+    Must be called inside `coalesced_changes()`, which clears the cache.
+    """
+    _batch.changes.setdefault((model, action), []).extend(object_ids)
+
+
+def _in_batch():
+    return getattr(_batch, 'changes', None) is not None
+
+
+# Fields that decide whether the rows below a page or section are visible in
+# the change feed, which serves them only in visible sections of published
+# pages. The rows' payload changes with these fields, so they are recorded
+# as updated too.
+VISIBILITY_FIELDS = {Page: 'status', Section: 'is_visible'}
+
+
+def visibility_changed(instance):
+    """Whether a saved page's status or section's visibility changed."""
+    field = VISIBILITY_FIELDS[type(instance)]
+    # Unknown for instances not loaded from the database
+    saved = getattr(instance, f'_saved_{field}', None)
+    return saved is None or saved != getattr(instance, field)
+
+
+def record_dependent_changes(model, object_ids):
+    """Record the sections and content blocks below pages or sections as updated."""
+    if model is Page:
+        dependents = [
+            (Section, Section.objects.filter(page_id__in=object_ids)),
+            (ContentBlock, ContentBlock.objects.filter(section__page_id__in=object_ids)),
+        ]
+    else:
+        dependents = [(ContentBlock, ContentBlock.objects.filter(section_id__in=object_ids))]
+    for dependent, queryset in dependents:
+        pks = list(queryset.values_list('pk', flat=True))
+        if _in_batch():
+            record_changes(dependent, pks, 'updated')
+        else:
+            ChangeLogEntry.record(dependent, pks, 'updated')
 
 
 @receiver([post_save, post_delete], sender=Page)
@@ -14,4 +94,76 @@ from .models import Page, Section, ContentBlock, MenuItem, SiteConfiguration
 @receiver([post_save, post_delete], sender=SiteConfiguration)
 def clear_cache_on_change(sender, instance, **kwargs):
     """Clear cache when content changes."""
+    if _in_batch():
+        # Cleared once when the batch ends.
+        return
     cache.clear()
+
+
+@receiver(post_save, sender=Page)
+@receiver(post_save, sender=Section)
+@receiver(post_save, sender=ContentBlock)
+@receiver(post_save, sender=MenuItem)
+@receiver(post_save, sender=Media)
+def record_save_in_changelog(sender, instance, created, raw=False, **kwargs):
+    """Append created/updated entries to the change feed log."""
+    if raw:
+        # Fixture loading; the feed is rebuilt from a fresh cursor anyway.
+        return
+    action = 'created' if created else 'updated'
+    if _in_batch():
+        record_changes(sender, [instance.pk], action)
+    else:
+        ChangeLogEntry.record(sender, [instance.pk], action)
+
+    update_fields = kwargs.get('update_fields')
+    if (not created and sender in VISIBILITY_FIELDS and visibility_changed(instance)
+            and (update_fields is None or VISIBILITY_FIELDS[sender] in update_fields)):
+        record_dependent_changes(sender, [instance.pk])
+
+
+@receiver(post_delete, sender=Page)
+@receiver(post_delete, sender=Section)
+@receiver(post_delete, sender=ContentBlock)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_delete, sender=Media)
+def record_delete_in_changelog(sender, instance, **kwargs):
+    """Append deleted entries to the change feed log."""
+    if _in_batch():
+        record_changes(sender, [instance.pk], 'deleted')
+    else:
+        ChangeLogEntry.record(sender, [instance.pk], 'deleted')
+
+
+@receiver([post_save, post_delete], sender=Page)
+@receiver([post_save, post_delete], sender=Section)
+@receiver([post_save, post_delete], sender=ContentBlock)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    """Reindex the affected page once the transaction commits."""
+    if raw:
+        return
+    schedule_for_objects([instance])
+
+
+@receiver([post_save, post_delete], sender=Page)
+@receiver([post_save, post_delete], sender=Media)
+def refresh_autocomplete_index(sender, instance, raw=False, **kwargs):
+    """Let the next autocomplete lookup pick up the change once it commits."""
+    transaction.on_commit(autocomplete.mark_stale)
+
+
+@receiver(post_delete, sender=Media)
+def release_media_blob(sender, instance, **kwargs):
+    """Drop the deleted file's reference to its shared blob."""
+    MediaBlob.release(instance.content_hash)
+
+
+@receiver([post_save, post_delete], sender=Media)
+@receiver([post_save, post_delete], sender=GalleryImage)
+def forget_media_access(sender, instance, **kwargs):
+    """Re-check who may download the affected files on the next request."""
+    if sender is Media:
+        protected_media.forget(instance.file.name)
+        protected_media.forget(getattr(instance, '_saved_file_name', None))
+    else:
+        protected_media.forget(instance.image.name)
@@ -0,0 +1,216 @@
+"""
+Perceptual near-duplicate detection for the media library.
+
+Each image gets a 64-bit perceptual hash (pHash): the image is reduced to a
+32×32 grayscale sample, transformed with a 2-D DCT, and the 8×8 lowest
+frequencies (without the DC term) are compared with their median. Re-encoded,
+resized or lightly cropped copies of an image get hashes that differ in a few
+bits, so near duplicates are pairs within a small Hamming distance.
+
+Hashes of a batch are computed together: the DCT of all samples is one
+matrix product. Candidate pairs come from banded locality-sensitive hashing:
+the 64 bits are split into `max_distance + 1` bands, and two hashes within
+`max_distance` bits of each other agree on at least one whole band
+(pigeonhole), so bucketing by band finds every such pair without comparing
+all pairs. Candidates are verified and joined into groups with union-find.
+
+NumPy is required for hashing.
+"""
+from PIL import Image
+from django.db import transaction
+from django.db.models import Q
+from .bulk import update_objects
+from .models import Media, Tag
+from .references import RICH_TEXT_FIELDS, URL_FIELDS, file_fields, rewrite_html, rewrite_url
+from .signals import coalesced_changes
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+SAMPLE_SIZE = 32
+HASH_SIZE = 8
+DEFAULT_MAX_DISTANCE = 6
+# Standard deviation of the sample (0-255) below which an image counts as flat
+FLAT_THRESHOLD = 2.0
+
+_dct_matrix = None
+
+
+def dct_matrix():
+    """Orthonormal DCT-II matrix for SAMPLE_SIZE points."""
+    global _dct_matrix
+    if _dct_matrix is None:
+        n = SAMPLE_SIZE
+        k = np.arange(n)[:, None]
+        i = np.arange(n)[None, :]
+        matrix = np.sqrt(2 / n) * np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+        matrix[0] /= np.sqrt(2)
+        _dct_matrix = matrix
+    return _dct_matrix
+
+
+def grayscale_sample(file):
+    """SAMPLE_SIZE² grayscale sample of an image file, or None if unreadable."""
+    try:
+        file.open('rb')
+        with Image.open(file) as image:
+            image.draft('L', (SAMPLE_SIZE * 2, SAMPLE_SIZE * 2))
+            if image.mode in ('RGBA', 'LA', 'PA', 'P'):
+                # Transparent areas count as white, as they are usually shown.
+                image = image.convert('RGBA')
+                background = Image.new('RGBA', image.size, 'white')
+                image = Image.alpha_composite(background, image)
+            return image.convert('L').resize((SAMPLE_SIZE, SAMPLE_SIZE), Image.LANCZOS)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    finally:
+        file.close()
+
+
+def perceptual_hashes(samples):
+    """
+    64-bit perceptual hashes, as 16-digit hex strings, of grayscale samples;
+    '' for (nearly) flat samples, whose hash bits would only be noise.
+    """
+    if not samples:
+        return []
+    pixels = np.stack([np.asarray(sample, dtype=np.float64) for sample in samples])
+    matrix = dct_matrix()
+    coefficients = matrix @ pixels @ matrix.T
+    low = coefficients[:, :HASH_SIZE, :HASH_SIZE].reshape(len(samples), -1)
+    # The DC term only reflects overall brightness.
+    medians = np.median(low[:, 1:], axis=1, keepdims=True)
+    bits = np.packbits(low > medians, axis=1)
+    flat = pixels.reshape(len(samples), -1).std(axis=1) < FLAT_THRESHOLD
+    return ['' if is_flat else bytes(row).hex() for row, is_flat in zip(bits, flat)]
+
+
+def compute(files):
+    """Perceptual hash of each image file, or '' for unreadable and flat images."""
+    samples = [grayscale_sample(file) for file in files]
+    hashes = iter(perceptual_hashes([sample for sample in samples if sample is not None]))
+    return [next(hashes) if sample is not None else '' for sample in samples]
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def band_masks(max_distance):
+    """(shift, mask) of each of the max_distance + 1 bands of a 64-bit hash."""
+    bands = max_distance + 1
+    bounds = [round(64 * index / bands) for index in range(bands + 1)]
+    return [(start, (1 << (end - start)) - 1) for start, end in zip(bounds, bounds[1:])]
+
+
+class DisjointSet:
+    """Union-find over arbitrary keys, with path halving."""
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, key):
+        self.parent.setdefault(key, key)
+        while self.parent[key] != key:
+            self.parent[key] = self.parent[self.parent[key]]
+            key = self.parent[key]
+        return key
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+
+def find_groups(items, max_distance=DEFAULT_MAX_DISTANCE):
+    """
+    Groups of keys whose hashes are within `max_distance` bits of another
+    member. `items` are `(key, hex hash)` pairs; returns lists of at least
+    two keys, smallest key first.
+    """
+    hashes = {key: int(value, 16) for key, value in items if value}
+    masks = band_masks(max_distance)
+    bands = {
+        key: tuple((value >> shift) & mask for shift, mask in masks)
+        for key, value in hashes.items()
+    }
+    buckets = {}
+    for key, values in bands.items():
+        for band, value in enumerate(values):
+            buckets.setdefault((band, value), []).append(key)
+
+    groups = DisjointSet()
+    for (band, _), members in buckets.items():
+        for index, a in enumerate(members):
+            for b in members[index + 1:]:
+                # A pair sharing several bands is only compared in the
+                # first of them, so no set of compared pairs is needed.
+                if any(bands[a][earlier] == bands[b][earlier] for earlier in range(band)):
+                    continue
+                if groups.find(a) == groups.find(b):
+                    continue
+                if hamming(hashes[a], hashes[b]) <= max_distance:
+                    groups.union(a, b)
+
+    result = {}
+    for key in groups.parent:
+        result.setdefault(groups.find(key), []).append(key)
+    return sorted((sorted(members) for members in result.values() if len(members) > 1))
+
+
+def choose_original(media_list):
+    """The item to keep when merging: largest image, then largest file, then oldest."""
+    return max(media_list, key=lambda media: (
+        (media.width or 0) * (media.height or 0), media.file_size or 0, -media.pk
+    ))
+
+
+def merge(media_list):
+    """
+    Merge near-duplicate media into the best copy: content pointing at the
+    other files (file fields, rich-text links and link URLs) is repointed, their tags
+    are added to the kept item, and the other items are deleted. Their
+    files are left for `gc_media`. Returns the kept item.
+    """
+    keep = choose_original(media_list)
+    others = [media for media in media_list if media.pk != keep.pk]
+    renames = {media.file.name: keep.file.name for media in others if media.file.name != keep.file.name}
+
+    with transaction.atomic(), coalesced_changes():
+        for model, field_name in file_fields():
+            if model is Media or not renames:
+                continue
+            objects = list(model.objects.filter(**{f'{field_name}__in': renames}))
+            for obj in objects:
+                getattr(obj, field_name).name = renames[getattr(obj, field_name).name]
+            update_objects(model, objects, [field_name])
+
+        for fields, rewrite in [(RICH_TEXT_FIELDS, rewrite_html), (URL_FIELDS, rewrite_url)]:
+            for model, field_name in fields:
+                if not renames:
+                    continue
+                mentions = Q()
+                for old in renames:
+                    mentions |= Q(**{f'{field_name}__contains': old})
+                objects = []
+                for obj in model.objects.filter(mentions):
+                    value = getattr(obj, field_name)
+                    rewritten = rewrite(value, renames)
+                    if rewritten != value:
+                        setattr(obj, field_name, rewritten)
+                        objects.append(obj)
+                update_objects(model, objects, [field_name])
+
+        keep.tags = ', '.join(Tag.parse(','.join(
+            media.tags for media in [keep] + others if media.tags
+        ))) or None
+        keep.alt_text = keep.alt_text or next((media.alt_text for media in others if media.alt_text), None)
+        for media in others:
+            media.delete()
+        if not Media.objects.filter(duplicate_group=keep.duplicate_group).exclude(pk=keep.pk).exists():
+            keep.duplicate_group = None
+        keep.save()
+    return keep
@@ -0,0 +1,149 @@
+/**
+ * Chunked, resumable uploads for the media admin
+ *
+ * On the add form (the only one whose file input carries the upload URL),
+ * files larger than one chunk are sent to the chunked upload API instead of
+ * being posted with the form: the upload is started with the form's title
+ * and metadata, the file is read and sent one chunk at a time, failed chunks
+ * are retried from the offset the server reports, and once the last chunk is
+ * stored the browser moves on to the new media item.
+ */
+
+(function() {
+    'use strict';
+
+    const MAX_RETRIES = 5;
+
+    document.addEventListener('DOMContentLoaded', function() {
+        const input = document.querySelector('input[type="file"][data-chunked-upload-url]');
+        if (!input || !input.form) return;
+
+        input.form.addEventListener('submit', function(e) {
+            const file = input.files[0];
+            const chunkSize = parseInt(input.dataset.chunkSize, 10);
+            if (!file || file.size <= chunkSize) return;
+
+            e.preventDefault();
+            const progress = createProgress(input);
+            upload(input, file, progress)
+                .then(function(session) {
+                    window.location.href = changeUrl(session.media.id);
+                })
+                .catch(function(error) {
+                    progress.label.textContent = 'Upload failed: ' + error.message;
+                });
+        });
+    });
+
+    /**
+     * Upload a file chunk by chunk, resuming after errors
+     */
+    async function upload(input, file, progress) {
+        const baseUrl = input.dataset.chunkedUploadUrl;
+        const form = input.form;
+        const privateInput = form.querySelector('[name="is_private"]');
+        let session = await request('POST', baseUrl, {
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({
+                filename: file.name,
+                size: file.size,
+                title: fieldValue(form, 'title'),
+                alt_text: fieldValue(form, 'alt_text'),
+                caption: fieldValue(form, 'caption'),
+                tags: fieldValue(form, 'tags'),
+                is_private: privateInput ? privateInput.checked : false
+            })
+        });
+        const url = baseUrl + session.id + '/';
+        const chunkSize = session.chunk_size;
+        let retries = 0;
+
+        while (session.status !== 'complete') {
+            const chunk = file.slice(session.offset, session.offset + chunkSize);
+            try {
+                const headers = {
+                    'Content-Type': 'application/offset+octet-stream',
+                    'Upload-Offset': String(session.offset)
+                };
+                const checksum = await sha256(chunk);
+                if (checksum) headers['Upload-Checksum'] = checksum;
+
+                session = await request('PATCH', url, {headers: headers, body: chunk});
+                retries = 0;
+            } catch (error) {
+                if (++retries > MAX_RETRIES || error.status === 403 || error.status === 404) throw error;
+                // Back off, then continue from whatever the server has stored
+                await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+                session = await request('GET', url);
+            }
+            progress.update(session.offset, file.size);
+        }
+        return session;
+    }
+
+    function fieldValue(form, name) {
+        const field = form.querySelector('[name="' + name + '"]');
+        return field ? field.value : '';
+    }
+
+    async function request(method, url, options) {
+        options = options || {};
+        const headers = Object.assign({'X-CSRFToken': csrfToken()}, options.headers);
+        const response = await fetch(url, {
+            method: method,
+            headers: headers,
+            body: options.body,
+            credentials: 'same-origin'
+        });
+        const data = await response.json().catch(() => ({}));
+        if (!response.ok) {
+            const error = new Error(data.detail || response.statusText);
+            error.status = response.status;
+            throw error;
+        }
+        return data;
+    }
+
+    /**
+     * Hex SHA-256 of a chunk, or null where Web Crypto is unavailable
+     * (it requires a secure context)
+     */
+    async function sha256(blob) {
+        if (!window.crypto || !window.crypto.subtle) return null;
+        const digest = await window.crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+        return Array.from(new Uint8Array(digest))
+            .map(byte => byte.toString(16).padStart(2, '0'))
+            .join('');
+    }
+
+    function csrfToken() {
+        const field = document.querySelector('[name="csrfmiddlewaretoken"]');
+        return field ? field.value : '';
+    }
+
+    function changeUrl(mediaId) {
+        // .../cms_app/media/add/ -> .../cms_app/media/<id>/change/
+        return window.location.pathname.replace(/add\/?$/, mediaId + '/change/');
+    }
+
+    function createProgress(input) {
+        const container = document.createElement('div');
+        const bar = document.createElement('progress');
+        const label = document.createElement('span');
+        bar.max = 100;
+        bar.value = 0;
+        label.style.marginLeft = '8px';
+        container.appendChild(bar);
+        container.appendChild(label);
+        input.parentNode.appendChild(container);
+
+        return {
+            label: label,
+            update: function(offset, size) {
+                const percent = Math.floor(offset * 100 / size);
+                bar.value = percent;
+                label.textContent = percent + '%';
+            }
+        };
+    }
+})();
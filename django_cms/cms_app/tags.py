@@ -0,0 +1,68 @@
+"""
+Tag filtering and faceted counts for the media library.
+
+Filters use subqueries on the tag relation, so results never need DISTINCT.
+Prefix matches are `LIKE 'prefix%'` lookups, which PostgreSQL answers from
+the pattern-ops index on `Tag.name` whatever the database collation; tags
+are stored lowercase, so they need no case folding.
+"""
+from django.db.models import Count, Value, CharField
+from .models import Media, Tag
+
+MediaTag = Media.tag_set.through
+
+
+def tagged_media_ids(name=None, prefix=None):
+    """Subquery of media ids with the given tag, or any tag starting with `prefix`."""
+    links = MediaTag.objects.all()
+    if name is not None:
+        links = links.filter(tag__name=Tag.normalize(name))
+    if prefix is not None:
+        prefix = Tag.normalize(prefix)
+        links = links.filter(tag__name__startswith=prefix)
+    return links.values('media_id')
+
+
+def filter_by_tags(queryset, tags=(), prefix=None):
+    """Keep media having all `tags`, and a tag starting with `prefix` if given."""
+    for name in tags:
+        if Tag.normalize(name):
+            queryset = queryset.filter(pk__in=tagged_media_ids(name=name))
+    if prefix and Tag.normalize(prefix):
+        queryset = queryset.filter(pk__in=tagged_media_ids(prefix=prefix))
+    return queryset
+
+
+def media_facets(queryset, type_queryset=None):
+    """
+    Count media per `media_type` and per tag in one aggregate query.
+
+    Tag counts cover `queryset`; type counts cover `type_queryset` (default
+    `queryset`), so a UI can show every type while one of them is selected.
+    Returns `{'media_type': {type: count}, 'tags': [(name, count), ...]}` with
+    tags sorted by count, then name.
+    """
+    if type_queryset is None:
+        type_queryset = queryset
+
+    type_counts = (
+        type_queryset.order_by()
+        .values('media_type')
+        .annotate(facet=Value('media_type', output_field=CharField()), count=Count('pk'))
+        .values_list('facet', 'media_type', 'count')
+    )
+    tag_counts = (
+        MediaTag.objects.filter(media__in=queryset.order_by().values('pk'))
+        .values('tag__name')
+        .annotate(facet=Value('tag', output_field=CharField()), count=Count('media_id'))
+        .values_list('facet', 'tag__name', 'count')
+    )
+
+    facets = {'media_type': {}, 'tags': []}
+    for facet, value, count in type_counts.union(tag_counts, all=True):
+        if facet == 'media_type':
+            facets['media_type'][value] = count
+        else:
+            facets['tags'].append((value, count))
+    facets['tags'].sort(key=lambda item: (-item[1], item[0]))
+    return facets
@@ -0,0 +1,69 @@
+"""
+Background job handlers. Imported at startup so the handlers are registered.
+"""
+import os
+from django.apps import apps
+from django.db import transaction
+from PIL import Image
+from .jobs import job
+from .models import Media, MediaBlob
+from .uploads import content_hash
+from . import placeholders, renditions
+
+
+def mark_media_failed(media_id):
+    Media.objects.filter(pk=media_id).update(processing_status='failed')
+
+
+@job('process_media', on_failure=mark_media_failed)
+def process_media(media_id):
+    """
+    Read the size and image dimensions of a new upload and generate its
+    placeholder and renditions, off the upload request.
+    """
+    media = Media.objects.filter(pk=media_id).first()
+    if media is None or not media.file:
+        # Deleted before the job ran.
+        return
+    Media.objects.filter(pk=media_id).update(processing_status='processing')
+
+    storage, name = media.file.storage, media.file.name
+    media.file_size = storage.size(name)
+    fields = ['file_size', 'width', 'height', 'processing_status']
+
+    if not media.content_hash:
+        # Files assigned by path rather than uploaded are hashed here. The
+        # hash is saved with the blob reference, so a retry after a later
+        # failure does not take a second reference.
+        with storage.open(name, 'rb') as f:
+            media.content_hash = content_hash(f)
+        with transaction.atomic():
+            Media.objects.filter(pk=media_id).update(content_hash=media.content_hash)
+            MediaBlob.acquire(media.content_hash, name=name, size=media.file_size)
+
+    ext = os.path.splitext(name)[1].lower()
+    if media.media_type == 'image' and ext != '.svg':
+        with storage.open(name, 'rb') as f:
+            with Image.open(f) as image:
+                media.width, media.height = image.size
+        placeholders.fill([media])
+        fields += ['dominant_color', 'placeholder']
+        renditions.generate_all(name, media.width)
+
+    # Later uploads of the same bytes reuse these results.
+    MediaBlob.objects.filter(sha256=media.content_hash).update(
+        size=media.file_size, width=media.width, height=media.height,
+        dominant_color=media.dominant_color, placeholder=media.placeholder
+    )
+
+    media.processing_status = 'ready'
+    media.save(update_fields=fields)
+
+
+@job('compute_placeholders')
+def compute_placeholders(model, pks):
+    """Compute the placeholders of content block or gallery images."""
+    model = apps.get_model(model)
+    objects = placeholders.fill(model.objects.filter(pk__in=pks))
+    # A plain UPDATE: placeholders are not content changes for the change feed.
+    model.objects.bulk_update(objects, model.placeholder_fields[1:])
@@ -2,11 +2,18 @@
 Custom template tags for CMS.
 """
 from django import template
+from django.utils.html import format_html, format_html_join
 from django.utils.safestring import mark_safe
+from cms_app import renditions
 import json
 
 register = template.Library()
 
+# `sizes` for images in the Bootstrap grid: full container width, and a
+# 3/2/1-column gallery.
+IMAGE_BLOCK_SIZES = '(min-width: 1400px) 1296px, (min-width: 1200px) 1116px, 100vw'
+GALLERY_SIZES = '(min-width: 768px) 33vw, (min-width: 576px) 50vw, 100vw'
+
 
 @register.filter
 def get_item(dictionary, key):
@@ -14,6 +21,79 @@ def get_item(dictionary, key):
     return dictionary.get(key)
 
 
+@register.simple_tag
+def rendition_url(file, width, fmt='auto'):
+    """URL of a resized variant of an image file."""
+    return renditions.rendition_url(file, width, fmt)
+
+
+@register.simple_tag
+def srcset(file, source_width=None, fmt='auto'):
+    """`srcset` value for an image file; empty for files that cannot be resized."""
+    return renditions.srcset(file, source_width, fmt)
+
+
+def image_attrs(width=None, height=None, loading='lazy', color='', placeholder=''):
+    """
+    Size, placeholder and loading attributes for an `<img>`. `loading` is
+    'lazy' for images below the fold, 'eager' for images in the first
+    section, or 'priority' for the page's main (LCP) image.
+    """
+    attrs = format_html(' width="{}" height="{}"', width, height) if width and height else ''
+    attrs = format_html('{}{}', attrs, placeholder_style(color, placeholder))
+    if loading == 'priority':
+        return format_html('{} fetchpriority="high"', attrs)
+    if loading == 'lazy':
+        return format_html('{} loading="lazy" decoding="async"', attrs)
+    return format_html('{} decoding="async"', attrs)
+
+
+def placeholder_style(color='', placeholder=''):
+    """
+    Inline `style` attribute painting an image's placeholder (dominant color
+    and blurred preview) until the image itself has loaded.
+    """
+    if placeholder:
+        return format_html(' style="background: {} url({}) center / cover no-repeat;"', color, placeholder)
+    if color:
+        return format_html(' style="background-color: {};"', color)
+    return ''
+
+
+@register.simple_tag
+def picture(file, alt='', sizes='100vw', css_class='', source_width=None, source_height=None,
+            loading='lazy', color='', placeholder='', processing_status=''):
+    """
+    Render a responsive `<picture>` with AVIF/WebP sources and a srcset in
+    the original format, falling back to a plain `<img>` for files that
+    cannot be resized (SVG, GIF) or that failed processing (pass a media
+    item's `processing_status`). The source dimensions, when known, are
+    emitted so the browser can reserve space before the image loads, and
+    the placeholder is painted in that space meanwhile.
+    """
+    if not file:
+        return ''
+    attrs = image_attrs(source_width, source_height, loading, color, placeholder)
+    if not renditions.is_resizable(file.name) or processing_status == 'failed':
+        return format_html('<img src="{}" alt="{}" class="{}"{} />', file.url, alt, css_class, attrs)
+
+    fallback = renditions.fallback_format(file.name)
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}" />',
+        (
+            (renditions.CONTENT_TYPES[fmt], renditions.srcset(file, source_width, fmt), sizes)
+            for fmt in renditions.modern_formats()
+        )
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}"{} /></picture>',
+        sources,
+        renditions.rendition_url(file, renditions.nearest_width(960), fallback),
+        renditions.srcset(file, source_width, fallback),
+        sizes, alt, css_class, attrs
+    )
+
+
 @register.simple_tag
 def render_content_block(block):
     """
@@ -30,9 +110,15 @@ def render_content_block(block):
     elif block.block_type == 'image':
         if block.image:
             alt = block.image_alt or block.title or ''
+            image = picture(
+                block.image, alt, sizes=IMAGE_BLOCK_SIZES, css_class='img-fluid rounded',
+                source_width=block.image_width, source_height=block.image_height,
+                loading=getattr(block, 'image_loading', 'lazy'),
+                color=block.image_dominant_color, placeholder=block.image_placeholder
+            )
             return mark_safe(f'''
                 <div class="content-block-image text-center">
-                    <img src="{block.image.url}" alt="{alt}" class="img-fluid rounded" />
+                    {image}
                     {f'<p class="mt-2 text-muted"><small>{block.title}</small></p>' if block.title else ''}
                 </div>
             ''')
@@ -40,12 +126,20 @@ def render_content_block(block):
     elif block.block_type == 'gallery':
         images = block.gallery_images.all()
         if images:
+            loading = getattr(block, 'image_loading', 'lazy')
             html = '<div class="content-block-gallery row g-3">'
-            for img in images:
+            for index, img in enumerate(images):
+                image = picture(
+                    img.image, img.alt_text or '', sizes=GALLERY_SIZES, css_class='img-fluid rounded',
+                    source_width=img.width, source_height=img.height,
+                    # Only the first gallery image can be the main image
+                    loading='eager' if loading == 'priority' and index else loading,
+                    color=img.dominant_color, placeholder=img.placeholder
+                )
                 html += f'''
                     <div class="col-md-4 col-sm-6">
                         <div class="gallery-item">
-                            <img src="{img.image.url}" alt="{img.alt_text or ''}" class="img-fluid rounded" />
+                            {image}
                             {f'<p class="mt-2 text-center"><small>{img.caption}</small></p>' if img.caption else ''}
                         </div>
                     </div>
@@ -124,14 +218,35 @@ def render_content_block(block):
     return mark_safe(f'<div class="content-block">Content block: {block.block_type}</div>')
 
 
+def has_image(block):
+    """Whether a block renders an image."""
+    if block.block_type == 'image':
+        return bool(block.image)
+    if block.block_type == 'gallery':
+        return bool(block.gallery_images.all())
+    return False
+
+
 @register.inclusion_tag('cms_app/includes/section.html')
-def render_section(section):
+def render_section(section, is_first=False):
     """
     Render a complete section with all its content blocks.
+
+    Images load lazily except in the first section, which is usually above
+    the fold; its first image is fetched with high priority.
     """
+    # Meta.ordering already sorts blocks by order, which keeps prefetched
+    # blocks usable.
+    blocks = list(section.content_blocks.all())
+    for block in blocks:
+        block.image_loading = 'eager' if is_first else 'lazy'
+    if is_first:
+        main_image_block = next((block for block in blocks if has_image(block)), None)
+        if main_image_block:
+            main_image_block.image_loading = 'priority'
     return {
         'section': section,
-        'blocks': section.content_blocks.all().order_by('order')
+        'blocks': blocks
     }
 
 
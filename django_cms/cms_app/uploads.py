@@ -0,0 +1,76 @@
+"""
+Content hashing for uploaded files.
+
+The upload handlers below are Django's memory and temporary-file handlers
+with a SHA-256 computed while the request body streams in, so identical
+uploads can be matched to an already stored `MediaBlob` without reading the
+file a second time. Enabled via `FILE_UPLOAD_HANDLERS` in settings.
+"""
+import hashlib
+import os
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+MEDIA_TYPE_EXTENSIONS = {
+    'image': ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg'),
+    'document': ('.pdf', '.doc', '.docx', '.xls', '.xlsx'),
+    'video': ('.mp4', '.avi', '.mov', '.wmv'),
+}
+
+
+def media_type_for_name(name):
+    """`Media.media_type` for a file name, from its extension."""
+    ext = os.path.splitext(name)[1].lower()
+    for media_type, extensions in MEDIA_TYPE_EXTENSIONS.items():
+        if ext in extensions:
+            return media_type
+    return 'other'
+
+
+class HashingUploadMixin:
+    """Attach the SHA-256 of the received bytes to the uploaded file as `sha256`."""
+
+    def new_file(self, *args, **kwargs):
+        # Set up first: the memory handler signals that it takes the file by
+        # raising StopFutureHandlers from new_file().
+        self.hasher = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        # The memory handler passes chunks on untouched when the file is too
+        # large for it; only the handler that keeps the file needs to hash.
+        if getattr(self, 'activated', True):
+            self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        if uploaded is not None:
+            uploaded.sha256 = self.hasher.hexdigest()
+        return uploaded
+
+
+class HashingMemoryFileUploadHandler(HashingUploadMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def content_hash(file):
+    """
+    SHA-256 hex digest of a file: taken from the upload handler when
+    available, otherwise computed in chunks (leaving the file at position 0).
+    """
+    precomputed = getattr(file, 'sha256', None) or getattr(getattr(file, 'file', None), 'sha256', None)
+    if precomputed:
+        return precomputed
+
+    hasher = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks(HASH_CHUNK_SIZE):
+        hasher.update(chunk)
+    file.seek(0)
+    return hasher.hexdigest()
@@ -2,11 +2,16 @@
 URL configuration for CMS app.
 """
 from django.urls import path
-from .views import HomePageView, PageDetailView, MediaLibraryView, robots_txt
+from .views import (
+    HomePageView, PageDetailView, MediaLibraryView, SearchView,
+    rendition_view, robots_txt
+)
 
 urlpatterns = [
     path('', HomePageView.as_view(), name='home'),
     path('robots.txt', robots_txt, name='robots_txt'),
     path('media-library/', MediaLibraryView.as_view(), name='media_library'),
+    path('search/', SearchView.as_view(), name='search'),
+    path('renditions/<int:width>/<str:fmt>/<path:name>', rendition_view, name='rendition'),
     path('<slug:slug>/', PageDetailView.as_view(), name='page_detail'),
 ]
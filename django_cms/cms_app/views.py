@@ -2,11 +2,18 @@
 Views for CMS application.
 """
 from django.shortcuts import render, get_object_or_404
-from django.views.generic import ListView, DetailView
+from django.views.generic import ListView, DetailView, TemplateView
 from django.http import Http404
+from django.core.files.storage import default_storage
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.db.models import Q
 from django.views.decorators.cache import cache_page
 from django.utils.decorators import method_decorator
+from PIL import Image
 from .models import Page, Section, ContentBlock, Media
+from .search import search_pages
+from .tags import filter_by_tags, media_facets, tagged_media_ids
+from . import renditions, protected_media
 
 
 class HomePageView(DetailView):
@@ -39,7 +46,10 @@ class HomePageView(DetailView):
         page = self.object
 
         # Get all visible sections with their content blocks
-        sections = page.sections.filter(is_visible=True).prefetch_related('content_blocks')
+        sections = page.sections.filter(is_visible=True).prefetch_related(
+            'content_blocks',
+            'content_blocks__gallery_images'
+        )
         context['sections'] = sections
 
         return context
@@ -86,30 +96,132 @@ class MediaLibraryView(ListView):
     def get_queryset(self):
         """Get media files, optionally filtered."""
         queryset = Media.objects.all()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(is_private=False)
 
-        # Filter by media type if specified
-        media_type = self.request.GET.get('type')
-        if media_type:
-            queryset = queryset.filter(media_type=media_type)
-
-        # Search by title or tags
+        # Search by title or exact tag
         search = self.request.GET.get('search')
         if search:
             queryset = queryset.filter(
-                models.Q(title__icontains=search) |
-                models.Q(tags__icontains=search)
+                Q(title__icontains=search) |
+                Q(pk__in=tagged_media_ids(name=search))
             )
 
+        # Filter by tag if specified
+        queryset = filter_by_tags(queryset, tags=self.request.GET.getlist('tag'))
+
+        # Type counts ignore the type filter, so every type stays selectable
+        self.unfiltered_by_type = queryset
+
+        # Filter by media type if specified
+        media_type = self.request.GET.get('type')
+        if media_type:
+            queryset = queryset.filter(media_type=media_type)
+
         return queryset
 
     def get_context_data(self, **kwargs):
-        """Add filter options to context."""
+        """Add filter options and facet counts to context."""
         context = super().get_context_data(**kwargs)
+        facets = media_facets(self.object_list, self.unfiltered_by_type)
         context['current_type'] = self.request.GET.get('type', '')
+        context['current_tags'] = self.request.GET.getlist('tag')
         context['search_query'] = self.request.GET.get('search', '')
+        context['type_counts'] = facets['media_type']
+        context['tag_facets'] = facets['tags'][:30]
+
+        # Current filters without the page number, for facet links
+        params = self.request.GET.copy()
+        params.pop('page', None)
+        context['filter_query'] = params.urlencode()
+        return context
+
+
+class SearchView(TemplateView):
+    """Full-text search over published pages."""
+    template_name = 'cms_app/search.html'
+    paginate_by = 10
+
+    def get_context_data(self, **kwargs):
+        """Add results for the `q` parameter to context."""
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get('q', '').strip()
+        try:
+            page_number = max(int(self.request.GET.get('page', 1)), 1)
+        except ValueError:
+            page_number = 1
+
+        results, has_more = search_pages(
+            query,
+            limit=self.paginate_by,
+            offset=(page_number - 1) * self.paginate_by
+        )
+        context.update({
+            'search_query': query,
+            'results': results,
+            'page_number': page_number,
+            'has_previous': page_number > 1,
+            'has_next': has_more,
+        })
         return context
 
 
+def rendition_view(request, width, fmt, name):
+    """
+    Serve an image rendition, generating it on first request.
+    `fmt` may be `auto` to pick the best format the browser accepts.
+    """
+    if (width not in renditions.get_widths() or not renditions.is_safe_source_name(name)
+            or not renditions.is_resizable(name)):
+        raise Http404("Unknown rendition")
+
+    public = protected_media.is_public(name)
+    if not (public or request.user.is_staff):
+        raise Http404("Image not found")
+
+    negotiated = fmt == 'auto'
+    if negotiated:
+        fmt = renditions.negotiate_format(name, request.META.get('HTTP_ACCEPT'))
+    elif fmt not in renditions.formats_for(name):
+        raise Http404("Unsupported rendition format")
+
+    try:
+        rendition = renditions.generate(name, width, fmt)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # Missing, or not an image Pillow can decode
+        raise Http404("Image not found")
+
+    response = protected_media.serve(
+        request, rendition, content_type=renditions.CONTENT_TYPES[fmt], public=public
+    )
+    if negotiated:
+        patch_vary_headers(response, ['Accept'])
+    if public:
+        # Rendition names are derived from the (unique) upload name, so they
+        # never change once generated.
+        patch_cache_control(response, max_age=60 * 60 * 24 * 365)
+        if not negotiated:
+            patch_cache_control(response, immutable=True)
+    return response
+
+
+def media_view(request, name):
+    """
+    Serve an uploaded file after checking that the user may see it; the
+    transfer itself is left to the web server where configured.
+    """
+    # Renditions stored under MEDIA_ROOT are as visible as their source.
+    parsed = renditions.parse_rendition_name(name)
+    source_name = parsed[0] if parsed else name
+    if not renditions.is_safe_source_name(source_name) or not default_storage.exists(name):
+        raise Http404("File not found")
+
+    public = protected_media.is_public(source_name)
+    if not (public or request.user.is_staff):
+        raise Http404("File not found")
+    return protected_media.serve(request, name, public=public)
+
+
 def robots_txt(request):
     """Serve robots.txt file."""
     content = """User-agent: *
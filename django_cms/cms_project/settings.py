@@ -107,6 +107,20 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = config('MEDIA_URL', default='/media/')
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Hash uploads while they stream in, to deduplicate identical media files
+FILE_UPLOAD_HANDLERS = [
+    'cms_app.uploads.HashingMemoryFileUploadHandler',
+    'cms_app.uploads.HashingTemporaryFileUploadHandler',
+]
+
+# Chunked, resumable uploads (/api/uploads/): partial files are kept outside
+# MEDIA_ROOT so they are never served; sessions idle for longer than the
+# expiry are removed by gc_media
+CHUNKED_UPLOAD_TEMP_DIR = config('CHUNKED_UPLOAD_TEMP_DIR', default=str(BASE_DIR / 'chunked_uploads'))
+CHUNKED_UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+CHUNKED_UPLOAD_MAX_SIZE = 5 * 1024 * 1024 * 1024
+CHUNKED_UPLOAD_EXPIRY_HOURS = 24
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -175,6 +189,37 @@ CACHES = {
     }
 }
 
+# Full-text search (text search configuration used on PostgreSQL,
+# e.g. 'english' for stemming; 'simple' works for any language)
+SEARCH_TEXT_CONFIG = config('SEARCH_TEXT_CONFIG', default='simple')
+
+# Image renditions (resized WebP/AVIF variants served from /renditions/)
+RENDITION_WIDTHS = [160, 320, 640, 960, 1280, 1920]
+
+# Protected media: uploads are authorized by Django, then sent by 'nginx'
+# (X-Accel-Redirect to the internal location below), 'sendfile' (X-Sendfile
+# for Apache/lighttpd) or 'django' (FileResponse with Range support)
+PROTECTED_MEDIA_SERVER = config('PROTECTED_MEDIA_SERVER', default='django')
+PROTECTED_MEDIA_INTERNAL_URL = '/protected/'
+PROTECTED_MEDIA_CACHE_TIMEOUT = 60
+PROTECTED_MEDIA_MAX_AGE = 60 * 60
+
+# Background jobs (run with `manage.py run_jobs`; eager mode runs them
+# in-process after commit, for development without a worker)
+JOB_QUEUE_EAGER = config('JOB_QUEUE_EAGER', default=False, cast=bool)
+JOB_RETRY_DELAY = 10
+JOB_LOCK_TIMEOUT = 600
+
+# Change feed: entries are handed out once they are this many seconds old, so
+# that entries committed concurrently cannot appear behind a consumer's cursor
+CHANGE_FEED_SAFETY_LAG = 5
+
+# Autocomplete (in-memory prefix index; seconds between checks for changes
+# made by other processes)
+AUTOCOMPLETE_DEFAULT_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+AUTOCOMPLETE_REFRESH_INTERVAL = 2.0
+
 # Logging
 LOGGING = {
     'version': 1,
@@ -7,6 +7,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib.sitemaps.views import sitemap
 from cms_app.sitemaps import PageSitemap
+from cms_app.views import media_view
 
 sitemaps = {
     'pages': PageSitemap,
@@ -17,12 +18,13 @@ urlpatterns = [
     path('api/', include('cms_app.api.urls')),
     path('ckeditor/', include('ckeditor_uploader.urls')),
     path('sitemap.xml', sitemap, {'sitemaps': sitemaps}, name='sitemap'),
+    # Uploaded files are authorized by Django in every environment
+    path(f"{settings.MEDIA_URL.lstrip('/')}<path:name>", media_view, name='media'),
     path('', include('cms_app.urls')),
 ]
 
-# Serve media files in development
+# Serve static files in development
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
 
 # Customize admin site